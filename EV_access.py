@@ -0,0 +1,179 @@
+# Author: Jingni Zhang
+# Date Created: 04.28.2025
+
+import os
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+from scipy.spatial import cKDTree
+
+from EV_boundaries import BOUNDARY_FILE, load_boundaries
+
+# NAD83 / UTM zone 18N: metric distances for New York (Web Mercator
+# stretches distances by about 30% at this latitude)
+ACCESS_CRS = 26918
+
+# Years to measure access in; a charger counts from its Open Date onward
+ACCESS_YEARS = range(2010, 2026)
+
+# Charger subsets: None keeps every charger, otherwise the port column that must be > 0
+CHARGER_LEVELS = {
+    'any': None,
+    'level2': 'EV Level2 EVSE Num',
+    'dc_fast': 'EV DC Fast Count'
+}
+
+# Number of nearest chargers averaged in 'mean_k_km'
+NEAREST_K = 3
+
+# Census ZIP Code Tabulation Areas; optional, ZIP access is skipped without it
+ZCTA_FILE = 'ny_tiger_shapfile/tl_2024_us_zcta520.shp'
+ZCTA_ID = 'ZCTA5CE20'
+
+# Lon/lat box around New York, used to read only NY ZCTAs from the national file
+NY_BBOX = (-80.0, 40.3, -71.5, 45.2)
+
+
+def projected_xy(geometry, crs=ACCESS_CRS):
+    """
+    (n, 2) array of point coordinates in the metric access CRS
+    """
+    projected = geometry.to_crs(epsg=crs)
+    return np.column_stack([projected.x.to_numpy(), projected.y.to_numpy()])
+
+
+def area_centroids(areas, id_column='GEOID', crs=ACCESS_CRS):
+    """
+    Centroid of every area in the access CRS
+
+    Returns:
+    tuple: (Series of area IDs, (n, 2) coordinate array)
+    """
+    centroids = areas.geometry.to_crs(epsg=crs).centroid
+    return areas[id_column].reset_index(drop=True), np.column_stack([centroids.x, centroids.y])
+
+
+def zip_centroids(file_path=ZCTA_FILE, crs=ACCESS_CRS, bbox=NY_BBOX):
+    """
+    Centroid of every ZCTA in a lon/lat box (New York by default), or None if the ZCTA shapefile is missing
+
+    Returns:
+    tuple or None: (Series of Int32 ZIP codes named 'Zip', (n, 2) coordinate array)
+    """
+    if not os.path.exists(file_path):
+        print(f"ZCTA shapefile {file_path} not found; skipping ZIP-level accessibility")
+        return None
+
+    zctas = gpd.read_file(file_path, bbox=bbox, columns=[ZCTA_ID])
+    zips, xy = area_centroids(zctas, ZCTA_ID, crs)
+    return pd.to_numeric(zips).astype('Int32').rename('Zip'), xy
+
+
+def select_chargers(gdf_chargers, level='any', opened_by=None):
+    """
+    Boolean mask of chargers of a given level that were open by a date
+
+    Chargers without an Open Date are left out once a date is given.
+    """
+    keep = np.ones(len(gdf_chargers), dtype=bool)
+    column = CHARGER_LEVELS[level]
+    if column is not None:
+        keep &= gdf_chargers[column].fillna(0).to_numpy() > 0
+    if opened_by is not None:
+        keep &= (gdf_chargers['Open Date'] <= opened_by).fillna(False).to_numpy()
+    return keep
+
+
+def nearest_chargers(charger_xy, location_xy, k=NEAREST_K):
+    """
+    Distances from every location to its k nearest chargers
+
+    Builds a KD-tree over the chargers and queries all locations in one
+    batch, O((n + m) log n) instead of comparing every pair.
+
+    Parameters:
+    charger_xy (ndarray): (n, 2) charger coordinates in metres
+    location_xy (ndarray): (m, 2) location coordinates in metres
+    k (int): Number of neighbours
+
+    Returns:
+    tuple: ((m, k) distances in metres, (m, k) charger positions); NaN and
+        -1 where fewer than k chargers exist
+    """
+    distances = np.full((len(location_xy), k), np.nan)
+    positions = np.full((len(location_xy), k), -1, dtype=np.int64)
+    available = min(k, len(charger_xy))
+    if available == 0:
+        return distances, positions
+
+    tree = cKDTree(charger_xy)
+    found_distances, found_positions = tree.query(location_xy, k=available)
+    distances[:, :available] = found_distances.reshape(len(location_xy), available)
+    positions[:, :available] = found_positions.reshape(len(location_xy), available)
+    return distances, positions
+
+
+def accessibility_table(gdf_chargers, location_ids, location_xy, years=ACCESS_YEARS,
+                        levels=CHARGER_LEVELS, k=NEAREST_K, crs=ACCESS_CRS):
+    """
+    Nearest-charger distances for every location, year and charger level
+
+    Parameters:
+    gdf_chargers (GeoDataFrame): Chargers with Open Date and the AFDC port columns
+    location_ids (Series): ID of each location (e.g. GEOID or Zip)
+    location_xy (ndarray): (m, 2) location coordinates in crs
+    years (iterable): Years to measure; chargers opened by Dec 31 are counted
+    levels (iterable): Keys of CHARGER_LEVELS
+    k (int): Number of nearest chargers averaged
+    crs (int): EPSG code of a metric CRS for the area
+
+    Returns:
+    DataFrame: One row per location, year and level with 'chargers_open',
+        'nearest_km' and 'mean_k_km'
+    """
+    charger_xy = projected_xy(gdf_chargers.geometry, crs)
+    location_ids = pd.Series(location_ids).reset_index(drop=True)
+
+    tables = []
+    for level in levels:
+        for year in years:
+            keep = select_chargers(gdf_chargers, level, pd.Timestamp(year=year, month=12, day=31))
+            distances, _ = nearest_chargers(charger_xy[keep], location_xy, k)
+            tables.append(pd.DataFrame({
+                location_ids.name: location_ids,
+                'year': np.int16(year),
+                'level': level,
+                'chargers_open': int(keep.sum()),
+                'nearest_km': distances[:, 0] / 1000,
+                'mean_k_km': distances.mean(axis=1) / 1000
+            }))
+
+    table = pd.concat(tables, ignore_index=True)
+    table['level'] = pd.Categorical(table['level'], categories=list(levels))
+    return table
+
+
+def charger_accessibility(gdf_chargers, years=ACCESS_YEARS, zcta_file=ZCTA_FILE, boundary_file=BOUNDARY_FILE,
+                          crs=ACCESS_CRS, bbox=NY_BBOX):
+    """
+    Accessibility tables for county subdivisions and, when available, ZIP codes
+
+    Parameters:
+    gdf_chargers (GeoDataFrame): Projected chargers with Open Date and the AFDC port columns
+    years (iterable): Years to measure
+    zcta_file (str): National ZCTA shapefile (optional)
+    boundary_file (str): TIGER/Line county subdivision shapefile of the state
+    crs (int): EPSG code of a metric CRS for the state (UTM zone)
+    bbox (tuple): Lon/lat box of the state, used to read its ZCTAs
+
+    Returns:
+    dict: {'cousub': DataFrame, 'zip': DataFrame or None}
+    """
+    print("Measuring distance to the nearest chargers...")
+    areas = load_boundaries(tolerance=0, file_path=boundary_file)
+    tables = {'cousub': accessibility_table(gdf_chargers, *area_centroids(areas, crs=crs), years, crs=crs)}
+
+    zips = zip_centroids(zcta_file, crs, bbox)
+    tables['zip'] = None if zips is None else accessibility_table(gdf_chargers, *zips, years, crs=crs)
+    return tables
@@ -0,0 +1,197 @@
+# Author: Jingni Zhang
+# Date Created: 04.14.2025
+
+import numpy as np
+import pandas as pd
+
+# Dimensions of the registration count cube, in axis order
+CUBE_DIMS = ['Zip', 'reg_year', 'reg_class', 'fuel_type']
+
+# fuel_type values counted as electric vehicles
+EV_FUEL_TYPES = ['ELECTRIC']
+
+
+class CountCube:
+    """
+    Dense registration counts over Zip x reg_year x reg_class x fuel_type
+
+    Built in a single pass over the cleaned rows; every chart and table is a
+    slice or sum of the cube, so their cost depends on the number of distinct
+    keys rather than the number of registrations. Missing keys are kept as
+    their own label so totals over a dimension still count those rows.
+    """
+
+    def __init__(self, counts, axes):
+        self.counts = counts
+        self.axes = axes
+
+    @classmethod
+    def from_frame(cls, df, dims=CUBE_DIMS, weights=None):
+        """
+        Count rows of a cleaned registration frame into a dense cube
+
+        Parameters:
+        df (DataFrame): Cleaned registration data
+        dims (list): Columns to use as cube dimensions
+        weights (str or None): Column holding a (possibly negative) count per
+            row, e.g. the 'count' column of to_frame(); None counts rows
+
+        Returns:
+        CountCube: Counts with one axis per dimension
+        """
+        codes = []
+        axes = {}
+        for dim in dims:
+            dim_codes, labels = pd.factorize(df[dim], sort=True, use_na_sentinel=False)
+            codes.append(dim_codes.astype(np.int64))
+            axes[dim] = pd.Index(labels, name=dim)
+
+        shape = tuple(len(axes[dim]) for dim in dims)
+        flat_index = np.ravel_multi_index(codes, shape) if len(df) else np.zeros(0, dtype=np.int64)
+        row_weights = None if weights is None else df[weights].to_numpy()
+        counts = np.bincount(flat_index, weights=row_weights, minlength=int(np.prod(shape))).reshape(shape)
+        return cls(np.rint(counts).astype(np.int64), axes)
+
+    def to_frame(self):
+        """
+        Long-form table of the non-zero cells, one column per dimension plus 'count'
+        """
+        nonzero = np.nonzero(self.counts)
+        frame = pd.DataFrame({dim: self.axes[dim][positions] for dim, positions in zip(self.dims, nonzero)})
+        frame['count'] = self.counts[nonzero]
+        return frame
+
+    def merge(self, other, sign=1):
+        """
+        Add (sign=1) or subtract (sign=-1) another cube, aligning labels
+
+        Cost depends on the number of non-zero cells, not on the rows that
+        produced them.
+        """
+        other_frame = other.to_frame()
+        other_frame['count'] = other_frame['count'] * sign
+        long_frame = pd.concat([self.to_frame(), other_frame], ignore_index=True)
+        return CountCube.from_frame(long_frame, dims=self.dims, weights='count')
+
+    def equals(self, other):
+        """
+        True when both cubes hold the same non-zero counts
+        """
+        key = self.dims
+        left = self.to_frame().astype({dim: str for dim in key}).sort_values(key, ignore_index=True)
+        right = other.to_frame().astype({dim: str for dim in key}).sort_values(key, ignore_index=True)
+        return left.equals(right)
+
+    @property
+    def dims(self):
+        return list(self.axes)
+
+    def total(self):
+        return int(self.counts.sum())
+
+    def select(self, **criteria):
+        """
+        Restrict the cube to given labels, e.g. select(reg_year=2024) or
+        select(Zip=[10927, 11369]); a scalar keeps the dimension with one label
+        """
+        counts = self.counts
+        axes = dict(self.axes)
+        for dim, labels in criteria.items():
+            axis = self.dims.index(dim)
+            if np.isscalar(labels):
+                labels = [labels]
+            positions = axes[dim].get_indexer(labels)
+            positions = positions[positions >= 0]
+            counts = np.take(counts, positions, axis=axis)
+            axes[dim] = axes[dim][positions]
+        return CountCube(counts, axes)
+
+    def collapse(self, *dims):
+        """
+        Sum out every dimension not listed, keeping the listed ones in cube order
+        """
+        other_axes = tuple(i for i, dim in enumerate(self.dims) if dim not in dims)
+        axes = {dim: self.axes[dim] for dim in self.dims if dim in dims}
+        return CountCube(self.counts.sum(axis=other_axes), axes)
+
+    def where(self, dim, mask_func):
+        """
+        Restrict a dimension to labels for which mask_func(labels) is True,
+        e.g. where('reg_year', lambda years: years >= 2020)
+        """
+        labels = self.axes[dim]
+        return self.select(**{dim: labels[np.asarray(mask_func(labels), dtype=bool)]})
+
+    def table(self, index, columns=None, dropna=True):
+        """
+        Sum the cube down to one or two dimensions
+
+        Parameters:
+        index (str): Dimension for the rows
+        columns (str or None): Dimension for the columns
+        dropna (bool): Drop missing labels of the kept dimensions, like groupby
+
+        Returns:
+        Series (one dimension) or DataFrame (two dimensions) of counts
+        """
+        keep = [index] if columns is None else [index, columns]
+        other_axes = tuple(i for i, dim in enumerate(self.dims) if dim not in keep)
+        summed = self.counts.sum(axis=other_axes)
+
+        # Put the kept axes in the requested order
+        kept_order = [dim for dim in self.dims if dim in keep]
+        if kept_order != keep:
+            summed = summed.T
+
+        if columns is None:
+            result = pd.Series(summed, index=self.axes[index], name='count')
+            return result[result.index.notna()] if dropna else result
+
+        result = pd.DataFrame(summed, index=self.axes[index], columns=self.axes[columns])
+        if dropna:
+            result = result.loc[result.index.notna(), result.columns.notna()]
+        return result
+
+
+def fuel_type_counts(cube):
+    """
+    Registrations per Zip x reg_year for every fuel type at once
+
+    Returns:
+    DataFrame: (Zip, reg_year) rows, one column per fuel type, zeros included
+    """
+    collapsed = cube.collapse('Zip', 'reg_year', 'fuel_type')
+    index = pd.MultiIndex.from_product([collapsed.axes['Zip'], collapsed.axes['reg_year']])
+    fuel_labels = ['UNKNOWN' if pd.isna(fuel) else str(fuel) for fuel in collapsed.axes['fuel_type']]
+    counts = pd.DataFrame(collapsed.counts.reshape(len(index), -1), index=index, columns=fuel_labels)
+    return counts[counts.index.get_level_values('Zip').notna()]
+
+
+def ev_penetration(cube, ev_fuel_types=EV_FUEL_TYPES):
+    """
+    EV counts, EV share and year-over-year EV growth per Zip x reg_year
+
+    Parameters:
+    cube (CountCube): Registration counts with a fuel_type dimension
+    ev_fuel_types (list): fuel_type values counted as EVs
+
+    Returns:
+    DataFrame: Per-fuel counts plus 'total', 'ev', 'ev_share' (0-1) and
+        'ev_yoy_growth' (fractional change from the previous year; missing
+        when the previous year had no EVs)
+    """
+    counts = fuel_type_counts(cube)
+    ev_columns = [fuel for fuel in counts.columns if fuel in ev_fuel_types]
+
+    result = counts.copy()
+    result['total'] = counts.sum(axis=1)
+    result['ev'] = counts[ev_columns].sum(axis=1)
+    result['ev_share'] = result['ev'] / result['total'].where(result['total'] > 0)
+
+    # Looked up at reg_year - 1, so a year missing from the cube is not skipped over
+    zips, years = result.index.get_level_values(0), result.index.get_level_values(1)
+    previous_ev = result['ev'].reindex(pd.MultiIndex.from_arrays([zips, years - 1])).to_numpy()
+    previous_ev = pd.Series(previous_ev, index=result.index)
+    result['ev_yoy_growth'] = (result['ev'] - previous_ev) / previous_ev.where(previous_ev > 0)
+
+    return result[result['total'] > 0]
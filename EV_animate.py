@@ -0,0 +1,161 @@
+# Author: Jingni Zhang
+# Date Created: 05.06.2025
+
+import hashlib
+import json
+import os
+
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.animation import FuncAnimation
+from matplotlib.cm import ScalarMappable
+from matplotlib.colors import Normalize
+from PIL import Image
+
+from EV_boundaries import BOUNDARY_FILE, build_boundary_cache
+from EV_cache import CACHE_DIR
+from EV_profile import step
+from EV_tiles import TILE_STORE, add_basemap
+
+# One animation frame per year; chargers opened earlier appear in the first frame
+ANIMATION_YEARS = range(2010, 2026)
+ANIMATION_FILE = 'graphs/ev_chargers_by_year.gif'
+ANIMATION_FPS = 2
+ANIMATION_DPI = 100
+
+
+def background_cache_file(extent, pixel_width, alpha, boundary_file=BOUNDARY_FILE, cache_dir=CACHE_DIR):
+    """
+    PNG path keyed by the boundary version, tile store, extent, size and style
+    """
+    tiles = os.stat(TILE_STORE) if os.path.exists(TILE_STORE) else None
+    settings = {
+        'boundaries': build_boundary_cache(boundary_file, cache_dir)['key'],
+        'tiles': None if tiles is None else [tiles.st_size, tiles.st_mtime_ns],
+        'extent': [float(value) for value in extent],
+        'pixel_width': int(pixel_width),
+        'alpha': alpha
+    }
+    digest = hashlib.sha256(json.dumps(settings, sort_keys=True).encode()).hexdigest()[:24]
+    return os.path.join(cache_dir, 'backgrounds', f"background_{digest}.png")
+
+
+def render_background(counties, extent, pixel_width, alpha=0.5, boundary_file=BOUNDARY_FILE, cache_dir=CACHE_DIR):
+    """
+    Boundaries plus basemap rendered once to an RGBA raster and cached as PNG
+
+    Parameters:
+    counties (GeoDataFrame): Boundaries in EPSG:3857
+    extent (tuple): (min_x, min_y, max_x, max_y) to render
+    pixel_width (int): Raster width; the height follows the extent's aspect
+    alpha (float): Opacity of the boundaries and of the basemap
+    boundary_file (str): Shapefile the counties were loaded from, part of the cache key
+    cache_dir (str): Folder for the cached rasters
+
+    Returns:
+    ndarray: (rows, columns, 4) uint8 image covering the extent
+    """
+    cache_file = background_cache_file(extent, pixel_width, alpha, boundary_file, cache_dir)
+    if os.path.exists(cache_file):
+        with step('read_background'):
+            return np.asarray(Image.open(cache_file))
+
+    min_x, min_y, max_x, max_y = extent
+    pixel_height = int(round(pixel_width * (max_y - min_y) / (max_x - min_x)))
+
+    dpi = 100
+    fig = plt.figure(figsize=(pixel_width / dpi, pixel_height / dpi), dpi=dpi)
+    ax = fig.add_axes([0, 0, 1, 1])
+    counties.plot(ax=ax, color='lightgray', edgecolor='white', linewidth=0.5, alpha=alpha)
+    ax.set_xlim(min_x, max_x)
+    ax.set_ylim(min_y, max_y)
+    ax.set_aspect('auto')
+    add_basemap(ax, alpha=alpha)
+    ax.set_axis_off()
+
+    fig.canvas.draw()
+    image = np.asarray(fig.canvas.buffer_rgba()).copy()
+    plt.close(fig)
+
+    os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+    Image.fromarray(image).save(cache_file)
+    return image
+
+
+def draw_background(ax, image, extent):
+    """
+    Place a cached background raster on an axes and fix the map extent
+    """
+    min_x, min_y, max_x, max_y = extent
+    ax.imshow(image, extent=(min_x, max_x, min_y, max_y), interpolation='bilinear', zorder=0)
+    ax.set_xlim(min_x, max_x)
+    ax.set_ylim(min_y, max_y)
+    ax.set_aspect('equal')
+
+
+def sort_by_year(gdf, column='Year'):
+    """
+    Points with a year, sorted by it once so any year range is a contiguous slice
+
+    Returns:
+    tuple: (sorted GeoDataFrame, sorted year values)
+    """
+    ordered = gdf[gdf[column].notna()].sort_values(column, kind='stable')
+    return ordered, ordered[column].to_numpy(dtype=float)
+
+
+def year_range(ordered, year_values, start_year, end_year):
+    """
+    Slice of year-sorted points from start_year through end_year
+    """
+    start = np.searchsorted(year_values, start_year, side='left')
+    end = np.searchsorted(year_values, end_year, side='right')
+    return ordered.iloc[start:end]
+
+
+def animate_chargers(gdf, background, extent, years=ANIMATION_YEARS, output_file=ANIMATION_FILE,
+                     fps=ANIMATION_FPS, dpi=ANIMATION_DPI, markersize=20):
+    """
+    Animated map with one frame per year showing every charger open by then
+
+    The background is drawn once; each frame only adds the chargers opened
+    that year as a new scatter layer on top of the previous frames, so
+    earlier points are never redrawn from a filter.
+
+    Parameters:
+    gdf (GeoDataFrame): Chargers in EPSG:3857 with a Year column
+    background (ndarray): Raster from render_background() covering extent
+    extent (tuple): (min_x, min_y, max_x, max_y)
+    years (range): Frame years
+    output_file (str): .gif (Pillow) or .mp4 (needs ffmpeg)
+    fps (int): Frames per second
+    dpi (int): Output resolution
+    markersize (float): Marker area in points²
+    """
+    years = list(years)
+    ordered, year_values = sort_by_year(gdf)
+    # Frame i shows everything up to ends[i]; the first frame also takes earlier chargers
+    ends = np.searchsorted(year_values, years, side='right')
+    starts = np.concatenate([[0], ends[:-1]])
+
+    fig, ax = plt.subplots(1, figsize=(10, 8))
+    draw_background(ax, background, extent)
+    ax.set_axis_off()
+    norm = Normalize(vmin=years[0], vmax=years[-1])
+    fig.colorbar(ScalarMappable(norm=norm, cmap='viridis'), ax=ax, label='Installation Year',
+                 orientation='horizontal', shrink=0.6)
+    title = ax.set_title('', fontsize=16)
+    fig.tight_layout()
+
+    def draw_frame(i):
+        new = ordered.iloc[starts[i]:ends[i]]
+        ax.scatter(new.geometry.x, new.geometry.y, c=np.clip(new['Year'], years[0], None), cmap='viridis',
+                   norm=norm, s=markersize, edgecolors='black', linewidths=0.3, zorder=2)
+        title.set_text(f'EV Chargers Open by {years[i]} ({ends[i]} chargers)')
+        return []
+
+    animation = FuncAnimation(fig, draw_frame, frames=len(years), init_func=lambda: [], repeat=False)
+    writer = 'pillow' if output_file.endswith('.gif') else 'ffmpeg'
+    with step('encode_animation', rows_in=len(ordered), outputs=[output_file]):
+        animation.save(output_file, writer=writer, fps=fps, dpi=dpi)
+    plt.close(fig)
@@ -0,0 +1,76 @@
+# Author: Jingni Zhang
+# Date Created: 05.14.2025
+
+import importlib
+
+# Public functions of the analysis by step, mapped to the module defining them.
+# Nothing is imported until a name is first used, so `import EV_api` costs
+# nothing and the ingest, filter and aggregate steps load only pandas/numpy;
+# geopandas, scipy, matplotlib and seaborn load with the first spatial or
+# plotting function.
+API = {
+    # Ingest
+    'clean_ev_data': 'EV_reg',
+    'load_cleaned_ev_data': 'EV_reg',
+    'load_charger_data': 'EV_charger',
+    'refresh_station_store': 'EV_stations',
+    'load_stations': 'EV_stations',
+    'parse_dates': 'EV_dates',
+    'parse_date_columns': 'EV_dates',
+
+    # Filter
+    'load_filter_rules': 'EV_filters',
+    'compile_mask': 'EV_filters',
+    'filter_ev_records': 'EV_reg',
+
+    # Aggregate
+    'CountCube': 'EV_aggregate',
+    'fuel_type_counts': 'EV_aggregate',
+    'ev_penetration': 'EV_aggregate',
+    'active_fleet_by_month': 'EV_reg',
+    'summary_statistics': 'EV_charger',
+    'charger_zip_year_counts': 'EV_gap',
+    'gap_table': 'EV_gap',
+    'build_gap_table': 'EV_gap',
+
+    # Spatial (geopandas, scipy)
+    'load_boundaries': 'EV_boundaries',
+    'chargers_to_points': 'EV_spatial',
+    'charger_areas': 'EV_spatial',
+    'area_summary': 'EV_spatial',
+    'charger_accessibility': 'EV_access',
+    'point_density': 'EV_density',
+    'yearly_point_density': 'EV_density',
+
+    # Plot (matplotlib, seaborn)
+    'analyze_ev_data_basic': 'EV_reg',
+    'create_heatmap': 'EV_reg',
+    'create_zip_heatmap': 'EV_reg',
+    'create_ev_share_heatmap': 'EV_reg',
+    'plot_active_fleet': 'EV_reg',
+    'plot_cumulative_timeline': 'EV_charger',
+    'plot_installations_by_year': 'EV_charger',
+    'plot_chargers_by_zip': 'EV_charger',
+    'plot_density_map': 'EV_charger',
+    'plot_heatmap': 'EV_charger',
+    'plot_nyc_map': 'EV_charger',
+    'plot_period_panels': 'EV_charger',
+    'plot_animation': 'EV_charger'
+}
+
+__all__ = list(API)
+
+
+def __getattr__(name):
+    """
+    Import the defining module on first access and cache the function here
+    """
+    if name not in API:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(API[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(API))
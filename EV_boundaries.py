@@ -0,0 +1,121 @@
+# Author: Jingni Zhang
+# Date Created: 04.24.2025
+
+import json
+import os
+
+import geopandas as gpd
+from shapely.errors import GEOSException
+
+from EV_cache import CACHE_DIR, cache_key
+from EV_profile import step
+
+BOUNDARY_FILE = 'ny_tiger_shapfile/tl_2024_36_cousub.shp'
+BOUNDARY_CRS = 3857
+
+# Simplification tolerances in EPSG:3857 metres; 0 keeps full resolution
+SIMPLIFY_TOLERANCES = [0, 10, 50, 200]
+
+# Pixels across a 15-inch map saved at 300 dpi
+DEFAULT_PIXEL_WIDTH = 15 * 300
+
+
+def boundary_cache_paths(key, cache_dir=CACHE_DIR):
+    """
+    GeoParquet file per tolerance plus a JSON sidecar with the layer bounds
+    """
+    folder = os.path.join(cache_dir, 'boundaries')
+    files = {tolerance: os.path.join(folder, f"{key}_tol{tolerance}.parquet") for tolerance in SIMPLIFY_TOLERANCES}
+    return folder, files, os.path.join(folder, f"{key}.json")
+
+
+def simplify_boundaries(gdf, tolerance):
+    """
+    Simplify polygons without opening gaps or overlaps between neighbours
+
+    Uses coverage simplification (shared edges are simplified once) when
+    geopandas/GEOS support it, otherwise per-polygon topology-preserving
+    simplification.
+    """
+    if tolerance == 0:
+        return gdf
+    try:
+        geometry = gdf.geometry.simplify_coverage(tolerance)
+    except (AttributeError, NotImplementedError, ValueError, GEOSException):
+        geometry = gdf.geometry.simplify(tolerance, preserve_topology=True)
+    return gdf.set_geometry(geometry)
+
+
+def build_boundary_cache(file_path=BOUNDARY_FILE, cache_dir=CACHE_DIR):
+    """
+    Read the shapefile once, project it and write every level of detail
+
+    Returns:
+    dict: Sidecar metadata with the projected bounds and cache files, plus
+        the cache 'key' identifying this version of the boundaries
+    """
+    key = cache_key(file_path, {'crs': BOUNDARY_CRS, 'tolerances': SIMPLIFY_TOLERANCES}, cache_dir)
+    folder, files, sidecar = boundary_cache_paths(key, cache_dir)
+
+    if os.path.exists(sidecar):
+        with open(sidecar) as f:
+            return dict(json.load(f), key=key)
+
+    print(f"Building boundary cache from {file_path}...")
+    gdf = gpd.read_file(file_path).to_crs(epsg=BOUNDARY_CRS)
+    os.makedirs(folder, exist_ok=True)
+
+    for tolerance, path in files.items():
+        simplified = simplify_boundaries(gdf, tolerance)
+        simplified.to_parquet(path)
+        vertices = simplified.geometry.count_coordinates().sum()
+        print(f"  tolerance {tolerance} m: {vertices} vertices -> {path}")
+
+    metadata = {'bounds': [float(value) for value in gdf.total_bounds],
+                'files': {str(tolerance): path for tolerance, path in files.items()}}
+    with open(sidecar, 'w') as f:
+        json.dump(metadata, f, indent=2)
+    return dict(metadata, key=key)
+
+
+def select_tolerance(extent_width, pixel_width=DEFAULT_PIXEL_WIDTH):
+    """
+    Largest tolerance no bigger than one output pixel for the given extent
+    """
+    pixel_size = extent_width / pixel_width
+    return max(tolerance for tolerance in SIMPLIFY_TOLERANCES if tolerance <= pixel_size)
+
+
+def load_boundaries(extent=None, pixel_width=DEFAULT_PIXEL_WIDTH, tolerance=None, file_path=BOUNDARY_FILE,
+                    cache_dir=CACHE_DIR):
+    """
+    Load projected county subdivisions at a level of detail suited to the map
+
+    Parameters:
+    extent (tuple or None): (min_x, max_x, min_y, max_y) in EPSG:3857 to crop
+        to, e.g. the NYC bounds; None loads the whole state
+    pixel_width (int): Output width in pixels, used to pick the tolerance
+    tolerance (int or None): Force a level from SIMPLIFY_TOLERANCES, e.g. 0
+        for full resolution in spatial joins
+    file_path (str): TIGER/Line shapefile
+    cache_dir (str): Folder for the GeoParquet cache
+
+    Returns:
+    GeoDataFrame: Boundaries in EPSG:3857
+    """
+    metadata = build_boundary_cache(file_path, cache_dir)
+
+    if extent is None:
+        min_x, min_y, max_x, max_y = metadata['bounds']
+    else:
+        min_x, max_x, min_y, max_y = extent
+    if tolerance is None:
+        tolerance = select_tolerance(max_x - min_x, pixel_width)
+
+    with step('load_boundaries') as record:
+        gdf = gpd.read_parquet(metadata['files'][str(tolerance)])
+        if extent is not None:
+            # Keep polygons that intersect the extent
+            gdf = gdf.cx[min_x:max_x, min_y:max_y]
+        record['rows_out'] = len(gdf)
+    return gdf
@@ -0,0 +1,91 @@
+# Author: Jingni Zhang
+# Date Created: 04.12.2025
+
+import hashlib
+import json
+import os
+
+CACHE_DIR = 'cache'
+MANIFEST_FILE = 'manifest.json'
+
+
+def file_sha256(file_path, block_size=1 << 20):
+    """
+    Hash the full contents of a file in fixed-size blocks
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_manifest(cache_dir=CACHE_DIR):
+    """
+    Load the fingerprint manifest, or an empty one if it does not exist yet
+    """
+    manifest_path = os.path.join(cache_dir, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path) as f:
+        return json.load(f)
+
+
+def save_manifest(manifest, cache_dir=CACHE_DIR):
+    """
+    Write the fingerprint manifest back to the cache folder
+
+    The file is written under a temporary name and renamed, so worker
+    processes reading it never see a partly written manifest.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    manifest_path = os.path.join(cache_dir, MANIFEST_FILE)
+    temp_path = f"{manifest_path}.{os.getpid()}"
+    with open(temp_path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(temp_path, manifest_path)
+
+
+def file_fingerprint(file_path, cache_dir=CACHE_DIR):
+    """
+    Fingerprint a source file by size, mtime and content hash
+
+    The content hash is only recomputed when size or mtime differ from the
+    manifest, so an unchanged multi-GB file is not re-read on every run.
+
+    Parameters:
+    file_path (str): Source file to fingerprint
+    cache_dir (str): Folder holding the manifest
+
+    Returns:
+    dict: {'size', 'mtime', 'sha256'}
+    """
+    stat = os.stat(file_path)
+    manifest = load_manifest(cache_dir)
+    key = os.path.abspath(file_path)
+    entry = manifest.get(key)
+
+    if entry and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime:
+        return entry
+
+    print(f"Hashing {file_path}...")
+    entry = {'size': stat.st_size, 'mtime': stat.st_mtime, 'sha256': file_sha256(file_path)}
+    manifest[key] = entry
+    save_manifest(manifest, cache_dir)
+    return entry
+
+
+def config_hash(config):
+    """
+    Hash a JSON-serializable configuration (e.g. filter settings)
+    """
+    payload = json.dumps(config, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def cache_key(file_path, config, cache_dir=CACHE_DIR):
+    """
+    Build a short cache key from the source fingerprint and a configuration
+    """
+    fingerprint = file_fingerprint(file_path, cache_dir)
+    return f"{fingerprint['sha256'][:16]}_{config_hash(config)[:8]}"
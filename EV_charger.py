@@ -2,64 +2,26 @@
 # Date Created: 04.10.2025
 
 import pandas as pd
-import matplotlib.pyplot as plt
-import numpy as np
-import seaborn as sns
-from datetime import datetime
+import argparse
 import os
-import geopandas as gpd
-import contextily as ctx
-from shapely.geometry import Point
-
-os.makedirs('data', exist_ok=True)
-os.makedirs('graphs', exist_ok=True)
-
-# Import data
-df = pd.read_csv('alt_fuel_stations.csv')
-
-# Filter for Electric charging stations (ELEC)
-elec_df = df[df['Fuel Type Code'] == 'ELEC'].copy()
-
-# Convert date to datetime and extract year
-elec_df['Open Date'] = pd.to_datetime(elec_df['Open Date'], format='mixed', errors='coerce')
-elec_df['Year'] = elec_df['Open Date'].dt.year
-
-# Remove rows with missing coordinates for spatial analysis
-elec_df_spatial = elec_df.dropna(subset=['Latitude', 'Longitude']).copy()
-
-# Create a line graph showing the cumulative number of chargers by year
-yearly_counts = elec_df['Year'].value_counts().sort_index()
-yearly_cumulative = yearly_counts.cumsum()
-
-plt.figure(figsize=(12, 8))
-plt.plot(yearly_cumulative.index, yearly_cumulative.values, marker='o', linewidth=2)
-
-# Add value labels on data points
-for year, count in zip(yearly_cumulative.index, yearly_cumulative.values):
-    plt.text(year, count + 50, f'{int(count)}', ha='center', va='bottom')
-
-plt.title('Cumulative Number of Electric Vehicle Chargers Over Time', fontsize=16)
-plt.xlabel('Year', fontsize=14)
-plt.ylabel('Number of Chargers', fontsize=14)
-plt.grid(True, alpha=0.3)
-plt.tight_layout()
-plt.savefig('graphs/ev_chargers_timeline.png', dpi=300)
-plt.close()
-
-# Create a bar chart showing chargers installed each year
-plt.figure(figsize=(16, 10))
-bars = plt.bar(yearly_counts.index, yearly_counts.values, color='skyblue', edgecolor='navy')
-
-# Add value labels on top of bars
-for bar in bars:
-    height = bar.get_height()
-    plt.text(bar.get_x() + bar.get_width()/2., height + 0.5,
-            str(int(height)), ha='center', va='bottom', fontsize=10)
-
-plt.xlabel('Year', fontsize=14)
-plt.ylabel('Number of Chargers Installed', fontsize=14)
-plt.title('EV Charger Installations by Year in New York', fontsize=18, pad=20)
-plt.grid(axis='y', alpha=0.3)
+from EV_gap import charger_zip_year_counts
+from EV_parallel import FIGURE_WORKERS, figure_job, run_figure_jobs, share_input
+from EV_profile import add_arguments, run_instrumented, savefig, step
+from EV_stations import STATION_DIR, load_stations, refresh_station_store
+
+# Loading and summarizing the charger table needs only pandas; geopandas,
+# matplotlib and the map helpers are imported inside the functions that
+# draw or join, so importing this module stays cheap
+
+# Map style per figure: 'choropleth' shades county subdivisions by charger
+# density, 'points' draws one marker per charger colored by installation year,
+# 'raster' draws the same markers aggregated into output pixels (one image
+# instead of one artist per charger, for large point sets)
+MAP_STYLES = {
+    'density': 'choropleth',
+    'nyc': 'choropleth',
+    'panels': 'raster'
+}
 
 # Define year ranges with colors for visual grouping
 year_ranges = [
@@ -69,225 +31,493 @@ year_ranges = [
     ('2022-2024', 2022, 2024, 'red')
 ]
 
-# Highlight the year ranges with colored spans
-for title, start_year, end_year, color in year_ranges:
-    plt.axvspan(start_year-0.5, end_year+0.5, alpha=0.2, color=color)
-    plt.text((start_year+end_year)/2, plt.gca().get_ylim()[1]*0.95, title, 
-            ha='center', va='top', fontsize=12, fontweight='bold')
-
-plt.tight_layout()
-plt.savefig('graphs/ev_chargers_by_year.png', dpi=300)
-plt.close()
-
-# Create a bar chart showing the number of ELEC chargers by ZIP code
-zip_counts = elec_df['ZIP'].value_counts().head(20)  # Top 20 ZIP codes
-
-plt.figure(figsize=(16, 10))
-bars = plt.bar(range(len(zip_counts)), zip_counts.values, color='skyblue')
-plt.xticks(range(len(zip_counts)), zip_counts.index, rotation=45, ha='right')
-
-# Add value labels on top of bars
-for i, bar in enumerate(bars):
-    height = bar.get_height()
-    plt.text(bar.get_x() + bar.get_width()/2., height + 0.1, 
-             str(int(height)), ha='center', va='bottom')
-
-plt.title('Number of Electric Vehicle Chargers by ZIP Code (Top 20)', fontsize=16)
-plt.xlabel('ZIP Code', fontsize=14)
-plt.ylabel('Number of Chargers', fontsize=14)
-plt.grid(axis='y', alpha=0.3)
-plt.tight_layout()
-plt.savefig('graphs/ev_chargers_by_zip.png', dpi=300)
-plt.close()
-
-# Create spatial visualizations using US Census TIGER/Line Shapefiles
-# Load NY shapefile data
-ny_counties = gpd.read_file('ny_tiger_shapfile/tl_2024_36_cousub.shp')
-
-# Convert EV charger data to GeoDataFrame
-geometry = [Point(xy) for xy in zip(elec_df_spatial.Longitude, elec_df_spatial.Latitude)]
-gdf_chargers = gpd.GeoDataFrame(elec_df_spatial, geometry=geometry, crs="EPSG:4326")
-
-# Project both datasets to Web Mercator for better visualization
-ny_counties = ny_counties.to_crs(epsg=3857)
-gdf_chargers = gdf_chargers.to_crs(epsg=3857)
-
-# 4.1 Create EV charger density map by county
-fig, ax = plt.subplots(1, figsize=(15, 12))
-
-# Plot counties with a light color
-ny_counties.plot(ax=ax, color='lightgray', edgecolor='white', linewidth=0.5)
-
-# Plot charger points with color based on year
-gdf_chargers.plot(
-    ax=ax,
-    column='Year',
-    cmap='viridis',
-    markersize=30,
-    legend=True,
-    legend_kwds={'label': 'Installation Year', 'orientation': 'horizontal'}
-)
-
-# Add contextily basemap for reference
-ctx.add_basemap(ax, source=ctx.providers.CartoDB.Positron, alpha=0.5)
-
-# Set title and remove axes
-ax.set_title('EV Charger Density in New York', fontsize=20, pad=20)
-ax.set_axis_off()
-
-plt.tight_layout()
-plt.savefig('graphs/ev_chargers_density.png', dpi=300)
-plt.close()
-
-# Create a heatmap showing charger density
-fig, ax = plt.subplots(1, figsize=(15, 12))
-
-# Plot counties 
-ny_counties.plot(ax=ax, color='lightgray', edgecolor='white', linewidth=0.5)
-
-# Create a heatmap-like visualization using kernel density estimation
-sns.kdeplot(
-    x=gdf_chargers.geometry.x,
-    y=gdf_chargers.geometry.y,
-    cmap='Reds',
-    shade=True,
-    bw_adjust=0.5,
-    ax=ax
-)
-
-# Add contextily basemap
-ctx.add_basemap(ax, source=ctx.providers.CartoDB.Positron, alpha=0.3)
-
-# Set title and remove axes
-ax.set_title('EV Charger Heatmap in New York', fontsize=20, pad=20)
-ax.set_axis_off()
-
-plt.tight_layout()
-plt.savefig('graphs/ev_chargers_heatmap.png', dpi=300)
-plt.close()
-
-# 4.3 Create a map focused on NYC area
-fig, ax = plt.subplots(1, figsize=(15, 12))
-
 # Get NYC area bounds (approximate)
 nyc_bounds = {
     'min_lon': -74.3, 'max_lon': -73.6,
     'min_lat': 40.5, 'max_lat': 40.9
 }
 
-# Convert bounds to Web Mercator
-nyc_gdf = gpd.GeoDataFrame(
-    geometry=[Point(nyc_bounds['min_lon'], nyc_bounds['min_lat']), 
-              Point(nyc_bounds['max_lon'], nyc_bounds['max_lat'])],
-    crs="EPSG:4326"
-).to_crs(epsg=3857)
+# Place named in the figure titles and boundaries drawn; EV_states.py passes each state's own
+PLACE = 'New York'
+NYC_AREA = 'New York City Area'
 
-nyc_bounds_3857 = {
-    'min_x': nyc_gdf.geometry[0].x, 'max_x': nyc_gdf.geometry[1].x,
-    'min_y': nyc_gdf.geometry[0].y, 'max_y': nyc_gdf.geometry[1].y
-}
+# Charger columns the map figures need, shared with the rendering workers
+MAP_COLUMNS = ['ID', 'Latitude', 'Longitude', 'Year', 'x', 'y']
 
-# Filter counties in NYC area
-nyc_counties = ny_counties.cx[
-    nyc_bounds_3857['min_x']:nyc_bounds_3857['max_x'],
-    nyc_bounds_3857['min_y']:nyc_bounds_3857['max_y']
-]
 
-# Filter chargers in NYC area
-nyc_chargers = gdf_chargers.cx[
-    nyc_bounds_3857['min_x']:nyc_bounds_3857['max_x'],
-    nyc_bounds_3857['min_y']:nyc_bounds_3857['max_y']
-]
+def load_charger_data(file_path='alt_fuel_stations.csv', columns=None, store_dir=STATION_DIR):
+    """
+    Electric chargers in the latest AFDC download, with parsed dates and the opening year
 
-# Plot counties
-nyc_counties.plot(ax=ax, color='lightgray', edgecolor='white', linewidth=0.5)
-
-# Plot charger points
-nyc_chargers.plot(
-    ax=ax,
-    column='Year',
-    cmap='viridis',
-    markersize=50,
-    alpha=0.7,
-    edgecolor='black',
-    linewidth=0.5,
-    legend=True
-)
-
-# Add contextily basemap
-ctx.add_basemap(ax, source=ctx.providers.CartoDB.Positron)
-
-# Set title and remove axes
-ax.set_title('EV Chargers in New York City Area', fontsize=20, pad=20)
-ax.set_axis_off()
-
-plt.tight_layout()
-plt.savefig('graphs/ev_chargers_nyc.png', dpi=300)
-plt.close()
-
-# Create panels showing charger installation by year periods
-fig, axes = plt.subplots(2, 2, figsize=(20, 16))
-fig.suptitle('EV Chargers by Installation Year Period', fontsize=24, y=0.98)
-
-# Flatten axes for easier iteration
-axes = axes.flatten()
-
-for idx, (title, start_year, end_year, color) in enumerate(year_ranges):
-    ax = axes[idx]
-    
-    # Filter data for the year range
-    year_data = gdf_chargers[(gdf_chargers['Year'] >= start_year) & (gdf_chargers['Year'] <= end_year)]
-    
-    # Plot counties
-    ny_counties.plot(ax=ax, color='lightgray', edgecolor='white', linewidth=0.5, alpha=0.5)
-    
-    # Add contextily basemap
-    ctx.add_basemap(ax, source=ctx.providers.CartoDB.Positron, alpha=0.5)
-    
-    # Plot points for this period
-    if len(year_data) > 0:
-        year_data.plot(
-            ax=ax, 
-            column='Year', 
-            cmap='viridis', 
+    The download is first upserted into the station store (EV_stations.py),
+    which reads only the columns in STATION_COLUMNS and rewrites only new or
+    changed stations; the chargers are then read from its Parquet file.
+
+    Parameters:
+    file_path (str): AFDC alt_fuel_stations.csv download
+    columns (list or None): Store columns to read (Year needs 'Open Date'); None reads all
+    store_dir (str): Folder holding the station store
+    """
+    refresh_station_store(file_path, store_dir)
+
+    with step('read_stations') as record:
+        elec_df = load_stations(columns, store_dir)
+        record['rows_out'] = len(elec_df)
+
+    # Opening year of each charger
+    if 'Open Date' in elec_df.columns:
+        elec_df['Year'] = elec_df['Open Date'].dt.year
+    return elec_df
+
+
+def map_frame(gdf_chargers):
+    """
+    Plain table of the projected chargers for sharing with figure workers
+    """
+    frame = pd.DataFrame(gdf_chargers.drop(columns='geometry'))
+    frame['x'] = gdf_chargers.geometry.x.to_numpy()
+    frame['y'] = gdf_chargers.geometry.y.to_numpy()
+    return frame[MAP_COLUMNS].reset_index(drop=True)
+
+
+def map_points(chargers):
+    """
+    GeoDataFrame of the projected chargers from a map_frame() table
+    """
+    import geopandas as gpd
+    from EV_boundaries import BOUNDARY_CRS
+
+    return gpd.GeoDataFrame(chargers, geometry=gpd.points_from_xy(chargers['x'], chargers['y']),
+                            crs=f"EPSG:{BOUNDARY_CRS}")
+
+
+def nyc_extent(bounds=nyc_bounds):
+    """
+    NYC bounds (or another lon/lat box like nyc_bounds) converted to Web Mercator (min_x, max_x, min_y, max_y)
+    """
+    import geopandas as gpd
+    from shapely.geometry import Point
+
+    # Convert bounds to Web Mercator
+    nyc_gdf = gpd.GeoDataFrame(
+        geometry=[Point(bounds['min_lon'], bounds['min_lat']),
+                  Point(bounds['max_lon'], bounds['max_lat'])],
+        crs="EPSG:4326"
+    ).to_crs(epsg=3857)
+
+    return (nyc_gdf.geometry[0].x, nyc_gdf.geometry[1].x,
+            nyc_gdf.geometry[0].y, nyc_gdf.geometry[1].y)
+
+
+def plot_cumulative_timeline(yearly_counts, output_file='graphs/ev_chargers_timeline.png'):
+    """
+    Create a line graph showing the cumulative number of chargers by year
+    """
+    import matplotlib.pyplot as plt
+
+    yearly_cumulative = yearly_counts.cumsum()
+
+    plt.figure(figsize=(12, 8))
+    plt.plot(yearly_cumulative.index, yearly_cumulative.values, marker='o', linewidth=2)
+
+    # Add value labels on data points
+    for year, count in zip(yearly_cumulative.index, yearly_cumulative.values):
+        plt.text(year, count + 50, f'{int(count)}', ha='center', va='bottom')
+
+    plt.title('Cumulative Number of Electric Vehicle Chargers Over Time', fontsize=16)
+    plt.xlabel('Year', fontsize=14)
+    plt.ylabel('Number of Chargers', fontsize=14)
+    plt.grid(True, alpha=0.3)
+    plt.tight_layout()
+    savefig(output_file, dpi=300)
+    plt.close()
+
+
+def plot_installations_by_year(yearly_counts, place=PLACE, output_file='graphs/ev_chargers_by_year.png'):
+    """
+    Create a bar chart showing chargers installed each year
+    """
+    import matplotlib.pyplot as plt
+
+    plt.figure(figsize=(16, 10))
+    bars = plt.bar(yearly_counts.index, yearly_counts.values, color='skyblue', edgecolor='navy')
+
+    # Add value labels on top of bars
+    for bar in bars:
+        height = bar.get_height()
+        plt.text(bar.get_x() + bar.get_width()/2., height + 0.5,
+                str(int(height)), ha='center', va='bottom', fontsize=10)
+
+    plt.xlabel('Year', fontsize=14)
+    plt.ylabel('Number of Chargers Installed', fontsize=14)
+    plt.title(f'EV Charger Installations by Year in {place}', fontsize=18, pad=20)
+    plt.grid(axis='y', alpha=0.3)
+
+    # Highlight the year ranges with colored spans
+    for title, start_year, end_year, color in year_ranges:
+        plt.axvspan(start_year-0.5, end_year+0.5, alpha=0.2, color=color)
+        plt.text((start_year+end_year)/2, plt.gca().get_ylim()[1]*0.95, title,
+                ha='center', va='top', fontsize=12, fontweight='bold')
+
+    plt.tight_layout()
+    savefig(output_file, dpi=300)
+    plt.close()
+
+
+def plot_chargers_by_zip(zip_counts, output_file='graphs/ev_chargers_by_zip.png'):
+    """
+    Create a bar chart showing the number of ELEC chargers by ZIP code
+    """
+    import matplotlib.pyplot as plt
+
+    plt.figure(figsize=(16, 10))
+    bars = plt.bar(range(len(zip_counts)), zip_counts.values, color='skyblue')
+    plt.xticks(range(len(zip_counts)), zip_counts.index, rotation=45, ha='right')
+
+    # Add value labels on top of bars
+    for i, bar in enumerate(bars):
+        height = bar.get_height()
+        plt.text(bar.get_x() + bar.get_width()/2., height + 0.1,
+                 str(int(height)), ha='center', va='bottom')
+
+    plt.title('Number of Electric Vehicle Chargers by ZIP Code (Top 20)', fontsize=16)
+    plt.xlabel('ZIP Code', fontsize=14)
+    plt.ylabel('Number of Chargers', fontsize=14)
+    plt.grid(axis='y', alpha=0.3)
+    plt.tight_layout()
+    savefig(output_file, dpi=300)
+    plt.close()
+
+
+def plot_density_map(chargers, area_table, style=MAP_STYLES['density'], place=PLACE, boundary_file=None,
+                     output_file='graphs/ev_chargers_density.png'):
+    """
+    Create EV charger density map by county
+
+    Parameters:
+    chargers (DataFrame): Projected chargers from map_frame()
+    area_table (DataFrame): Per-subdivision summary without geometry
+    style (str): 'choropleth', 'points' or 'raster'
+    place (str): Name in the title
+    boundary_file (str or None): County subdivision shapefile; None uses New York's
+    output_file (str): PNG to write
+    """
+    import matplotlib.pyplot as plt
+    from EV_boundaries import BOUNDARY_FILE, load_boundaries
+    from EV_spatial import plot_choropleth, plot_points
+    from EV_tiles import add_basemap
+
+    # Load NY boundaries at the statewide level of detail
+    ny_counties = load_boundaries(file_path=boundary_file or BOUNDARY_FILE)
+
+    fig, ax = plt.subplots(1, figsize=(15, 12))
+
+    if style == 'choropleth':
+        # Shade county subdivisions by chargers per km²
+        plot_choropleth(ax, ny_counties[['GEOID', 'geometry']].merge(area_table, on='GEOID'))
+    else:
+        # Plot counties with a light color
+        ny_counties.plot(ax=ax, color='lightgray', edgecolor='white', linewidth=0.5)
+
+        # Plot charger points with color based on year
+        plot_points(
+            ax,
+            map_points(chargers),
+            style,
+            column='Year',
+            cmap='viridis',
             markersize=30,
-            edgecolor='black', 
-            linewidth=0.5, 
-            alpha=0.8,
-            legend=True, 
-            legend_kwds={'label': 'Year', 'orientation': 'horizontal'}
+            legend=True,
+            legend_kwds={'label': 'Installation Year', 'orientation': 'horizontal'}
         )
-    
-    ax.set_title(f'{title}\n({len(year_data)} chargers)', fontsize=16, pad=10)
+
+    # Add basemap for reference (local tile store, see EV_tiles.py)
+    add_basemap(ax, alpha=0.5)
+
+    # Set title and remove axes
+    ax.set_title(f'EV Charger Density in {place}', fontsize=20, pad=20)
     ax.set_axis_off()
 
-plt.tight_layout()
-plt.savefig('graphs/ev_chargers_by_year_panels.png', dpi=300)
-plt.close()
-
-# Save processed data
-elec_df.to_csv('data/electric_charging_stations.csv', index=False)
-
-# Create summary statistics
-summary = {
-    'Total Electric Chargers': len(elec_df),
-    'Number of Unique ZIP Codes': elec_df['ZIP'].nunique(),
-    'Earliest Open Date': elec_df['Open Date'].min(),
-    'Latest Open Date': elec_df['Open Date'].max(),
-    'Most Common ZIP': zip_counts.index[0],
-    'Chargers in Most Common ZIP': zip_counts.values[0]
-}
+    plt.tight_layout()
+    savefig(output_file, dpi=300)
+    plt.close()
+
+
+def plot_heatmap(chargers, place=PLACE, boundary_file=None, output_file='graphs/ev_chargers_heatmap.png'):
+    """
+    Create a heatmap showing charger density
+    """
+    import matplotlib.pyplot as plt
+    from EV_boundaries import BOUNDARY_FILE, load_boundaries
+    from EV_density import plot_density, point_density
+    from EV_tiles import add_basemap
+
+    ny_counties = load_boundaries(file_path=boundary_file or BOUNDARY_FILE)
+
+    fig, ax = plt.subplots(1, figsize=(15, 12))
+
+    # Plot counties
+    ny_counties.plot(ax=ax, color='lightgray', edgecolor='white', linewidth=0.5)
+
+    # Create a heatmap-like visualization using kernel density estimation
+    # (binned points convolved with a Gaussian kernel via FFT, cached in cache/density/)
+    density_extent = ny_counties.total_bounds
+    plot_density(ax, point_density(map_points(chargers), density_extent, bw_adjust=0.5), density_extent)
+
+    # Add basemap from the local tile store
+    add_basemap(ax, alpha=0.3)
+
+    # Set title and remove axes
+    ax.set_title(f'EV Charger Heatmap in {place}', fontsize=20, pad=20)
+    ax.set_axis_off()
+
+    plt.tight_layout()
+    savefig(output_file, dpi=300)
+    plt.close()
+
+
+def plot_nyc_map(chargers, area_table, style=MAP_STYLES['nyc'], bounds=nyc_bounds, area_name=NYC_AREA,
+                 boundary_file=None, output_file='graphs/ev_chargers_nyc.png'):
+    """
+    Create a map focused on NYC area (or another lon/lat box given as bounds)
+    """
+    import matplotlib.pyplot as plt
+    from EV_boundaries import BOUNDARY_FILE, load_boundaries
+    from EV_spatial import plot_choropleth, plot_points
+    from EV_tiles import add_basemap
+
+    fig, ax = plt.subplots(1, figsize=(15, 12))
+
+    min_x, max_x, min_y, max_y = nyc_extent(bounds)
+
+    # Load counties in NYC area at the finer level of detail for the crop
+    nyc_counties = load_boundaries(extent=(min_x, max_x, min_y, max_y), file_path=boundary_file or BOUNDARY_FILE)
+
+    if style == 'choropleth':
+        # Shade NYC county subdivisions (finer boundaries) by chargers per km²
+        nyc_stats = nyc_counties[['GEOID', 'geometry']].merge(area_table, on='GEOID')
+        plot_choropleth(ax, nyc_stats)
+    else:
+        # Filter chargers in NYC area
+        nyc_chargers = map_points(chargers).cx[min_x:max_x, min_y:max_y]
+
+        # Plot counties
+        nyc_counties.plot(ax=ax, color='lightgray', edgecolor='white', linewidth=0.5)
+
+        # Plot charger points
+        plot_points(
+            ax,
+            nyc_chargers,
+            style,
+            column='Year',
+            cmap='viridis',
+            markersize=50,
+            alpha=0.7,
+            edgecolor='black',
+            linewidth=0.5,
+            legend=True
+        )
+
+    # Add basemap from the local tile store
+    add_basemap(ax)
+
+    # Set title and remove axes
+    ax.set_title(f'EV Chargers in {area_name}', fontsize=20, pad=20)
+    ax.set_axis_off()
 
-summary_df = pd.DataFrame([summary])
-summary_df.to_csv('data/summary_statistics.csv', index=False)
-
-print("Analysis complete! Graphs and data exported successfully.")
-print(f"Total electric chargers: {summary['Total Electric Chargers']}")
-print("Files created:")
-print("- ev_chargers_timeline.png (cumulative chargers over time)")
-print("- ev_chargers_by_year.png (bar chart by year)")
-print("- ev_chargers_by_zip.png (bar chart by ZIP code)")
-print("- ev_chargers_density.png (density map)")
-print("- ev_chargers_heatmap.png (heatmap visualization)")
-print("- ev_chargers_nyc.png (NYC area focus)")
-print("- ev_chargers_by_year_panels.png (installation by time period)")
\ No newline at end of file
+    plt.tight_layout()
+    savefig(output_file, dpi=300)
+    plt.close()
+
+
+def plot_period_panels(chargers, style=MAP_STYLES['panels'], boundary_file=None,
+                       output_file='graphs/ev_chargers_by_year_panels.png'):
+    """
+    Create panels showing charger installation by year periods
+    """
+    import matplotlib.pyplot as plt
+    from EV_animate import draw_background, render_background, sort_by_year, year_range
+    from EV_boundaries import BOUNDARY_FILE, load_boundaries
+    from EV_spatial import plot_points
+
+    fig, axes = plt.subplots(2, 2, figsize=(20, 16))
+    fig.suptitle('EV Chargers by Installation Year Period', fontsize=24, y=0.98)
+
+    # Flatten axes for easier iteration
+    axes = axes.flatten()
+
+    # Each panel is about half the figure width, so a coarser level of detail suffices
+    boundary_file = boundary_file or BOUNDARY_FILE
+    panel_counties = load_boundaries(pixel_width=10 * 300, file_path=boundary_file)
+
+    # Render counties plus basemap once to a cached raster shared by all panels
+    panel_extent = panel_counties.total_bounds
+    panel_background = render_background(panel_counties, panel_extent, pixel_width=10 * 300,
+                                          boundary_file=boundary_file)
+
+    # Sort chargers by year once; each period is then a contiguous slice
+    chargers_by_year, charger_years = sort_by_year(map_points(chargers))
+
+    for idx, (title, start_year, end_year, color) in enumerate(year_ranges):
+        ax = axes[idx]
+
+        # Chargers installed in the year range
+        year_data = year_range(chargers_by_year, charger_years, start_year, end_year)
+
+        # Counties and basemap from the cached background
+        draw_background(ax, panel_background, panel_extent)
+
+        # Plot points for this period
+        if len(year_data) > 0:
+            plot_points(
+                ax,
+                year_data,
+                style,
+                column='Year',
+                cmap='viridis',
+                markersize=30,
+                edgecolor='black',
+                linewidth=0.5,
+                alpha=0.8,
+                legend=True,
+                legend_kwds={'label': 'Year', 'orientation': 'horizontal'}
+            )
+
+        ax.set_title(f'{title}\n({len(year_data)} chargers)', fontsize=16, pad=10)
+        ax.set_axis_off()
+
+    plt.tight_layout()
+    savefig(output_file, dpi=300)
+    plt.close()
+
+
+def plot_animation(chargers, boundary_file=None, output_file='graphs/ev_chargers_by_year.gif'):
+    """
+    Animated map with one frame per year (2010-2025), adding each year's chargers to the previous frame
+    """
+    from EV_animate import animate_chargers, render_background
+    from EV_boundaries import BOUNDARY_FILE, load_boundaries
+
+    boundary_file = boundary_file or BOUNDARY_FILE
+    panel_counties = load_boundaries(pixel_width=10 * 300, file_path=boundary_file)
+    panel_extent = panel_counties.total_bounds
+    animation_background = render_background(panel_counties, panel_extent, pixel_width=1000,
+                                             boundary_file=boundary_file)
+    animate_chargers(map_points(chargers), animation_background, panel_extent, output_file=output_file)
+
+
+def summary_statistics(elec_df):
+    """
+    Create summary statistics
+    """
+    zip_counts = elec_df['ZIP'].value_counts()
+    summary = {
+        'Total Electric Chargers': len(elec_df),
+        'Number of Unique ZIP Codes': elec_df['ZIP'].nunique(),
+        'Earliest Open Date': elec_df['Open Date'].min(),
+        'Latest Open Date': elec_df['Open Date'].max(),
+        'Most Common ZIP': zip_counts.index[0],
+        'Chargers in Most Common ZIP': zip_counts.values[0]
+    }
+    return pd.DataFrame([summary])
+
+
+def main(workers=FIGURE_WORKERS):
+    """
+    Main function to run the charging station analysis
+
+    Parameters:
+    workers (int): Processes rendering the figures in parallel; 1 renders them one after another
+    """
+    from EV_access import charger_accessibility
+    from EV_boundaries import load_boundaries
+    from EV_spatial import area_summary, charger_areas, chargers_to_points
+
+    os.makedirs('data', exist_ok=True)
+    os.makedirs('graphs', exist_ok=True)
+
+    elec_df = load_charger_data()
+
+    # Remove rows with missing coordinates for spatial analysis
+    elec_df_spatial = elec_df.dropna(subset=['Latitude', 'Longitude']).copy()
+
+    yearly_counts = elec_df['Year'].value_counts().sort_index()
+    zip_counts = elec_df['ZIP'].value_counts().head(20)  # Top 20 ZIP codes
+
+    # Create spatial visualizations using US Census TIGER/Line Shapefiles
+    # Load NY boundaries, already projected to Web Mercator and simplified to the
+    # statewide level of detail (GeoParquet cache built from the shapefile on first use)
+    ny_counties = load_boundaries()
+
+    # Convert EV charger data to a GeoDataFrame projected to Web Mercator to match the boundaries
+    gdf_chargers = chargers_to_points(elec_df_spatial)
+
+    # Assign every charger to its county subdivision (STR-tree spatial join, cached
+    # by charger ID) and summarize chargers, densities and ports per area
+    with step('spatial_join', rows_in=len(gdf_chargers), outputs=['data/chargers_by_cousub.csv']) as record:
+        area_ids = charger_areas(gdf_chargers)
+        area_stats = area_summary(gdf_chargers, ny_counties, area_ids)
+        area_table = area_stats.drop(columns='geometry')
+        area_table.to_csv('data/chargers_by_cousub.csv', index=False)
+        record['rows_out'] = len(area_table)
+
+    # Distance from every county subdivision (and ZIP code, given the ZCTA file) to
+    # its nearest chargers in each year, for any, Level 2 and DC fast chargers (KD-tree queries)
+    with step('accessibility', rows_in=len(gdf_chargers),
+              outputs=['data/charger_access_by_cousub_year.csv', 'data/charger_access_by_zip_year.csv']) as record:
+        access = charger_accessibility(gdf_chargers)
+        access['cousub'].to_csv('data/charger_access_by_cousub_year.csv', index=False)
+        if access['zip'] is not None:
+            access['zip'].to_csv('data/charger_access_by_zip_year.csv', index=False)
+        record['rows_out'] = len(access['cousub'])
+
+    # Render the figures, in parallel when workers > 1; the charger table is
+    # written once as Arrow and memory-mapped by every map job
+    chargers = share_input(map_frame(gdf_chargers), 'charger_map')
+    run_figure_jobs([
+        figure_job('ev_chargers_by_year_panels.png', plot_period_panels, chargers),
+        figure_job('ev_chargers_density.png', plot_density_map, chargers, area_table),
+        figure_job('ev_chargers_nyc.png', plot_nyc_map, chargers, area_table),
+        figure_job('ev_chargers_heatmap.png', plot_heatmap, chargers),
+        figure_job('ev_chargers_by_year.gif', plot_animation, chargers),
+        figure_job('ev_chargers_timeline.png', plot_cumulative_timeline, yearly_counts),
+        figure_job('ev_chargers_by_year.png', plot_installations_by_year, yearly_counts),
+        figure_job('ev_chargers_by_zip.png', plot_chargers_by_zip, zip_counts)
+    ], workers=workers)
+
+    with step('write_tables', rows_in=len(elec_df), outputs=['data/electric_charging_stations.csv',
+                                                            'data/chargers_by_zip_year.csv',
+                                                            'data/summary_statistics.csv']):
+        # Save processed data
+        elec_df.to_csv('data/electric_charging_stations.csv', index=False)
+
+        # New chargers and ports per ZIP code and year, joined with the registration side by EV_gap.py
+        charger_zip_year_counts(elec_df).to_csv('data/chargers_by_zip_year.csv')
+
+        # Create summary statistics
+        summary_df = summary_statistics(elec_df)
+        summary_df.to_csv('data/summary_statistics.csv', index=False)
+
+    print("Analysis complete! Graphs and data exported successfully.")
+    print(f"Total electric chargers: {summary_df['Total Electric Chargers'].iloc[0]}")
+    print("Files created:")
+    print("- ev_chargers_timeline.png (cumulative chargers over time)")
+    print("- ev_chargers_by_year.png (bar chart by year)")
+    print("- ev_chargers_by_zip.png (bar chart by ZIP code)")
+    print("- ev_chargers_density.png (density map)")
+    print("- ev_chargers_heatmap.png (heatmap visualization)")
+    print("- ev_chargers_nyc.png (NYC area focus)")
+    print("- ev_chargers_by_year_panels.png (installation by time period)")
+    print("- ev_chargers_by_year.gif (animated chargers open by year)")
+    print("- data/chargers_by_cousub.csv (chargers and density by county subdivision)")
+    print("- data/charger_access_by_cousub_year.csv (distance to nearest chargers by year)")
+    print("- data/chargers_by_zip_year.csv (chargers and ports opened by ZIP code and year)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analyze and map public EV charging stations")
+    parser.add_argument('--workers', type=int, default=FIGURE_WORKERS,
+                        help="Processes rendering figures in parallel (1 = serial)")
+    add_arguments(parser)
+    args = parser.parse_args()
+    run_instrumented(main, args, workers=args.workers)
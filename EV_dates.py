@@ -0,0 +1,194 @@
+# Author: Jingni Zhang
+# Date Created: 04.18.2025
+
+import numpy as np
+import pandas as pd
+
+# Formats seen in the DMV and AFDC extracts, tried in this order
+DATE_FORMATS = [
+    '%m/%d/%Y',                 # DMV Reg Valid Date / Reg Expiration Date
+    '%Y-%m-%d',                 # AFDC Open Date / Date Last Confirmed
+    '%Y-%m-%d %H:%M:%S UTC',    # AFDC Updated At
+    '%Y-%m-%d %H:%M:%S',
+    '%Y-%m-%dT%H:%M:%S',
+    '%m/%d/%Y %H:%M',
+    '%m/%d/%y'
+]
+
+# ISO 8601 formats already have a fast C path inside pandas
+ISO_FORMATS = ['%Y-%m-%d', '%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S']
+
+# Date columns parsed by the two scripts
+DATE_COLUMNS = ['reg_date', 'exp_date', 'Open Date', 'Date Last Confirmed', 'Updated At']
+
+
+# Field widths and names for formats that can be parsed by character position
+FIXED_WIDTH_FIELDS = {
+    'Y': (4, 'year'),
+    'm': (2, 'month'),
+    'd': (2, 'day'),
+    'H': (2, 'hour'),
+    'M': (2, 'minute'),
+    'S': (2, 'second')
+}
+
+
+def fixed_width_layout(fmt):
+    """
+    Character positions of each field in a fixed-width format
+
+    Returns:
+    tuple or None: ({field: (start, stop)}, {position: literal char}, width),
+        or None if the format has a variable-width directive
+    """
+    fields = {}
+    literals = {}
+    position = 0
+    i = 0
+    while i < len(fmt):
+        if fmt[i] == '%':
+            code = fmt[i + 1:i + 2]
+            if code not in FIXED_WIDTH_FIELDS:
+                return None
+            width, name = FIXED_WIDTH_FIELDS[code]
+            fields[name] = (position, position + width)
+            position += width
+            i += 2
+        else:
+            literals[position] = fmt[i]
+            position += 1
+            i += 1
+    return fields, literals, position
+
+
+def parse_fixed_width(values, layout):
+    """
+    Parse zero-padded fixed-width dates with NumPy character arithmetic
+
+    Values of the wrong length, with unexpected characters or with
+    out-of-range fields (e.g. February 30) become NaT.
+    """
+    fields, literals, width = layout
+
+    # One extra character reveals values longer than the format
+    text = np.asarray(values.fillna(''), dtype=f'U{width + 1}')
+    chars = text.view(np.uint32).reshape(len(text), width + 1)
+
+    valid = chars[:, width] == 0
+    for position, literal in literals.items():
+        valid &= chars[:, position] == ord(literal)
+
+    parts = {'month': 1, 'day': 1, 'hour': 0, 'minute': 0, 'second': 0}
+    for name, (start, stop) in fields.items():
+        # Unsigned arithmetic: anything below '0' wraps around to a large value
+        digits = chars[:, start:stop] - np.uint32(ord('0'))
+        valid &= (digits <= 9).all(axis=1)
+        parts[name] = (digits * 10 ** np.arange(stop - start - 1, -1, -1, dtype=np.uint32)).sum(axis=1).astype(np.int64)
+
+    month = np.clip(parts['month'], 1, 12)
+    month_start = (parts['year'] - 1970).astype('datetime64[Y]') + (month - 1).astype('timedelta64[M]')
+    days_in_month = ((month_start + 1).astype('datetime64[D]') - month_start.astype('datetime64[D]')).astype(np.int32)
+
+    valid &= (parts['month'] >= 1) & (parts['month'] <= 12)
+    valid &= (parts['day'] >= 1) & (parts['day'] <= days_in_month)
+    valid &= (parts['hour'] < 24) & (parts['minute'] < 60) & (parts['second'] < 60)
+
+    seconds = (parts['day'] - 1) * 86400 + parts['hour'] * 3600 + parts['minute'] * 60 + parts['second']
+    parsed = month_start.astype('datetime64[s]') + np.asarray(seconds, dtype='int64').astype('timedelta64[s]')
+    parsed[~valid] = np.datetime64('NaT')
+    return pd.Series(parsed.astype('datetime64[ns]'), index=values.index, name=values.name)
+
+
+def detect_date_format(values, formats=DATE_FORMATS, sample_size=1000):
+    """
+    Pick the format that parses the largest share of a sample
+
+    Parameters:
+    values (Series): Raw date strings
+    formats (list): Candidate strftime formats, in order of preference
+    sample_size (int): Number of non-missing values to test
+
+    Returns:
+    str or None: Best format, or None if no candidate parses anything
+    """
+    sample = values.dropna()
+    if len(sample) > sample_size:
+        sample = sample.sample(sample_size, random_state=0)
+    if len(sample) == 0:
+        return None
+
+    best_format, best_parsed = None, 0
+    for fmt in formats:
+        parsed = pd.to_datetime(sample, format=fmt, errors='coerce').notna().sum()
+        if parsed > best_parsed:
+            best_format, best_parsed = fmt, parsed
+        if parsed == len(sample):
+            break
+    return best_format
+
+
+def parse_dates(values, column=None, formats=DATE_FORMATS, fallback=True):
+    """
+    Parse a column of date strings with a fixed-format fast path
+
+    The format is detected from a sample and the whole column is parsed with
+    it in one vectorized call; fixed-width formats are decoded directly from
+    the characters. Only values that do not match (if any) go through
+    pandas' slower per-element parser. Values that still fail are
+    reported and left as NaT.
+
+    Parameters:
+    values (Series): Raw date strings (already-parsed datetimes are returned as is)
+    column (str or None): Name used in the report; defaults to values.name
+    formats (list): Candidate formats for detection
+    fallback (bool): Retry non-matching values with the per-element parser
+
+    Returns:
+    tuple: (parsed Series, report dict with 'column', 'format', 'rows',
+        'unparseable' and 'examples')
+    """
+    column = column or values.name
+    report = {'column': column, 'format': None, 'rows': len(values), 'unparseable': 0, 'examples': []}
+
+    if pd.api.types.is_datetime64_any_dtype(values):
+        report['format'] = 'datetime'
+        return values, report
+
+    fmt = detect_date_format(values, formats)
+    report['format'] = fmt
+    if fmt is None:
+        parsed = pd.Series(pd.NaT, index=values.index, dtype='datetime64[ns]', name=values.name)
+    elif fmt not in ISO_FORMATS and fixed_width_layout(fmt) is not None:
+        parsed = parse_fixed_width(values, fixed_width_layout(fmt))
+    else:
+        parsed = pd.to_datetime(values, format=fmt, errors='coerce')
+
+    present = values.notna()
+    failed = parsed.isna() & present
+    if fallback and failed.any():
+        parsed[failed] = pd.to_datetime(values[failed], format='mixed', errors='coerce')
+        failed = parsed.isna() & present
+
+    report['unparseable'] = int(failed.sum())
+    if report['unparseable'] > 0:
+        report['examples'] = values[failed].drop_duplicates().head(5).tolist()
+        print(f"Warning: {report['unparseable']} unparseable values in '{column}', "
+              f"e.g. {report['examples']}")
+
+    return parsed, report
+
+
+def parse_date_columns(df, columns=DATE_COLUMNS):
+    """
+    Parse every known date column present in a DataFrame
+
+    Returns:
+    tuple: (DataFrame with parsed columns, list of per-column reports)
+    """
+    parsed_columns = {}
+    reports = []
+    for column in columns:
+        if column in df.columns:
+            parsed_columns[column], report = parse_dates(df[column], column)
+            reports.append(report)
+    return df.assign(**parsed_columns), reports
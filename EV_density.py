@@ -0,0 +1,183 @@
+# Author: Jingni Zhang
+# Date Created: 05.02.2025
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from EV_cache import CACHE_DIR
+from EV_profile import step
+
+# Raster cells along the longer side of the extent
+DENSITY_GRID = 600
+
+# Kernel is truncated at this many bandwidths
+KERNEL_TRUNCATE = 4.0
+
+# Density below this fraction of the peak is left transparent, like kdeplot's thresh
+DENSITY_THRESHOLD = 0.05
+
+
+def scott_bandwidth(xy, adjust=1.0):
+    """
+    Per-axis Gaussian bandwidth from Scott's rule (the seaborn/scipy default), scaled by adjust
+    """
+    return adjust * len(xy) ** (-1 / 6) * xy.std(axis=0, ddof=1)
+
+
+def raster_shape(extent, grid=DENSITY_GRID):
+    """
+    (rows, columns) of a raster with square cells covering (min_x, min_y, max_x, max_y)
+    """
+    width, height = extent[2] - extent[0], extent[3] - extent[1]
+    cell = max(width, height) / grid
+    return max(1, int(np.ceil(height / cell))), max(1, int(np.ceil(width / cell)))
+
+
+def bin_points(xy, extent, shape, groups=None, n_groups=1):
+    """
+    Count points per raster cell, optionally split into groups (e.g. years)
+
+    Returns:
+    ndarray: (n_groups, rows, columns) counts; points outside the extent are dropped
+    """
+    rows, columns = shape
+    column = np.floor((xy[:, 0] - extent[0]) / (extent[2] - extent[0]) * columns).astype(np.int64)
+    row = np.floor((xy[:, 1] - extent[1]) / (extent[3] - extent[1]) * rows).astype(np.int64)
+    group = np.zeros(len(xy), dtype=np.int64) if groups is None else np.asarray(groups, dtype=np.int64)
+
+    inside = (column >= 0) & (column < columns) & (row >= 0) & (row < rows) & (group >= 0) & (group < n_groups)
+    cells = np.ravel_multi_index((group[inside], row[inside], column[inside]), (n_groups, rows, columns))
+    return np.bincount(cells, minlength=n_groups * rows * columns).reshape(n_groups, rows, columns).astype(float)
+
+
+def fft_smooth(stack, sigma):
+    """
+    Convolve every raster in a stack with a Gaussian kernel through the FFT
+
+    The rasters are zero-padded by the kernel radius so mass does not wrap
+    around the edges, and the kernel's transform is computed once for the
+    whole stack.
+
+    Parameters:
+    stack (ndarray): (n, rows, columns) binned counts
+    sigma (tuple): Kernel standard deviation in cells (along columns, along rows)
+
+    Returns:
+    ndarray: Smoothed stack, same shape as the input
+    """
+    n, rows, columns = stack.shape
+    pad_x, pad_y = (int(np.ceil(KERNEL_TRUNCATE * s)) for s in sigma)
+    padded_rows, padded_columns = rows + 2 * pad_y, columns + 2 * pad_x
+
+    # Kernel centred on cell (0, 0) with wrap-around offsets
+    dy = np.minimum(np.arange(padded_rows), padded_rows - np.arange(padded_rows))
+    dx = np.minimum(np.arange(padded_columns), padded_columns - np.arange(padded_columns))
+    kernel = np.exp(-0.5 * ((dy[:, None] / sigma[1]) ** 2 + (dx[None, :] / sigma[0]) ** 2))
+    kernel[(dy[:, None] > pad_y) | (dx[None, :] > pad_x)] = 0
+    kernel /= kernel.sum()
+
+    padded = np.zeros((n, padded_rows, padded_columns))
+    padded[:, pad_y:pad_y + rows, pad_x:pad_x + columns] = stack
+    smoothed = np.fft.irfft2(np.fft.rfft2(padded) * np.fft.rfft2(kernel), s=(padded_rows, padded_columns))
+    return np.clip(smoothed[:, pad_y:pad_y + rows, pad_x:pad_x + columns], 0, None)
+
+
+def density_cache_file(xy, extent, bandwidth, shape, groups, cache_dir):
+    """
+    Cache path keyed by a hash of the points, their groups and the raster settings
+    """
+    digest = hashlib.sha256(np.ascontiguousarray(xy, dtype=np.float64).tobytes())
+    if groups is not None:
+        digest.update(np.ascontiguousarray(groups, dtype=np.int64).tobytes())
+    digest.update(json.dumps({'extent': [float(value) for value in extent],
+                              'bandwidth': [float(value) for value in bandwidth],
+                              'shape': list(shape)}).encode())
+    return os.path.join(cache_dir, 'density', f"density_{digest.hexdigest()[:24]}.npy")
+
+
+def density_stack(xy, extent, bandwidth, groups=None, n_groups=1, cumulative=False, grid=DENSITY_GRID,
+                  cache_dir=CACHE_DIR):
+    """
+    Kernel density rasters from binned points, cached as .npy
+
+    Parameters:
+    xy (ndarray): (n, 2) projected point coordinates
+    extent (tuple): (min_x, min_y, max_x, max_y) of the raster
+    bandwidth (ndarray): Kernel standard deviation in map units per axis
+    groups (ndarray or None): Group index 0..n_groups-1 per point
+    n_groups (int): Number of groups
+    cumulative (bool): Accumulate the bin counts over groups first, so
+        raster i covers groups 0..i (e.g. every charger open by year i)
+    grid (int): Raster cells along the longer side
+    cache_dir (str): Folder for the cached rasters
+
+    Returns:
+    ndarray: (n_groups, rows, columns) densities in points per square map
+        unit, row 0 at the bottom (min_y)
+    """
+    shape = raster_shape(extent, grid)
+    cache_file = density_cache_file(xy, extent, bandwidth, shape,
+                                    None if groups is None else np.append(groups, [n_groups, cumulative]),
+                                    cache_dir)
+    if os.path.exists(cache_file):
+        return np.load(cache_file)
+
+    with step('kernel_density', rows_in=len(xy)):
+        counts = bin_points(xy, extent, shape, groups, n_groups)
+        if cumulative:
+            counts = counts.cumsum(axis=0)
+
+        cell_width = (extent[2] - extent[0]) / shape[1]
+        cell_height = (extent[3] - extent[1]) / shape[0]
+        smoothed = fft_smooth(counts, (bandwidth[0] / cell_width, bandwidth[1] / cell_height))
+        density = smoothed / (cell_width * cell_height)
+
+    os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+    np.save(cache_file, density)
+    return density
+
+
+def point_density(gdf, extent, bw_adjust=0.5, grid=DENSITY_GRID, cache_dir=CACHE_DIR):
+    """
+    Density raster of a GeoDataFrame of points over an extent
+
+    Returns:
+    ndarray: (rows, columns) density raster for plot_density()
+    """
+    xy = np.column_stack([gdf.geometry.x.to_numpy(), gdf.geometry.y.to_numpy()])
+    return density_stack(xy, extent, scott_bandwidth(xy, bw_adjust), grid=grid, cache_dir=cache_dir)[0]
+
+
+def yearly_point_density(gdf, extent, years, year_column='Year', bw_adjust=0.5, grid=DENSITY_GRID,
+                         cache_dir=CACHE_DIR):
+    """
+    Density of every point present by the end of each year, from cumulative bin counts
+
+    Points from before the first year count toward it; points without a year
+    or after the last year are left out. The bandwidth is fixed from all
+    points so the rasters are comparable across years.
+
+    Returns:
+    dict: {year: (rows, columns) density raster}
+    """
+    years = list(years)
+    xy = np.column_stack([gdf.geometry.x.to_numpy(), gdf.geometry.y.to_numpy()])
+    year_values = gdf[year_column].to_numpy(dtype=float, na_value=np.nan)
+    groups = np.where(np.isnan(year_values), -1, np.clip(np.nan_to_num(year_values) - years[0], 0, None))
+
+    stack = density_stack(xy, extent, scott_bandwidth(xy, bw_adjust), groups=groups, n_groups=len(years),
+                          cumulative=True, grid=grid, cache_dir=cache_dir)
+    return dict(zip(years, stack))
+
+
+def plot_density(ax, density, extent, cmap='Reds', threshold=DENSITY_THRESHOLD, alpha=0.8, zorder=2):
+    """
+    Overlay a density raster with imshow, leaving low-density cells transparent
+    """
+    peak = density.max()
+    masked = np.ma.masked_less_equal(density, threshold * peak if peak > 0 else 0)
+    return ax.imshow(masked, extent=(extent[0], extent[2], extent[1], extent[3]), origin='lower', cmap=cmap,
+                     alpha=alpha, interpolation='bilinear', zorder=zorder)
@@ -0,0 +1,102 @@
+# Author: Jingni Zhang
+# Date Created: 04.20.2025
+
+import operator
+
+import numpy as np
+import pandas as pd
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    import tomli as tomllib
+
+FILTER_FILE = 'filters.toml'
+
+# Comparison operators allowed in a rule
+OPERATORS = {
+    'eq': operator.eq,
+    'ne': operator.ne,
+    'ge': operator.ge,
+    'gt': operator.gt,
+    'le': operator.le,
+    'lt': operator.lt,
+    'in': lambda column, value: column.isin(value),
+    'not_in': lambda column, value: ~column.isin(value)
+}
+
+
+def load_filter_rules(filter_file=FILTER_FILE):
+    """
+    Read and validate the [[rule]] entries of a TOML filter spec
+
+    Returns:
+    list: Rules as dicts with 'name', 'column', 'op' and 'value'
+    """
+    with open(filter_file, 'rb') as f:
+        rules = tomllib.load(f).get('rule', [])
+
+    for rule in rules:
+        missing = {'name', 'column', 'op', 'value'} - set(rule)
+        if missing:
+            raise ValueError(f"Filter rule {rule} in {filter_file} is missing {sorted(missing)}")
+        if rule['op'] not in OPERATORS:
+            raise ValueError(f"Filter rule '{rule['name']}' has unknown op '{rule['op']}'")
+        if rule['op'] in ('in', 'not_in') and not isinstance(rule['value'], list):
+            raise ValueError(f"Filter rule '{rule['name']}' needs a list value for '{rule['op']}'")
+    return rules
+
+
+def rules_on_columns(rules, columns):
+    """
+    Split rules into those that can run on the given columns and the rest
+    """
+    ready = [rule for rule in rules if rule['column'] in columns]
+    later = [rule for rule in rules if rule['column'] not in columns]
+    return ready, later
+
+
+def empty_filter_stats(rules):
+    """
+    Zero counts for every rule, to accumulate over chunks
+    """
+    return pd.DataFrame(0, index=pd.Index([rule['name'] for rule in rules], name='rule'),
+                        columns=['rows_failing', 'rows_dropped'])
+
+
+def compile_mask(df, rules):
+    """
+    Evaluate all rules into one boolean mask
+
+    Each predicate is computed once on the unfiltered frame and combined with
+    NumPy, so no intermediate copies of the frame are made.
+
+    Returns:
+    tuple: (mask array, stats DataFrame). 'rows_failing' counts every row a
+        rule rejects on its own; 'rows_dropped' counts rows whose first
+        failing rule (in evaluation order) is this one.
+    """
+    keep = np.ones(len(df), dtype=bool)
+    stats = empty_filter_stats(rules)
+
+    for rule in rules:
+        passed = OPERATORS[rule['op']](df[rule['column']], rule['value'])
+        # Missing values never pass a rule
+        passed = pd.Series(passed).fillna(False).to_numpy(dtype=bool)
+        stats.loc[rule['name'], 'rows_failing'] = int((~passed).sum())
+        stats.loc[rule['name'], 'rows_dropped'] = int((keep & ~passed).sum())
+        keep &= passed
+
+    return keep, stats
+
+
+def filter_report(stats, rows_in):
+    """
+    Print and return per-rule drop counts with shares of the input rows
+    """
+    report = stats.copy()
+    report['pct_dropped'] = report['rows_dropped'] / max(rows_in, 1) * 100
+
+    print(f"Filter results ({rows_in} rows in, {rows_in - int(report['rows_dropped'].sum())} kept):")
+    print(report.round(2).to_string())
+    return report
@@ -0,0 +1,212 @@
+# Author: Jingni Zhang
+# Date Created: 04.30.2025
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+# Pre-aggregated inputs written by EV_reg.py and EV_charger.py
+PENETRATION_FILE = 'data/ev_penetration_by_zip_year.csv'
+CHARGER_ZIP_FILE = 'data/chargers_by_zip_year.csv'
+GAP_FILE = 'data/ev_charger_gap_by_zip_year.parquet'
+
+# Years in the gap table; earlier registrations and chargers only count toward
+# the opening stock of the cumulative columns
+GAP_YEARS = range(2010, 2026)
+
+# AFDC port columns summed per ZIP and year
+CHARGER_PORT_COLUMNS = {
+    'EV Level1 EVSE Num': 'level1_ports',
+    'EV Level2 EVSE Num': 'level2_ports',
+    'EV DC Fast Count': 'dc_fast_ports'
+}
+
+
+def charger_zip_year_counts(elec_df, keep_missing=False):
+    """
+    New chargers and ports per ZIP code and opening year
+
+    Parameters:
+    elec_df (DataFrame): Electric stations with ZIP, Year and the AFDC port columns
+    keep_missing (bool): Count stations with no ZIP code or opening year under a
+        missing label instead of dropping them, so the table sums to every station
+
+    Returns:
+    DataFrame: Rows indexed by (Zip, year) with 'chargers', 'ports' and one
+        column per port level
+    """
+    counts = elec_df[list(CHARGER_PORT_COLUMNS)].fillna(0).rename(columns=CHARGER_PORT_COLUMNS)
+    counts['chargers'] = 1
+    counts['Zip'] = pd.to_numeric(elec_df['ZIP'], errors='coerce').astype('Int32')
+    counts['year'] = elec_df['Year'].astype('Int16')
+
+    if keep_missing:
+        counts = counts.groupby(['Zip', 'year'], dropna=False).sum()
+    else:
+        counts = counts.dropna(subset=['Zip', 'year']).groupby(['Zip', 'year']).sum()
+    counts['ports'] = counts[list(CHARGER_PORT_COLUMNS.values())].sum(axis=1)
+    return counts.astype('int32')
+
+
+def dense_grid(table, zips, years, columns):
+    """
+    Scatter a (Zip, year)-indexed table into a dense zip x year x column array
+
+    Years before the first grid year are summed into a separate zip x column
+    opening balance, years after the last are dropped, and ZIP codes not in
+    zips are ignored.
+
+    Returns:
+    tuple: (zip x year x column grid, zip x column totals before the first year)
+    """
+    rows = zips.get_indexer(table.index.get_level_values(0))
+    year_values = table.index.get_level_values(1).to_numpy(dtype=np.int64)
+    values = table[columns].to_numpy(dtype=np.int64)
+    keep = (rows >= 0) & (year_values >= years[0]) & (year_values <= years[-1])
+    earlier = (rows >= 0) & (year_values < years[0])
+
+    grid = np.zeros((len(zips), len(years), len(columns)), dtype=np.int64)
+    np.add.at(grid, (rows[keep], year_values[keep] - years[0]), values[keep])
+    opening = np.zeros((len(zips), len(columns)), dtype=np.int64)
+    np.add.at(opening, rows[earlier], values[earlier])
+    return grid, opening
+
+
+def first_year(table, column, zips):
+    """
+    First year each ZIP code has a positive value in column (missing if never)
+
+    Read from the (Zip, year)-indexed table itself, so years before the
+    gap table's first year are reported as they are.
+    """
+    active = table[table[column] > 0]
+    years = pd.Series(active.index.get_level_values(1).to_numpy(), index=active.index.get_level_values(0))
+    return pd.array(years.groupby(level=0).min().reindex(zips), dtype='Int16')
+
+
+def growth(values, opening):
+    """
+    Year-over-year fractional change along axis 1; missing where the previous year is 0
+
+    opening holds the value before the first year of each row.
+    """
+    previous = np.concatenate([opening[:, None], values[:, :-1]], axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(previous > 0, (values - previous) / previous, np.nan)
+
+
+def gap_table(penetration, charger_counts, years=GAP_YEARS):
+    """
+    EV-to-charger gap metrics for every ZIP code and year
+
+    Both inputs are already aggregated per ZIP and year, so the join is a
+    scatter into dense zip x year arrays followed by cumulative sums; no
+    registration or charger records are touched.
+
+    Parameters:
+    penetration (DataFrame): (Zip, reg_year)-indexed 'total' and 'ev' registrations
+    charger_counts (DataFrame): (Zip, year)-indexed 'chargers' and 'ports' opened
+    years (range): Consecutive years of the output
+
+    Returns:
+    DataFrame: One row per ZIP code and year with registration and charger
+        stock, registrations per charger and per port, first EV and first
+        charger years, the lag between them, and EV vs charger growth
+    """
+    years = np.arange(years[0], years[-1] + 1)
+    zips = pd.Index(penetration.index.get_level_values(0).union(charger_counts.index.get_level_values(0))
+                    .dropna().unique().sort_values())
+
+    # Per-year columns cover their own year only; registrations and chargers
+    # from before the first year seed the cumulative sums
+    registrations, registrations_before = dense_grid(penetration, zips, years, ['total', 'ev'])
+    chargers, chargers_before = dense_grid(charger_counts, zips, years, ['chargers', 'ports'])
+
+    ev = registrations[:, :, 1]
+    ev_cumulative = registrations_before[:, 1, None] + ev.cumsum(axis=1)
+    stock = chargers_before[:, None, :] + chargers.cumsum(axis=1)
+    chargers_open, ports_open = stock[:, :, 0], stock[:, :, 1]
+
+    first_ev = first_year(penetration, 'ev', zips)
+    first_charger = first_year(charger_counts, 'chargers', zips)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ev_per_charger = np.where(chargers_open > 0, ev_cumulative / chargers_open, np.nan)
+        ev_per_port = np.where(ports_open > 0, ev_cumulative / ports_open, np.nan)
+    ev_growth = growth(ev_cumulative, registrations_before[:, 1])
+    charger_growth = growth(chargers_open, chargers_before[:, 0])
+
+    n_years = len(years)
+    table = pd.DataFrame({
+        'Zip': np.repeat(zips.to_numpy(), n_years),
+        'year': np.tile(years, len(zips)).astype('int16'),
+        'registrations': registrations[:, :, 0].ravel().astype('int32'),
+        'ev_registrations': ev.ravel().astype('int32'),
+        'ev_cumulative': ev_cumulative.ravel().astype('int32'),
+        'chargers_opened': chargers[:, :, 0].ravel().astype('int32'),
+        'chargers_open': chargers_open.ravel().astype('int32'),
+        'ports_open': ports_open.ravel().astype('int32'),
+        'ev_per_charger': ev_per_charger.ravel().astype('float32'),
+        'ev_per_port': ev_per_port.ravel().astype('float32'),
+        'first_ev_year': np.repeat(first_ev, n_years),
+        'first_charger_year': np.repeat(first_charger, n_years),
+        'ev_growth': ev_growth.ravel().astype('float32'),
+        'charger_growth': charger_growth.ravel().astype('float32')
+    })
+    table['Zip'] = table['Zip'].astype('Int32')
+
+    # Positive: chargers arrived after the first EVs; missing if either never appears
+    table['charger_lag_years'] = table['first_charger_year'] - table['first_ev_year']
+    table['growth_gap'] = table['ev_growth'] - table['charger_growth']
+    return table
+
+
+def load_penetration(file_path=PENETRATION_FILE):
+    """
+    Read the per-ZIP/year registration totals written by EV_reg.py
+    """
+    penetration = pd.read_csv(file_path, usecols=['Zip', 'reg_year', 'total', 'ev'],
+                              dtype={'Zip': 'Int32', 'reg_year': 'int16'})
+    return penetration.set_index(['Zip', 'reg_year'])
+
+
+def load_charger_counts(file_path=CHARGER_ZIP_FILE):
+    """
+    Read the per-ZIP/year charger counts written by EV_charger.py
+    """
+    return pd.read_csv(file_path, dtype={'Zip': 'Int32', 'year': 'int16'}).set_index(['Zip', 'year'])
+
+
+def build_gap_table(penetration_file=PENETRATION_FILE, charger_file=CHARGER_ZIP_FILE, output_file=GAP_FILE):
+    """
+    Join both pipelines' ZIP/year tables and save the gap table as Parquet
+
+    Returns:
+    DataFrame: Gap table from gap_table()
+    """
+    table = gap_table(load_penetration(penetration_file), load_charger_counts(charger_file))
+    table.to_parquet(output_file, index=False)
+
+    latest = table[table['year'] == table['year'].max()]
+    print(f"Gap table: {table['Zip'].nunique()} ZIP codes x {table['year'].nunique()} years -> {output_file}")
+    print(f"ZIP codes with EVs but no public charger in {latest['year'].iloc[0]}: "
+          f"{int(((latest['ev_cumulative'] > 0) & (latest['chargers_open'] == 0)).sum())}")
+    return table
+
+
+def main():
+    """
+    Command-line entry point: build the gap table after EV_reg.py and EV_charger.py have run
+    """
+    parser = argparse.ArgumentParser(description="Join registration and charger tables by ZIP code and year")
+    parser.add_argument('--penetration', default=PENETRATION_FILE, help="Table written by EV_reg.py")
+    parser.add_argument('--chargers', default=CHARGER_ZIP_FILE, help="Table written by EV_charger.py")
+    parser.add_argument('--output', default=GAP_FILE, help="Parquet file to write")
+    args = parser.parse_args()
+
+    build_gap_table(args.penetration, args.chargers, args.output)
+
+
+if __name__ == "__main__":
+    main()
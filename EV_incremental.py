@@ -0,0 +1,242 @@
+# Author: Jingni Zhang
+# Date Created: 04.16.2025
+
+import argparse
+import json
+import os
+
+import pandas as pd
+
+from EV_aggregate import CUBE_DIMS, CountCube
+from EV_cache import CACHE_DIR, config_hash
+from EV_filters import load_filter_rules
+from EV_reg import (CHUNK_DTYPES, CHUNK_SIZE, COLUMN_RENAME_MAP, COLUMNS_TO_DROP, apply_reg_schema,
+                    clean_ev_data, concat_typed_chunks, filter_config, filter_ev_records)
+
+# Column identifying one registration across quarterly extracts
+RECORD_KEY = 'VIN'
+RAW_DATE_COLUMN = 'Reg Valid Date'
+
+STATE_FILE = 'reg_state.parquet'
+CUBE_FILE = 'reg_cube.parquet'
+KEY_DIGESTS_FILE = 'reg_key_digests.parquet'
+WATERMARK_FILE = 'reg_watermark.json'
+
+
+def digest_columns(rules):
+    """
+    Raw columns a record's cube cell and filter outcome depend on
+
+    The cube dimensions and every filtered column are mapped back to their
+    raw names; reg_year comes from the raw registration date.
+
+    Returns:
+    list: Raw column names, sorted
+    """
+    raw_names = {renamed: raw for raw, renamed in COLUMN_RENAME_MAP.items()}
+    raw_names['reg_year'] = RAW_DATE_COLUMN
+    columns = CUBE_DIMS + [rule['column'] for rule in rules]
+    return sorted({raw_names.get(column, column) for column in columns})
+
+
+def save_state(state, cube, watermark, key_digests, state_dir=CACHE_DIR):
+    """
+    Store the record keys seen, the aggregate cube and the watermark
+
+    Parameters:
+    state (DataFrame): One row per counted record: RECORD_KEY plus the cube dimensions
+    cube (CountCube): Aggregated counts
+    watermark (Timestamp): Latest reg_date processed
+    key_digests (DataFrame): Rows and row digest per key in the extract, counted or filtered out
+    state_dir (str): Folder for the state files
+    """
+    os.makedirs(state_dir, exist_ok=True)
+    state.to_parquet(os.path.join(state_dir, STATE_FILE), index=False)
+    cube.to_frame().to_parquet(os.path.join(state_dir, CUBE_FILE), index=False)
+    key_digests.to_parquet(os.path.join(state_dir, KEY_DIGESTS_FILE))
+    with open(os.path.join(state_dir, WATERMARK_FILE), 'w') as f:
+        json.dump({
+            'reg_date': watermark.isoformat(),
+            'rows': len(state),
+            'config': config_hash(filter_config())
+        }, f, indent=2)
+
+
+def load_state(state_dir=CACHE_DIR):
+    """
+    Load the stored state, or None if it is missing or was built with other filters
+
+    Returns:
+    tuple or None: (state, cube, watermark, key_digests)
+    """
+    watermark_path = os.path.join(state_dir, WATERMARK_FILE)
+    if not os.path.exists(watermark_path):
+        return None
+    if not os.path.exists(os.path.join(state_dir, KEY_DIGESTS_FILE)):
+        print("Stored state has no per-key row digests")
+        return None
+
+    with open(watermark_path) as f:
+        watermark = json.load(f)
+    if watermark['config'] != config_hash(filter_config()):
+        print("Filter configuration changed since the last build")
+        return None
+
+    state = pd.read_parquet(os.path.join(state_dir, STATE_FILE))
+    cube = CountCube.from_frame(pd.read_parquet(os.path.join(state_dir, CUBE_FILE)), weights='count')
+    key_digests = pd.read_parquet(os.path.join(state_dir, KEY_DIGESTS_FILE))
+    return state, cube, pd.Timestamp(watermark['reg_date']), key_digests
+
+
+def scan_keys(file_path, chunksize=CHUNK_SIZE):
+    """
+    Read only the key and digest columns and summarise each key's rows
+
+    Each row is hashed over digest_columns() and the hashes of a key are
+    summed (modulo 2**64), so the digest does not depend on row order and
+    changes when any of those values is edited, added or removed.
+
+    Returns:
+    DataFrame: Indexed by RECORD_KEY, with 'rows' and 'digest' (uint64)
+    """
+    columns = digest_columns(load_filter_rules())
+    reader = pd.read_csv(file_path, usecols=[RECORD_KEY] + columns, dtype=CHUNK_DTYPES, chunksize=chunksize)
+
+    chunk_digests = []
+    for chunk in reader:
+        row_hashes = pd.util.hash_pandas_object(chunk[columns], index=False)
+        chunk_digests.append(row_hashes.groupby(chunk[RECORD_KEY].to_numpy()).agg(['size', 'sum']))
+
+    if not chunk_digests:
+        return pd.DataFrame({'rows': pd.Series(dtype='int64'), 'digest': pd.Series(dtype='uint64')},
+                            index=pd.Index([], name=RECORD_KEY))
+    key_digests = pd.concat(chunk_digests).groupby(level=0).sum()
+    key_digests.columns = ['rows', 'digest']
+    return key_digests.astype({'rows': 'int64', 'digest': 'uint64'}).rename_axis(RECORD_KEY)
+
+
+def build_full(file_path, chunksize=CHUNK_SIZE):
+    """
+    Clean the whole file and aggregate it from scratch
+
+    Returns:
+    tuple: (state, cube, watermark, key_digests)
+    """
+    df = clean_ev_data(file_path, chunksize=chunksize)
+    state = df[[RECORD_KEY] + CUBE_DIMS]
+    return state, CountCube.from_frame(df), df['reg_date'].max(), scan_keys(file_path, chunksize=chunksize)
+
+
+def read_key_rows(file_path, keys, chunksize=CHUNK_SIZE):
+    """
+    Stream the file and keep every row of the given keys, cleaned and typed
+
+    The key test runs on the raw chunk, so other rows are never cleaned or typed.
+    """
+    rules = load_filter_rules()
+    usecols = lambda column: column not in COLUMNS_TO_DROP
+    reader = pd.read_csv(file_path, usecols=usecols, dtype=CHUNK_DTYPES, chunksize=chunksize)
+
+    kept_chunks = []
+    for chunk in reader:
+        kept, _ = filter_ev_records(chunk[chunk[RECORD_KEY].isin(keys)], rules, verbose=False)
+        kept_chunks.append(apply_reg_schema(kept))
+    return concat_typed_chunks(kept_chunks)
+
+
+def verify_against_rebuild(file_path, cube, chunksize=CHUNK_SIZE):
+    """
+    Check incrementally maintained counts against a full rebuild
+
+    Returns:
+    bool: True when every cell matches
+    """
+    print("Verifying incremental aggregates against a full rebuild...")
+    _, rebuilt, _, _ = build_full(file_path, chunksize=chunksize)
+
+    if cube.equals(rebuilt):
+        print("Verification passed: incremental and full counts match")
+        return True
+
+    difference = rebuilt.merge(cube, sign=-1).to_frame()
+    print(f"Verification FAILED: {len(difference)} cells differ")
+    print(difference.head(20).to_string(index=False))
+    return False
+
+
+def refresh_registration_aggregates(file_path="Vehicle_Registrations.csv", state_dir=CACHE_DIR,
+                                    chunksize=CHUNK_SIZE, verify=False, full=False):
+    """
+    Bring the stored ZIP/year/class aggregates up to date with a new extract
+
+    A key is touched when its row count or row digest differs from the last
+    extract: new keys (including late-loaded records dated before the
+    watermark), keys no longer in the extract, and keys with a row added,
+    removed or edited in a column the cube or the filters read. Every stored
+    row of a touched key is subtracted and all of its rows in the new
+    extract are read, cleaned and added back. The watermark only reports how
+    far the data reaches; use verify=True to check against a full rebuild.
+
+    Parameters:
+    file_path (str): Path to the new DMV registration CSV
+    state_dir (str): Folder holding the stored state
+    chunksize (int): Rows per chunk when streaming the file
+    verify (bool): Compare the result with a full rebuild
+    full (bool): Ignore stored state and rebuild from scratch
+
+    Returns:
+    CountCube: Up-to-date registration counts
+    """
+    loaded = None if full else load_state(state_dir)
+
+    if loaded is None:
+        print("Building registration aggregates from scratch...")
+        state, cube, watermark, key_digests = build_full(file_path, chunksize=chunksize)
+    else:
+        state, cube, watermark, stored_digests = loaded
+        print(f"Refreshing registration aggregates after watermark {watermark.date()}...")
+        key_digests = scan_keys(file_path, chunksize=chunksize)
+        # Keys in only one extract, plus shared keys whose rows or digest changed
+        shared = key_digests.index.intersection(stored_digests.index)
+        edited = (key_digests.loc[shared] != stored_digests.loc[shared]).any(axis=1)
+        touched_keys = key_digests.index.symmetric_difference(stored_digests.index).union(shared[edited.to_numpy()])
+        new_rows = read_key_rows(file_path, touched_keys, chunksize=chunksize)
+
+        # Old contributions of touched keys are taken out and their current rows added
+        stale = state[RECORD_KEY].isin(touched_keys)
+        cube = cube.merge(CountCube.from_frame(state[stale]), sign=-1)
+        cube = cube.merge(CountCube.from_frame(new_rows))
+
+        state = concat_typed_chunks([state[~stale], new_rows[[RECORD_KEY] + CUBE_DIMS]])
+        if len(new_rows) > 0:
+            watermark = max(watermark, new_rows['reg_date'].max())
+        print(f"{len(touched_keys)} keys changed: removed {int(stale.sum())} stale records, "
+              f"added {len(new_rows)} current records")
+
+    save_state(state, cube, watermark, key_digests, state_dir)
+    print(f"Aggregates cover {cube.total()} registrations up to {watermark.date()}")
+
+    if verify:
+        verify_against_rebuild(file_path, cube, chunksize=chunksize)
+
+    return cube
+
+
+def main():
+    """
+    Command-line entry point for the quarterly refresh
+    """
+    parser = argparse.ArgumentParser(description="Incrementally refresh registration aggregates")
+    parser.add_argument('--file', default="Vehicle_Registrations.csv", help="DMV registration CSV")
+    parser.add_argument('--state-dir', default=CACHE_DIR, help="Folder holding the stored aggregates")
+    parser.add_argument('--chunksize', type=int, default=CHUNK_SIZE, help="Rows per chunk")
+    parser.add_argument('--verify', action='store_true', help="Check the result against a full rebuild")
+    parser.add_argument('--full', action='store_true', help="Ignore stored state and rebuild")
+    args = parser.parse_args()
+
+    refresh_registration_aggregates(args.file, state_dir=args.state_dir, chunksize=args.chunksize,
+                                    verify=args.verify, full=args.full)
+
+
+if __name__ == "__main__":
+    main()
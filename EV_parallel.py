@@ -0,0 +1,136 @@
+# Author: Jingni Zhang
+# Date Created: 05.08.2025
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from EV_aggregate import CountCube
+from EV_cache import CACHE_DIR
+from EV_profile import add_steps, configure, settings, step, take_steps
+
+# Worker processes for figure rendering; 1 renders serially in this process
+FIGURE_WORKERS = 1
+
+# Folder holding inputs shared with the workers
+SHARED_DIR = os.path.join(CACHE_DIR, 'shared')
+
+# Workers start fresh interpreters and import the figure functions' modules,
+# so nothing is inherited from a forked parent holding threads or open figures
+START_METHOD = 'spawn'
+
+
+class SharedInput:
+    """
+    Reference to an input written once to disk and memory-mapped by each job
+
+    Only the path and small labels are pickled to the workers:
+    - 'frame': mixed-type DataFrame as an Arrow IPC file
+    - 'matrix': numeric DataFrame as a .npy array plus its index and columns
+    - 'cube': CountCube counts as a .npy array plus its axes
+    """
+
+    def __init__(self, path, kind, labels=None):
+        self.path = path
+        self.kind = kind
+        self.labels = labels
+
+    def load(self):
+        if self.kind == 'frame':
+            import pyarrow as pa
+            with pa.memory_map(self.path) as source:
+                return pa.ipc.open_file(source).read_all().to_pandas()
+        values = np.load(self.path, mmap_mode='r')
+        if self.kind == 'matrix':
+            index, columns = self.labels
+            return pd.DataFrame(values, index=index, columns=columns, copy=False)
+        return CountCube(values, self.labels)
+
+
+def share_input(value, name, shared_dir=SHARED_DIR):
+    """
+    Write a DataFrame or CountCube for the figure jobs to memory-map
+
+    Parameters:
+    value (DataFrame or CountCube): Input used by one or more figures
+    name (str): File name stem, unique within a run
+    shared_dir (str): Folder for the shared files
+
+    Returns:
+    SharedInput: Reference to pass in a job's arguments
+    """
+    os.makedirs(shared_dir, exist_ok=True)
+
+    if isinstance(value, CountCube):
+        path = os.path.join(shared_dir, f"{name}.npy")
+        np.save(path, value.counts)
+        return SharedInput(path, 'cube', value.axes)
+
+    if all(pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_extension_array_dtype(dtype)
+           for dtype in value.dtypes) and value.dtypes.nunique() == 1:
+        path = os.path.join(shared_dir, f"{name}.npy")
+        np.save(path, value.to_numpy())
+        return SharedInput(path, 'matrix', (value.index, value.columns))
+
+    import pyarrow as pa
+    path = os.path.join(shared_dir, f"{name}.arrow")
+    table = pa.Table.from_pandas(value, preserve_index=True)
+    with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    return SharedInput(path, 'frame')
+
+
+def figure_job(name, function, *args, **kwargs):
+    """
+    Self-contained figure spec: a module-level function and its arguments
+
+    Arguments may be SharedInput references, which are loaded in the worker.
+    """
+    return name, function, args, kwargs
+
+
+def run_job(job):
+    """
+    Resolve a job's shared inputs and render it; runs in a worker or in-process
+    """
+    name, function, args, kwargs = job
+    resolve = lambda value: value.load() if isinstance(value, SharedInput) else value
+    with step(name):
+        function(*[resolve(value) for value in args], **{key: resolve(value) for key, value in kwargs.items()})
+    return name
+
+
+def run_worker_job(job, profile_settings):
+    """
+    run_job() in a worker process, returning the steps it recorded to the parent's report
+    """
+    configure(**profile_settings)
+    return run_job(job), take_steps()
+
+
+def run_figure_jobs(jobs, workers=FIGURE_WORKERS):
+    """
+    Render independent figures serially or across a process pool
+
+    Both modes run the same job function on the same memory-mapped inputs,
+    so the files written are identical; only the wall-clock time differs.
+
+    Parameters:
+    jobs (list): Specs from figure_job()
+    workers (int): Number of worker processes; 1 runs in this process
+    """
+    if workers <= 1 or len(jobs) <= 1:
+        for job in jobs:
+            run_job(job)
+        return
+
+    context = multiprocessing.get_context(START_METHOD)
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs)), mp_context=context) as pool:
+        futures = [pool.submit(run_worker_job, job, settings()) for job in jobs]
+        for future in as_completed(futures):
+            name, steps = future.result()
+            add_steps(steps)
+            print(f"Rendered {name}")
@@ -0,0 +1,485 @@
+# Author: Jingni Zhang
+# Date Created: 05.12.2025
+
+import argparse
+import ast
+import functools
+import hashlib
+import importlib
+import inspect
+import json
+import os
+import sys
+import textwrap
+import types
+
+import pandas as pd
+
+import EV_charger as charger
+import EV_reg as reg
+from EV_aggregate import CountCube
+from EV_access import ZCTA_FILE, charger_accessibility
+from EV_boundaries import BOUNDARY_FILE, load_boundaries
+from EV_cache import CACHE_DIR, file_fingerprint
+from EV_filters import FILTER_FILE
+from EV_gap import CHARGER_ZIP_FILE, GAP_FILE, PENETRATION_FILE, build_gap_table, charger_zip_year_counts
+from EV_parallel import FIGURE_WORKERS, figure_job, run_figure_jobs
+from EV_profile import add_arguments, add_outputs, run_instrumented
+from EV_spatial import area_summary, charger_areas, chargers_to_points
+from EV_tiles import TILE_STORE
+
+# Source files read by the pipeline
+REG_FILE = 'Vehicle_Registrations.csv'
+STATION_FILE = 'alt_fuel_stations.csv'
+
+# Intermediate stage outputs
+PIPELINE_DIR = os.path.join(CACHE_DIR, 'pipeline')
+CLEANED_FILE = os.path.join(PIPELINE_DIR, 'cleaned_reg.parquet')
+CUBE_FILE = os.path.join(PIPELINE_DIR, 'reg_cube.parquet')
+FLEET_FILE = os.path.join(PIPELINE_DIR, 'active_fleet.parquet')
+CHARGERS_FILE = os.path.join(PIPELINE_DIR, 'chargers.parquet')
+CHARGER_MAP_FILE = os.path.join(PIPELINE_DIR, 'charger_map.parquet')
+AREA_FILE = 'data/chargers_by_cousub.csv'
+ACCESS_FILE = 'data/charger_access_by_cousub_year.csv'
+
+# Charger columns read by the spatial stages (map table, area summary and accessibility)
+CHARGER_POINT_COLUMNS = ['ID', 'Latitude', 'Longitude', 'Year', 'Open Date', 'EV Level1 EVSE Num',
+                         'EV Level2 EVSE Num', 'EV DC Fast Count']
+STAGE_STATE_FILE = 'stages.json'
+
+# Modules whose code is followed when hashing a stage: the .py files next to this one
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+# Stage functions: each reads its declared inputs from disk and writes its outputs
+
+def clean_registrations():
+    reg.clean_ev_data(REG_FILE, filter_file=FILTER_FILE).to_parquet(CLEANED_FILE, index=False)
+
+
+def aggregate_registrations():
+    CountCube.from_frame(pd.read_parquet(CLEANED_FILE)).to_frame().to_parquet(CUBE_FILE, index=False)
+
+
+def count_active_fleet():
+    stock = reg.active_fleet_by_month(pd.read_parquet(CLEANED_FILE, columns=['Zip', 'reg_date', 'exp_date']))
+    stock.columns = stock.columns.astype(str)
+    stock.to_parquet(FLEET_FILE)
+
+
+def load_cube():
+    return CountCube.from_frame(pd.read_parquet(CUBE_FILE), weights='count')
+
+
+def load_active_fleet():
+    stock = pd.read_parquet(FLEET_FILE)
+    stock.columns = pd.PeriodIndex(stock.columns, freq='M')
+    return stock
+
+
+def plot_registration_chart(chart):
+    {
+        'zip': reg.analyze_ev_data_basic,
+        'reg_type': reg.create_heatmap,
+        'zip_year': reg.create_zip_heatmap,
+        'ev_share': reg.create_ev_share_heatmap
+    }[chart](load_cube())
+
+
+def plot_active_fleet_chart():
+    reg.plot_active_fleet(load_active_fleet())
+
+
+def ingest_chargers():
+    charger.load_charger_data(STATION_FILE).to_parquet(CHARGERS_FILE, index=False)
+
+
+def project_chargers():
+    charger.map_frame(load_charger_points()).to_parquet(CHARGER_MAP_FILE, index=False)
+
+
+def load_charger_points():
+    chargers = pd.read_parquet(CHARGERS_FILE, columns=CHARGER_POINT_COLUMNS)
+    return chargers_to_points(chargers.dropna(subset=['Latitude', 'Longitude']))
+
+
+def join_chargers_to_areas():
+    gdf_chargers = load_charger_points()
+    area_stats = area_summary(gdf_chargers, load_boundaries(), charger_areas(gdf_chargers))
+    area_stats.drop(columns='geometry').to_csv(AREA_FILE, index=False)
+
+
+def measure_accessibility():
+    access = charger_accessibility(load_charger_points())
+    access['cousub'].to_csv(ACCESS_FILE, index=False)
+    if access['zip'] is not None:
+        access['zip'].to_csv('data/charger_access_by_zip_year.csv', index=False)
+
+
+def write_charger_tables():
+    elec_df = pd.read_parquet(CHARGERS_FILE)
+    elec_df.to_csv('data/electric_charging_stations.csv', index=False)
+    charger_zip_year_counts(elec_df).to_csv(CHARGER_ZIP_FILE)
+    charger.summary_statistics(elec_df).to_csv('data/summary_statistics.csv', index=False)
+
+
+def plot_charger_chart(chart):
+    elec_df = pd.read_parquet(CHARGERS_FILE, columns=['ZIP', 'Year'])
+    if chart == 'zip':
+        charger.plot_chargers_by_zip(elec_df['ZIP'].value_counts().head(20))
+        return
+    yearly_counts = elec_df['Year'].value_counts().sort_index()
+    {'timeline': charger.plot_cumulative_timeline, 'by_year': charger.plot_installations_by_year}[chart](yearly_counts)
+
+
+def plot_charger_map(chart, style=None):
+    chargers = pd.read_parquet(CHARGER_MAP_FILE)
+    if chart == 'density':
+        charger.plot_density_map(chargers, pd.read_csv(AREA_FILE, dtype={'GEOID': str}), style)
+    elif chart == 'nyc':
+        charger.plot_nyc_map(chargers, pd.read_csv(AREA_FILE, dtype={'GEOID': str}), style)
+    elif chart == 'panels':
+        charger.plot_period_panels(chargers, style)
+    elif chart == 'heatmap':
+        charger.plot_heatmap(chargers)
+    else:
+        charger.plot_animation(chargers)
+
+
+def join_gap_table():
+    build_gap_table(PENETRATION_FILE, CHARGER_ZIP_FILE, GAP_FILE)
+
+
+def stage(name, function, deps=(), sources=(), outputs=(), params=None):
+    """
+    One pipeline step
+
+    Parameters:
+    name (str): Stage name used on the command line
+    function (callable): Module-level function run as function(**params);
+        it and all repository code it reaches are part of the stage's key
+    deps (tuple): Upstream stages whose outputs this stage reads
+    sources (tuple): Raw input files (a missing optional file hashes as None)
+    outputs (tuple): Files the stage writes
+    params (dict or None): Keyword arguments, part of the key
+    """
+    return {'name': name, 'function': function, 'deps': list(deps), 'sources': list(sources),
+            'outputs': list(outputs), 'params': params or {}}
+
+
+def pipeline_stages():
+    """
+    Every stage in dependency order
+    """
+    map_sources = (BOUNDARY_FILE, TILE_STORE)
+    return [
+        # Registrations
+        stage('reg_clean', clean_registrations, sources=(REG_FILE, FILTER_FILE),
+              outputs=(CLEANED_FILE, 'data/filter_stats.csv')),
+        stage('reg_cube', aggregate_registrations, deps=('reg_clean',), outputs=(CUBE_FILE,)),
+        stage('reg_active_fleet', count_active_fleet, deps=('reg_clean',), outputs=(FLEET_FILE,)),
+        stage('chart_reg_zip', plot_registration_chart, deps=('reg_cube',),
+              outputs=('graphs/record_by_zip_2024.png', 'graphs/reg_by_zip_and_year.png'),
+              params={'chart': 'zip'}),
+        stage('chart_reg_type', plot_registration_chart, deps=('reg_cube',),
+              outputs=('graphs/reg_type_year_heatmap.png', 'graphs/reg_type_year_pct_heatmap.png'),
+              params={'chart': 'reg_type'}),
+        stage('chart_zip_year', plot_registration_chart, deps=('reg_cube',),
+              outputs=('graphs/zip_year_heatmap.png', 'graphs/zip_year_pct_heatmap.png'),
+              params={'chart': 'zip_year'}),
+        stage('chart_ev_share', plot_registration_chart, deps=('reg_cube',),
+              outputs=(PENETRATION_FILE, 'graphs/ev_share_zip_year_heatmap.png'),
+              params={'chart': 'ev_share'}),
+        stage('chart_active_fleet', plot_active_fleet_chart, deps=('reg_active_fleet',),
+              outputs=('graphs/active_fleet_by_month.png',)),
+
+        # Charging stations
+        stage('chargers_ingest', ingest_chargers, sources=(STATION_FILE,), outputs=(CHARGERS_FILE,)),
+        stage('chargers_project', project_chargers, deps=('chargers_ingest',), outputs=(CHARGER_MAP_FILE,)),
+        stage('spatial_join', join_chargers_to_areas, deps=('chargers_ingest',),
+              sources=(BOUNDARY_FILE,), outputs=(AREA_FILE,)),
+        stage('accessibility', measure_accessibility, deps=('chargers_ingest',), sources=(BOUNDARY_FILE, ZCTA_FILE),
+              outputs=(ACCESS_FILE,)),
+        stage('charger_tables', write_charger_tables, deps=('chargers_ingest',),
+              outputs=('data/electric_charging_stations.csv', CHARGER_ZIP_FILE, 'data/summary_statistics.csv')),
+        stage('chart_timeline', plot_charger_chart, deps=('chargers_ingest',),
+              outputs=('graphs/ev_chargers_timeline.png',), params={'chart': 'timeline'}),
+        stage('chart_installations', plot_charger_chart, deps=('chargers_ingest',),
+              outputs=('graphs/ev_chargers_by_year.png',), params={'chart': 'by_year'}),
+        stage('chart_charger_zip', plot_charger_chart, deps=('chargers_ingest',),
+              outputs=('graphs/ev_chargers_by_zip.png',), params={'chart': 'zip'}),
+        stage('map_density', plot_charger_map, deps=('chargers_project', 'spatial_join'), sources=map_sources,
+              outputs=('graphs/ev_chargers_density.png',),
+              params={'chart': 'density', 'style': charger.MAP_STYLES['density']}),
+        stage('map_heatmap', plot_charger_map, deps=('chargers_project',), sources=map_sources,
+              outputs=('graphs/ev_chargers_heatmap.png',), params={'chart': 'heatmap'}),
+        stage('map_nyc', plot_charger_map, deps=('chargers_project', 'spatial_join'), sources=map_sources,
+              outputs=('graphs/ev_chargers_nyc.png',),
+              params={'chart': 'nyc', 'style': charger.MAP_STYLES['nyc']}),
+        stage('map_panels', plot_charger_map, deps=('chargers_project',), sources=map_sources,
+              outputs=('graphs/ev_chargers_by_year_panels.png',),
+              params={'chart': 'panels', 'style': charger.MAP_STYLES['panels']}),
+        stage('map_animation', plot_charger_map, deps=('chargers_project',), sources=map_sources,
+              outputs=('graphs/ev_chargers_by_year.gif',), params={'chart': 'animation'}),
+
+        # Both sides joined
+        stage('gap', join_gap_table, deps=('chart_ev_share', 'charger_tables'), outputs=(GAP_FILE,))
+    ]
+
+
+def repo_modules():
+    return {name[:-3] for name in os.listdir(REPO_DIR) if name.endswith('.py')}
+
+
+def is_repo_code(value):
+    module = inspect.getmodule(value)
+    module_file = getattr(module, '__file__', None)
+    return module_file is not None and os.path.dirname(os.path.abspath(module_file)) == REPO_DIR
+
+
+def used_names(source):
+    """
+    Names, attributes and imported modules used in a block of source
+    """
+    names = set()
+    for node in ast.walk(ast.parse(textwrap.dedent(source))):
+        if isinstance(node, ast.Name):
+            names.add(node.id)
+        elif isinstance(node, ast.Attribute):
+            names.add(node.attr)
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            names.add(node.module)
+        elif isinstance(node, ast.alias):
+            names.add(node.name.split('.')[0])
+    return names
+
+
+@functools.lru_cache(maxsize=None)
+def module_globals(module_name):
+    """
+    Top-level names of a repository module: the source of each assignment,
+    and the (module, name) each repository import comes from
+    """
+    source = inspect.getsource(sys.modules[module_name])
+    assignments, imports = {}, {}
+    for node in ast.parse(source).body:
+        if isinstance(node, (ast.Assign, ast.AnnAssign)):
+            for target in node.targets if isinstance(node, ast.Assign) else [node.target]:
+                for name in ast.walk(target):
+                    if isinstance(name, ast.Name):
+                        assignments[name.id] = ast.get_source_segment(source, node)
+        elif isinstance(node, ast.ImportFrom) and node.module in repo_modules():
+            for alias in node.names:
+                imports[alias.asname or alias.name] = (node.module, alias.name)
+    return assignments, imports
+
+
+def code_closure(function):
+    """
+    Source of function and of every repository function, class and constant it reaches
+
+    Names used by each piece of source are looked up in its module and in
+    the repository modules it refers to (including ones imported inside
+    functions), and followed until no new repository code is found, so an
+    edit anywhere along the call chain changes the stage key. Constants are
+    hashed by their assignment, not their current value, so state mutated
+    while running does not count. Dispatching functions pull in every branch.
+
+    Returns:
+    dict: Qualified name -> source
+    """
+    modules = repo_modules()
+    closure = {}
+    pending = [function]
+    while pending:
+        item = pending.pop()
+        if isinstance(item, tuple):
+            module_name, name = item
+            key = f"{module_name}.{name}"
+            source = module_globals(module_name)[0].get(name)
+        else:
+            item = inspect.unwrap(item)
+            module_name = item.__module__
+            key = f"{module_name}.{item.__qualname__}"
+            source = inspect.getsource(item)
+        if key in closure or source is None:
+            continue
+        closure[key] = source
+
+        names = used_names(source)
+        module = sys.modules[module_name]
+        scopes = [module] + [importlib.import_module(used) for used in sorted(names & modules)]
+        scopes += [vars(module)[used] for used in sorted(names) if isinstance(vars(module).get(used), types.ModuleType)
+                   and is_repo_code(vars(module)[used])]
+        for used in sorted(names):
+            for scope in scopes:
+                assignments, imports = module_globals(scope.__name__)
+                target = vars(scope).get(used)
+                if (inspect.isfunction(inspect.unwrap(target)) or inspect.isclass(target)) and is_repo_code(target):
+                    pending.append(target)
+                elif used in assignments:
+                    pending.append((scope.__name__, used))
+                elif used in imports:
+                    pending.append(imports[used])
+    return closure
+
+
+def source_hash(function):
+    closure = code_closure(function)
+    return hashlib.sha256(json.dumps(closure, sort_keys=True).encode()).hexdigest()
+
+
+def stage_key(stage_def, by_name):
+    """
+    Content hash of a stage: its code, parameters and the contents of every input file
+
+    Upstream outputs are hashed by content, so a stage whose inputs were
+    rewritten unchanged is still up to date.
+    """
+    inputs = list(stage_def['sources'])
+    for dep in stage_def['deps']:
+        inputs += by_name[dep]['outputs']
+
+    content = {
+        'code': source_hash(stage_def['function']),
+        'params': stage_def['params'],
+        'inputs': {path: file_fingerprint(path)['sha256'] if os.path.exists(path) else None
+                   for path in inputs}
+    }
+    return hashlib.sha256(json.dumps(content, sort_keys=True).encode()).hexdigest()
+
+
+def load_stage_state():
+    path = os.path.join(PIPELINE_DIR, STAGE_STATE_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_stage_state(state):
+    os.makedirs(PIPELINE_DIR, exist_ok=True)
+    with open(os.path.join(PIPELINE_DIR, STAGE_STATE_FILE), 'w') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+
+
+def select_stages(stages, targets=None):
+    """
+    Targets plus everything upstream of them, in dependency order; all stages if no targets
+    """
+    if not targets:
+        return stages
+    by_name = {stage_def['name']: stage_def for stage_def in stages}
+    unknown = [target for target in targets if target not in by_name]
+    if unknown:
+        raise ValueError(f"Unknown stages {unknown}; available: {list(by_name)}")
+
+    needed = set()
+    pending = list(targets)
+    while pending:
+        name = pending.pop()
+        if name not in needed:
+            needed.add(name)
+            pending += by_name[name]['deps']
+    return [stage_def for stage_def in stages if stage_def['name'] in needed]
+
+
+def stage_levels(stages):
+    """
+    Group stages so each group only depends on earlier groups
+    """
+    depth = {}
+    for stage_def in stages:
+        depth[stage_def['name']] = 1 + max((depth[dep] for dep in stage_def['deps'] if dep in depth), default=-1)
+    return [[stage_def for stage_def in stages if depth[stage_def['name']] == level]
+            for level in range(max(depth.values(), default=-1) + 1)]
+
+
+def run_pipeline(targets=None, force=False, workers=FIGURE_WORKERS, dry_run=False):
+    """
+    Run the stages needed for the targets, skipping those that are up to date
+
+    A stage is up to date when its key (code, parameters and input
+    contents) matches the last successful run and all of its outputs
+    exist. Stages at the same depth are independent and are run through
+    the figure process pool when workers > 1. Outputs and stage state are
+    written under PIPELINE_DIR.
+
+    Parameters:
+    targets (list or None): Stage names; None runs the whole pipeline
+    force (bool): Rerun the selected stages even if up to date
+    workers (int): Processes for independent stages
+    dry_run (bool): Only report which stages would run
+
+    Returns:
+    list: Names of the stages that ran (or would run)
+    """
+    os.makedirs(PIPELINE_DIR, exist_ok=True)
+    os.makedirs('data', exist_ok=True)
+    os.makedirs('graphs', exist_ok=True)
+
+    stages = pipeline_stages()
+    by_name = {stage_def['name']: stage_def for stage_def in stages}
+    state = load_stage_state()
+    ran = []
+
+    for level in stage_levels(select_stages(stages, targets)):
+        stale = []
+        for stage_def in level:
+            key = stage_key(stage_def, by_name)
+            fresh = state.get(stage_def['name']) == key and all(os.path.exists(path) for path in stage_def['outputs'])
+            if force or not fresh:
+                stale.append((stage_def, key))
+            else:
+                print(f"[skip] {stage_def['name']} (up to date)")
+
+        if dry_run:
+            # Downstream keys depend on outputs that have not been rebuilt yet
+            ran += [stage_def['name'] for stage_def, _ in stale]
+            for stage_def, _ in stale:
+                print(f"[would run] {stage_def['name']}")
+            continue
+
+        for stage_def, _ in stale:
+            print(f"[run] {stage_def['name']}")
+        run_figure_jobs([figure_job(stage_def['name'], stage_def['function'], **stage_def['params'])
+                         for stage_def, _ in stale], workers=workers)
+
+        for stage_def, key in stale:
+            state[stage_def['name']] = key
+            ran.append(stage_def['name'])
+            add_outputs(stage_def['name'], stage_def['outputs'])
+        save_stage_state(state)
+
+    return ran
+
+
+def main():
+    """
+    Command-line entry point: run the whole pipeline, one stage or a subgraph
+    """
+    parser = argparse.ArgumentParser(description="Run the EV analysis as cached stages")
+    parser.add_argument('stages', nargs='*', help="Stages to bring up to date (with their upstream stages); default all")
+    parser.add_argument('--list', action='store_true', help="List the stages and exit")
+    parser.add_argument('--force', action='store_true', help="Rerun the selected stages even if up to date")
+    parser.add_argument('--dry-run', action='store_true', help="Show which stages would run")
+    parser.add_argument('--workers', type=int, default=FIGURE_WORKERS, help="Processes for independent stages")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    if args.list:
+        for stage_def in pipeline_stages():
+            deps = ', '.join(stage_def['deps']) or '-'
+            print(f"{stage_def['name']:<20} after: {deps:<35} writes: {', '.join(stage_def['outputs'])}")
+        return
+
+    unknown = sorted(set(args.stages) - {stage_def['name'] for stage_def in pipeline_stages()})
+    if unknown:
+        parser.error(f"unknown stages {unknown}; use --list to see them")
+
+    run_instrumented(run_pipeline, args, targets=args.stages, force=args.force, workers=args.workers,
+                     dry_run=args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
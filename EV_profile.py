@@ -0,0 +1,305 @@
+# Author: Jingni Zhang
+# Date Created: 05.18.2025
+
+import json
+import os
+import platform
+import shutil
+import signal
+import subprocess
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows; peak memory is then not recorded
+    resource = None
+
+# Run reports and profiles are written here
+REPORT_DIR = 'reports'
+
+# Settings of this process; figure workers receive a copy from settings()
+SETTINGS = {'trace_memory': False, 'profile_step': None, 'profiler': 'cprofile'}
+
+# Finished steps of this process, in the order they ended, and the steps still open
+STEPS = []
+OPEN_STEPS = []
+RUN_START = time.time()
+
+
+def configure(trace_memory=False, profile_step=None, profiler='cprofile'):
+    """
+    Set what the steps record
+
+    Parameters:
+    trace_memory (bool): Track the peak Python/numpy allocation of every step
+        with tracemalloc (slows allocation-heavy code down)
+    profile_step (str or None): Name of one step to profile
+    profiler (str): 'cprofile' writes a .prof file for pstats/snakeviz;
+        'py-spy' samples the process with py-spy while the step runs
+    """
+    SETTINGS.update(trace_memory=trace_memory, profile_step=profile_step, profiler=profiler)
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def settings():
+    return dict(SETTINGS)
+
+
+def current_rss_mb():
+    """
+    Resident memory of this process now (Linux), or None where /proc is unavailable
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError):
+        return None
+
+
+def max_rss_mb(children=False):
+    """
+    Peak resident memory so far of this process or its finished children,
+    or None where the resource module is unavailable (Windows)
+
+    ru_maxrss is in KB on Linux and bytes on macOS.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10, 1)
+
+
+def start_profiler(name):
+    """
+    Start the configured profiler for a step; returns a function that stops it
+    """
+    os.makedirs(REPORT_DIR, exist_ok=True)
+    stem = os.path.join(REPORT_DIR, f"profile_{name.replace(' ', '_').replace('/', '_')}_{os.getpid()}")
+
+    if SETTINGS['profiler'] == 'py-spy':
+        if shutil.which('py-spy') is None:
+            print("py-spy is not installed; profiling with cProfile instead")
+        else:
+            output = stem + '.svg'
+            sampler = subprocess.Popen(['py-spy', 'record', '--pid', str(os.getpid()), '--output', output,
+                                        '--rate', '200', '--nonblocking'],
+                                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            # Give py-spy time to attach before the step starts
+            time.sleep(1)
+
+            def stop():
+                sampler.send_signal(signal.SIGINT)
+                sampler.wait()
+                return output
+            return stop
+
+    import cProfile
+    profiler = cProfile.Profile()
+    profiler.enable()
+
+    def stop():
+        profiler.disable()
+        profiler.dump_stats(stem + '.prof')
+        return stem + '.prof'
+    return stop
+
+
+@contextmanager
+def step(name, rows_in=None, outputs=(), accumulate=False):
+    """
+    Time a step and record its memory, rows and bytes written
+
+    The yielded dict can be updated inside the block, e.g. with rows_out or
+    more output paths. Steps may nest; each record names its parent.
+
+    Parameters:
+    name (str): Step name, also what --profile selects
+    rows_in (int or None): Rows going in
+    outputs (list): Files the step writes; their sizes are summed as bytes_written
+    accumulate (bool): Merge repeated runs of the step under the same parent
+        (e.g. once per chunk) into one record with a call count
+    """
+    record = {'name': name, 'parent': OPEN_STEPS[-1]['name'] if OPEN_STEPS else None, 'pid': os.getpid(),
+              'rows_in': rows_in, 'rows_out': None, 'outputs': list(outputs)}
+    tracing = SETTINGS['trace_memory'] and tracemalloc.is_tracing()
+    if tracing:
+        # Fold the peak so far into the open steps before resetting it for this one
+        traced_now, traced_peak = tracemalloc.get_traced_memory()
+        for parent in OPEN_STEPS:
+            parent['_traced_peak'] = max(parent['_traced_peak'], traced_peak)
+        tracemalloc.reset_peak()
+        record['_traced_peak'] = traced_now
+
+    stop_profiler = start_profiler(name) if name == SETTINGS['profile_step'] else None
+    OPEN_STEPS.append(record)
+    started = time.time()
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        seconds = time.perf_counter() - start
+        OPEN_STEPS.pop()
+        if stop_profiler is not None:
+            record['profile'] = stop_profiler()
+            print(f"Profile of step '{name}' written to {record['profile']}")
+
+        record.update(started=round(started, 3), seconds=round(seconds, 4), calls=1,
+                      bytes_written=sum(os.path.getsize(path) for path in record['outputs']
+                                        if os.path.exists(path)),
+                      rss_mb=current_rss_mb(), max_rss_mb=max_rss_mb())
+        if tracing:
+            traced_peak = max(record.pop('_traced_peak'), tracemalloc.get_traced_memory()[1])
+            record['traced_peak_mb'] = round(traced_peak / 2 ** 20, 1)
+            for parent in OPEN_STEPS:
+                parent['_traced_peak'] = max(parent['_traced_peak'], traced_peak)
+        if record['rss_mb'] is not None:
+            record['rss_mb'] = round(record['rss_mb'], 1)
+
+        previous = next((earlier for earlier in STEPS if accumulate and earlier['name'] == name
+                         and earlier['parent'] == record['parent'] and earlier['pid'] == record['pid']), None)
+        if previous is None:
+            STEPS.append(record)
+        else:
+            merge_step(previous, record)
+
+
+def merge_step(total, record):
+    """
+    Add a repeated step's run to its first record
+    """
+    total['calls'] += 1
+    total['seconds'] = round(total['seconds'] + record['seconds'], 4)
+    total['bytes_written'] += record['bytes_written']
+    total['outputs'] += [path for path in record['outputs'] if path not in total['outputs']]
+    for key in ['rows_in', 'rows_out']:
+        if record[key] is not None:
+            total[key] = (total[key] or 0) + record[key]
+    for key in ['rss_mb', 'max_rss_mb', 'traced_peak_mb']:
+        if record.get(key) is not None:
+            total[key] = max(total.get(key) or 0, record[key])
+
+
+def timed_iter(name, iterable):
+    """
+    Iterate while recording the time spent producing items (e.g. reading CSV chunks) as one step
+    """
+    iterator = iter(iterable)
+    while True:
+        with step(name, accumulate=True) as record:
+            item = next(iterator, None)
+            record['rows_out'] = 0 if item is None else len(item)
+        if item is None:
+            return
+        yield item
+
+
+def savefig(path, **kwargs):
+    """
+    plt.savefig as a step, so rendering and PNG encoding time and the file size are recorded
+    """
+    import matplotlib.pyplot as plt
+
+    with step(f"savefig {os.path.basename(path)}", outputs=[path]):
+        plt.savefig(path, **kwargs)
+
+
+def take_steps():
+    """
+    Remove and return the finished steps of this process (sent back by figure workers)
+    """
+    steps = list(STEPS)
+    STEPS.clear()
+    return steps
+
+
+def add_steps(steps):
+    STEPS.extend(steps)
+
+
+def add_outputs(name, paths):
+    """
+    Attach files written by a step to its last record after the fact
+    """
+    record = next(earlier for earlier in reversed(STEPS) if earlier['name'] == name)
+    record['outputs'] += list(paths)
+    record['bytes_written'] += sum(os.path.getsize(path) for path in paths if os.path.exists(path))
+
+
+def report(status='ok', **metadata):
+    """
+    Structured summary of the run: process metadata plus every recorded step
+    """
+    return {
+        'script': os.path.basename(sys.argv[0]),
+        'argv': sys.argv[1:],
+        'status': status,
+        'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(RUN_START)),
+        'started_epoch': round(RUN_START, 3),
+        'seconds': round(time.time() - RUN_START, 3),
+        'pid': os.getpid(),
+        'python': platform.python_version(),
+        'settings': settings(),
+        'max_rss_mb': max_rss_mb(),
+        'max_child_rss_mb': max_rss_mb(children=True),
+        **metadata,
+        'steps': STEPS
+    }
+
+
+def write_report(path=None, status='ok', **metadata):
+    """
+    Write the run report as JSON and print the slowest steps
+
+    Parameters:
+    path (str or None): Output file; defaults to reports/<script>_<start time>.json
+    status (str): 'ok' or 'failed'
+    """
+    run = report(status, **metadata)
+    if path is None:
+        stem = os.path.splitext(run['script'])[0] or 'run'
+        path = os.path.join(REPORT_DIR, f"{stem}_{run['started'].replace(':', '')}.json")
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(run, f, indent=2, default=str)
+
+    print(f"Slowest steps ({run['seconds']:.1f} s in total):")
+    for record in sorted(STEPS, key=lambda record: record['seconds'], reverse=True)[:10]:
+        if 'traced_peak_mb' in record:
+            memory = f"{record['traced_peak_mb']:8.0f} MB peak traced"
+        elif record['max_rss_mb'] is not None:
+            memory = f"{record['max_rss_mb']:8.0f} MB peak RSS"
+        else:
+            memory = ''
+        print(f"  {record['name']:<40} {record['seconds']:8.2f} s  {memory}")
+    print(f"Run report written to {path}")
+    return path
+
+
+def add_arguments(parser):
+    """
+    Instrumentation options shared by the scripts' command lines
+    """
+    parser.add_argument('--report', help="Run report file (default reports/<script>_<time>.json)")
+    parser.add_argument('--trace-memory', action='store_true', help="Record each step's peak allocation")
+    parser.add_argument('--profile', metavar='STEP', help="Profile one step, e.g. 'savefig ev_chargers_nyc.png'")
+    parser.add_argument('--profiler', choices=['cprofile', 'py-spy'], default='cprofile',
+                        help="Profiler used by --profile")
+
+
+def run_instrumented(main, args, **kwargs):
+    """
+    Run a script's main() with the options from add_arguments() and always write the report
+    """
+    configure(trace_memory=args.trace_memory, profile_step=args.profile, profiler=args.profiler)
+    status = 'failed'
+    try:
+        result = main(**kwargs)
+        status = 'ok'
+        return result
+    finally:
+        write_report(args.report, status)
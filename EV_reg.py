@@ -1,89 +1,363 @@
 # Author: Jingni Zhang
 # Date Created: 04.08.2025
 
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
+import argparse
+import functools
 import os
+from EV_cache import CACHE_DIR, cache_key
+from EV_dates import parse_dates
+from EV_filters import FILTER_FILE, compile_mask, empty_filter_stats, filter_report, load_filter_rules, rules_on_columns
+from EV_aggregate import CountCube, ev_penetration
+from EV_parallel import FIGURE_WORKERS, figure_job, run_figure_jobs, share_input
+from EV_profile import add_arguments, run_instrumented, savefig, step, timed_iter
 
-# Set plot style
-plt.style.use('ggplot')
-sns.set(font_scale=1.2)
+# Raw columns that are never used downstream
+COLUMNS_TO_DROP = [
+    'Maximum Gross Weight', 
+    'Passengers', 
+    'Color', 
+    'Scofflaw Indicator', 
+    'Suspension Indicator', 
+    'Revocation Indicator'
+]
 
-def clean_ev_data():
+COLUMN_RENAME_MAP = {
+    'Record Type': 'record_type',
+    'Registration Class': 'reg_class',
+    'Model Year': 'model_year',
+    'Body Type': 'body_type',
+    'Fuel Type': 'fuel_type',
+    'Unladen Weight': 'weight',
+    'Reg Valid Date': 'reg_date',
+    'Reg Expiration Date': 'exp_date'
+}
+
+# Rows per chunk when streaming the raw file; peak memory scales with this
+CHUNK_SIZE = 500000
+
+# Code columns are read as strings in chunked mode so every chunk gets the same dtype
+CHUNK_DTYPES = {
+    'Record Type': str,
+    'VIN': str,
+    'Registration Class': str,
+    'Body Type': str,
+    'Fuel Type': str,
+    'Zip': str,
+    'Reg Valid Date': str,
+    'Reg Expiration Date': str
+}
+
+# Compact dtypes applied to the cleaned frame at ingest; columns missing from
+# the source file are skipped
+REG_SCHEMA = {
+    'record_type': 'category',
+    'reg_class': 'category',
+    'City': 'category',
+    'State': 'category',
+    'County': 'category',
+    'Make': 'category',
+    'body_type': 'category',
+    'fuel_type': 'category',
+    'Zip': 'Int32',
+    'model_year': 'Int16',
+    'reg_year': 'int16',
+    'weight': 'float32',
+    'reg_date': 'datetime',
+    'exp_date': 'datetime'
+}
+
+
+def filter_ev_records(df, rules, verbose=True):
     """
-    Clean and preprocess EV registration data
+    Rename columns, derive reg_year and apply the filter rules
     
-    """
-    # Read the CSV file from the data folder in GitHub
-    print("Reading data from data/Vehicle_Registrations.csv...")
-    df = pd.read_csv("Vehicle_Registrations.csv")
+    Rules on columns already in the raw data (record_type, reg_class,
+    body_type, ...) are compiled into one mask and applied first, so
+    reg_date is only parsed for rows that can still be kept. Rules on
+    reg_year form a second mask, evaluated on those remaining rows.
     
-    # Print initial data info
-    print(f"Initial data shape: {df.shape}")
+    Parameters:
+    df (DataFrame): Raw registration rows (full file or a single chunk)
+    rules (list): Filter rules from load_filter_rules()
+    verbose (bool): Print a progress line for each step
     
-    # Drop unnecessary variables
-    print("Dropping unnecessary columns...")
-    columns_to_drop = [
-        'Maximum Gross Weight', 
-        'Passengers', 
-        'Color', 
-        'Scofflaw Indicator', 
-        'Suspension Indicator', 
-        'Revocation Indicator'
-    ]
-    df = df.drop(columns=columns_to_drop)
+    Returns:
+    tuple: (rows that pass every rule with reg_year added, per-rule stats)
+    """
+    def log(message):
+        if verbose:
+            print(message)
     
     # Rename all variables
-    print("Renaming columns...")
-    column_rename_map = {
-        'Record Type': 'record_type',
-        'Registration Class': 'reg_class',
-        'Model Year': 'model_year',
-        'Body Type': 'body_type',
-        'Fuel Type': 'fuel_type',
-        'Unladen Weight': 'weight',
-        'Reg Valid Date': 'reg_date',
-        'Reg Expiration Date': 'exp_date'
-    }
-    df = df.rename(columns=column_rename_map)
+    log("Renaming columns...")
+    df = df.rename(columns=COLUMN_RENAME_MAP)
     
-    # Keep only when registration type is vehicle type, avoiding boats or other types
-    print("Filtering for record_type = 'VEH'...")
-    df = df[df['record_type'] == 'VEH']
+    # Apply rules on raw columns before any parsing
+    raw_rules, derived_rules = rules_on_columns(rules, df.columns)
+    log(f"Applying filters on {', '.join(rule['column'] for rule in raw_rules)}...")
+    keep, raw_stats = compile_mask(df, raw_rules)
+    df = df[keep]
     
     # Create reg_year from reg_date
-    print("Creating reg_year from reg_date...")
-    # Extract year from date (format MM/DD/YYYY)
-    df['reg_year'] = df['reg_date'].str.split('/').str[2].astype(int)
-    
-    # Drop observations where reg_year is before 2000
-    print("Dropping records before year 2000...")
-    df = df[df['reg_year'] >= 2000]
-    
-    # Drop specific reg_class values
-    print("Filtering reg_class values...")
-    reg_class_to_drop = ['ATD', 'ATV', 'SNO', 'ORM', 'BOT', 'MOT', 'TRC']
-    df = df[~df['reg_class'].isin(reg_class_to_drop)]
-    
-    # Drop specific body_type values
-    print("Filtering body_type values...")
-    body_type_to_drop = ['N/A', 'BOAT', 'FIRE', 'S/SP', 'SN/P', 'TRAV', 'MOBL', 'SNOW', 'MCY', 'LOCO', 'W/DR', 'W/SR', 'RBM']
-    df = df[~df['body_type'].isin(body_type_to_drop)]
-    
-    # Save the cleaned data to the same folder
-    output_file = "cleaned_EV_reg.csv"
-    print(f"Saving cleaned data to {output_file}...")
-    df.to_csv(output_file, index=False)
+    log("Creating reg_year from reg_date...")
+    # Parse the dates once (format detected from a sample, MM/DD/YYYY in the DMV file)
+    reg_date, _ = parse_dates(df['reg_date'])
+    df = df.assign(reg_date=reg_date, reg_year=reg_date.dt.year)
+    
+    # Apply rules on derived columns (e.g. drop records before 2000)
+    log(f"Applying filters on {', '.join(rule['column'] for rule in derived_rules)}...")
+    keep, derived_stats = compile_mask(df, derived_rules)
+    df = df[keep]
+    
+    return df, pd.concat([raw_stats, derived_stats])
+
+
+def apply_reg_schema(df):
+    """
+    Convert a cleaned frame to the compact dtypes in REG_SCHEMA
+    
+    Codes become categoricals, ZIPs and years become small integers (ZIPs
+    that are not numeric become missing) and the date strings become
+    datetimes.
+    """
+    typed = {}
+    for column, dtype in REG_SCHEMA.items():
+        if column not in df.columns:
+            continue
+        if dtype == 'category':
+            typed[column] = df[column].astype('category')
+        elif dtype == 'datetime':
+            typed[column], _ = parse_dates(df[column])
+        else:
+            typed[column] = pd.to_numeric(df[column], errors='coerce').astype(dtype)
+    return df.assign(**typed)
+
+
+def concat_typed_chunks(chunks):
+    """
+    Concatenate typed chunks, unifying categories so categoricals survive the concat
+
+    A column that is categorical in any chunk is made categorical in all of
+    them (an all-missing column read back from Parquet is plain object).
+    """
+    chunks = [chunk for chunk in chunks if len(chunk) > 0] or chunks[:1]
+    for column in chunks[0].columns:
+        if any(isinstance(chunk[column].dtype, pd.CategoricalDtype) for chunk in chunks):
+            chunks = [chunk if isinstance(chunk[column].dtype, pd.CategoricalDtype)
+                      else chunk.assign(**{column: chunk[column].astype('category')}) for chunk in chunks]
+            categories = pd.Index(sorted(set().union(*(chunk[column].cat.categories for chunk in chunks))))
+            chunks = [chunk.assign(**{column: chunk[column].cat.set_categories(categories)}) for chunk in chunks]
+    return pd.concat(chunks, ignore_index=True)
+
+
+def untyped_bytes(raw, kept):
+    """
+    Deep memory usage per column of the kept rows before the typed schema
+
+    reg_date is already parsed in kept, so it is measured on the raw date
+    strings of the same rows instead.
+    
+    Parameters:
+    raw (DataFrame): Rows as read from the CSV (full file or a single chunk)
+    kept (DataFrame): The rows of raw that passed filter_ev_records()
+    
+    Returns:
+    Series: Bytes per column
+    """
+    before_bytes = kept.memory_usage(index=False, deep=True)
+    before_bytes['reg_date'] = raw.loc[kept.index, 'Reg Valid Date'].memory_usage(index=False, deep=True)
+    return before_bytes
+
+
+def memory_report(before_bytes, after_bytes):
+    """
+    Print and return bytes per column before and after the typed schema
+    
+    Parameters:
+    before_bytes (Series): Deep memory usage per column of the untyped frame (from untyped_bytes())
+    after_bytes (Series): Deep memory usage per column of the typed frame
+    
+    Returns:
+    DataFrame: Bytes before/after and the reduction per column, with a total row
+    """
+    report = pd.DataFrame({'before_bytes': before_bytes, 'after_bytes': after_bytes}).fillna(0).astype('int64')
+    report.loc['Total'] = report.sum()
+    report['reduction_pct'] = (1 - report['after_bytes'] / report['before_bytes'].where(report['before_bytes'] > 0)) * 100
+    
+    print("Memory usage by column (bytes):")
+    print(report.round(1).to_string())
+    return report
+
+
+def clean_ev_data(file_path="Vehicle_Registrations.csv", chunksize=CHUNK_SIZE, filter_file=FILTER_FILE):
+    """
+    Clean and preprocess EV registration data
+    
+    Per-rule counts of dropped rows are printed and saved to
+    data/filter_stats.csv.
+    
+    Parameters:
+    file_path (str): Path to the raw DMV registration CSV
+    chunksize (int or None): Rows per chunk for streaming ingest; None reads
+        the whole file in one pass
+    filter_file (str): TOML file with the filter rules
+    
+    Returns:
+    DataFrame: Cleaned registration data
+    """
+    rules = load_filter_rules(filter_file)
+    
+    # Only read the columns we keep
+    usecols = lambda column: column not in COLUMNS_TO_DROP
+    
+    if chunksize is None:
+        print(f"Reading data from {file_path}...")
+        with step('read_csv') as record:
+            df = pd.read_csv(file_path, usecols=usecols)
+            record['rows_out'] = len(df)
+        print(f"Initial data shape: {df.shape}")
+        rows_read = len(df)
+        with step('filter_and_type', rows_in=rows_read) as record:
+            kept, stats = filter_ev_records(df, rules)
+            before_bytes = untyped_bytes(df, kept)
+            df = apply_reg_schema(kept)
+            record['rows_out'] = len(df)
+    else:
+        # Stream the file so only one chunk of raw rows is in memory at a time
+        print(f"Reading data from {file_path} in chunks of {chunksize} rows...")
+        reader = pd.read_csv(file_path, usecols=usecols, dtype=CHUNK_DTYPES, chunksize=chunksize)
+        
+        kept_chunks = []
+        before_bytes = None
+        stats = None
+        rows_read = 0
+        for chunk in timed_iter('read_csv', reader):
+            rows_read += len(chunk)
+            with step('filter_and_type', rows_in=len(chunk), accumulate=True) as record:
+                kept, chunk_stats = filter_ev_records(chunk, rules, verbose=False)
+                stats = chunk_stats if stats is None else stats + chunk_stats
+                
+                # Type each chunk as it arrives so only compact survivors are kept
+                chunk_bytes = untyped_bytes(chunk, kept)
+                before_bytes = chunk_bytes if before_bytes is None else before_bytes.add(chunk_bytes, fill_value=0)
+                kept_chunks.append(apply_reg_schema(kept))
+                record['rows_out'] = len(kept)
+            print(f"Processed {rows_read} rows, kept {sum(len(c) for c in kept_chunks)}...")
+        
+        with step('concat_chunks'):
+            df = concat_typed_chunks(kept_chunks)
+        if stats is None:
+            stats = empty_filter_stats(rules)
+        print(f"Initial data rows: {rows_read}")
+    
     print(f"Final data shape: {df.shape}")
     
+    # Per-rule drop counts, saved so filters can be tuned without rerunning
+    report = filter_report(stats, rows_read)
+    os.makedirs("data", exist_ok=True)
+    report.to_csv('data/filter_stats.csv')
+    
+    memory_report(before_bytes, df.memory_usage(index=False, deep=True))
+    
     return df
 
-def analyze_ev_data_basic(df):
+
+def filter_config(filter_file=FILTER_FILE):
+    """
+    Settings that change the cleaned output; part of the cache key
+    """
+    return {
+        'columns_to_drop': COLUMNS_TO_DROP,
+        'column_rename_map': COLUMN_RENAME_MAP,
+        'rules': load_filter_rules(filter_file),
+        'schema': REG_SCHEMA
+    }
+
+
+def load_cleaned_ev_data(file_path="Vehicle_Registrations.csv", chunksize=CHUNK_SIZE, cache_dir=CACHE_DIR,
+                         filter_file=FILTER_FILE):
+    """
+    Return the cleaned registration data, reusing the Parquet cache when possible
+    
+    The cache file is named after a fingerprint of the source file (size,
+    mtime, content hash) and the filter configuration, so editing either
+    one triggers a fresh clean.
+    
+    Parameters:
+    file_path (str): Path to the raw DMV registration CSV
+    chunksize (int or None): Passed to clean_ev_data() on a cache miss
+    cache_dir (str): Folder for the cache and its fingerprint manifest
+    filter_file (str): TOML file with the filter rules
+    
+    Returns:
+    DataFrame: Cleaned registration data
+    """
+    key = cache_key(file_path, filter_config(filter_file), cache_dir)
+    cache_file = os.path.join(cache_dir, f"cleaned_EV_reg_{key}.parquet")
+    
+    if os.path.exists(cache_file):
+        print(f"Loading cleaned data from cache {cache_file}...")
+        with step('read_cleaned_cache') as record:
+            df = pd.read_parquet(cache_file)
+            record['rows_out'] = len(df)
+        print(f"Final data shape: {df.shape}")
+        return df
+    
+    with step('clean_ev_data') as record:
+        df = clean_ev_data(file_path, chunksize=chunksize, filter_file=filter_file)
+        record['rows_out'] = len(df)
+    
+    try:
+        print(f"Saving cleaned data to {cache_file}...")
+        with step('write_cleaned_cache', rows_in=len(df), outputs=[cache_file]):
+            df.to_parquet(cache_file, index=False)
+    except Exception as e:
+        # Caching is an optimization only; keep going without it
+        print(f"Could not write cache file: {e}")
+        if os.path.exists(cache_file):
+            os.remove(cache_file)
+    
+    return df
+
+def chart_style(function):
+    """
+    Draw a chart with the ggplot style and seaborn font scale of these figures
+
+    matplotlib and seaborn are imported on the first chart rather than with
+    the module, and the style only applies while the chart is drawn, so
+    importing this module for cleaning or counting changes no global state.
+    """
+    @functools.wraps(function)
+    def styled(*args, **kwargs):
+        import matplotlib.pyplot as plt
+        import seaborn as sns
+
+        with plt.rc_context():
+            plt.style.use('ggplot')
+            sns.set(font_scale=1.2)
+            return function(*args, **kwargs)
+    return styled
+
+
+def drop_empty(table):
+    """
+    Drop all-zero rows and columns, matching what crosstab/pivot return for row-level data
+    """
+    return table.loc[table.sum(axis=1) > 0, table.sum(axis=0) > 0]
+
+
+@chart_style
+def analyze_ev_data_basic(cube):
     """
     Generate basic descriptive statistics and visualizations for the cleaned EV data
     
+    Parameters:
+    cube (CountCube): Registration counts built from the cleaned data
     """
+    import matplotlib.pyplot as plt
+
     print("Analyzing EV registration data (basic visualizations)...")
     
     # Create output directory for graphs if it doesn't exist
@@ -92,9 +366,8 @@ def analyze_ev_data_basic(df):
     
     # Count record_type by Zip for 2024 only
     print("Analyzing record types by ZIP code for 2024...")
-    # Filter data for 2024 registrations only
-    df_2024 = df[df['reg_year'] == 2024]
-    record_by_zip_2024 = df_2024.groupby('Zip')['record_type'].count().sort_values(ascending=False).head(20)
+    # Slice the cube to 2024 registrations only
+    record_by_zip_2024 = cube.select(reg_year=2024).table('Zip').sort_values(ascending=False).head(20)
 
     plt.figure(figsize=(12, 8))
     ax = record_by_zip_2024.plot(kind='bar')
@@ -112,19 +385,17 @@ def analyze_ev_data_basic(df):
                 fontsize=10)              
 
     plt.tight_layout()
-    plt.savefig('graphs/record_by_zip_2024.png')
+    savefig('graphs/record_by_zip_2024.png')
     plt.close()
     
     # Count record_type by Zip and reg_year (starting from 2020)
     print("Analyzing record types by ZIP code and year from 2020...")
     # Get top 5 ZIP codes by count
-    top_zips = df['Zip'].value_counts().head(5).index
-    
-    # Filter for top 5 ZIPs and years from 2020
-    top_zip_df = df[(df['Zip'].isin(top_zips)) & (df['reg_year'] >= 2020)]
+    top_zips = cube.table('Zip').sort_values(ascending=False).head(5).index
     
-    # Group by Zip and reg_year to count records
-    zip_year_counts = pd.crosstab(top_zip_df['reg_year'], top_zip_df['Zip'])
+    # Slice for top 5 ZIPs and years from 2020, counting records by reg_year and Zip
+    top_zip_cube = cube.select(Zip=sorted(top_zips)).where('reg_year', lambda years: years >= 2020)
+    zip_year_counts = drop_empty(top_zip_cube.table('reg_year', 'Zip'))
     
     # Plot with count labels
     plt.figure(figsize=(14, 10))
@@ -158,39 +429,35 @@ def analyze_ev_data_basic(df):
     plt.grid(True, alpha=0.3)
     plt.xticks(years)
     plt.tight_layout()
-    plt.savefig('graphs/reg_by_zip_and_year.png')
+    savefig('graphs/reg_by_zip_and_year.png')
     plt.close()
     
     print("Basic analysis complete! Graphs saved to 'graphs' directory.")
 
 
-def create_heatmap(df):
+@chart_style
+def create_heatmap(cube):
     """
     Create a heatmap showing registrations by type over years
     
     Parameters:
-    df (DataFrame): Cleaned DataFrame
+    cube (CountCube): Registration counts built from the cleaned data
     
     Returns:
     None (generates heatmap)
     """
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
     print("Creating registration type heatmap by year...")
     
     # Create output directory for graphs if it doesn't exist
     if not os.path.exists("graphs"):
         os.makedirs("graphs")
     
-    # Create a pivot table for the heatmap data
+    # Sum the cube down to the heatmap data
     # Using reg_year as rows and reg_class as columns
-    # Fill NA values with 0
-    heatmap_data = pd.pivot_table(
-        df,
-        values='record_type',
-        index='reg_year',
-        columns='reg_class',
-        aggfunc='count',
-        fill_value=0
-    )
+    heatmap_data = drop_empty(cube.table('reg_year', 'reg_class'))
     
     # If there are too many registration classes, focus on the top ones
     if heatmap_data.shape[1] > 10:
@@ -218,7 +485,7 @@ def create_heatmap(df):
     plt.xlabel('Registration Class', fontsize=14)
     plt.ylabel('Registration Year', fontsize=14)
     plt.tight_layout()
-    plt.savefig('graphs/reg_type_year_heatmap.png')
+    savefig('graphs/reg_type_year_heatmap.png')
     plt.close()
     
     # Create another heatmap showing percentage distribution by year
@@ -242,17 +509,23 @@ def create_heatmap(df):
     plt.xlabel('Registration Class', fontsize=14)
     plt.ylabel('Registration Year', fontsize=14)
     plt.tight_layout()
-    plt.savefig('graphs/reg_type_year_pct_heatmap.png')
+    savefig('graphs/reg_type_year_pct_heatmap.png')
     plt.close()
     
     print("Heatmap analysis complete! Graphs saved to 'graphs' directory.")
 
 
-def create_zip_heatmap(df):
+@chart_style
+def create_zip_heatmap(cube):
     """
     Create a heatmap showing EV registrations by ZIP code and year
     
+    Parameters:
+    cube (CountCube): Registration counts built from the cleaned data
     """
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
     print("Creating ZIP code by year heatmap...")
     
     try:
@@ -260,23 +533,11 @@ def create_zip_heatmap(df):
         if not os.path.exists("graphs"):
             os.makedirs("graphs")
         
-        # Create a simplified data frame for the heat map
-        # Use reg_year for rows
-        if 'reg_year' not in df.columns:
-            print("No reg_year column found in the data")
-            return
-        
-        # Create a ZIP code to registration count aggregation
-        zip_counts = df.groupby(['Zip', 'reg_year']).size().reset_index(name='count')
-        
         # Get top 20 ZIP codes by total count
-        top_zips = zip_counts.groupby('Zip')['count'].sum().nlargest(20).index
-        
-        # Filter for top ZIP codes
-        zip_year_heatmap = zip_counts[zip_counts['Zip'].isin(top_zips)]
+        top_zips = cube.table('Zip').nlargest(20).index
         
-        # Create pivot table
-        pivot_data = zip_year_heatmap.pivot(index='Zip', columns='reg_year', values='count').fillna(0)
+        # Slice the cube for top ZIP codes, with Zip as rows and reg_year as columns
+        pivot_data = drop_empty(cube.select(Zip=sorted(top_zips)).table('Zip', 'reg_year'))
         
         # Create the heat map
         plt.figure(figsize=(14, 10))
@@ -289,7 +550,7 @@ def create_zip_heatmap(df):
         plt.xlabel('Year', fontsize=14)
         plt.ylabel('ZIP Code', fontsize=14)
         plt.tight_layout()
-        plt.savefig('graphs/zip_year_heatmap.png')
+        savefig('graphs/zip_year_heatmap.png')
         plt.close()
         
         # Create a normalized version showing percentage distribution within each ZIP code
@@ -304,7 +565,7 @@ def create_zip_heatmap(df):
         plt.xlabel('Year', fontsize=14)
         plt.ylabel('ZIP Code', fontsize=14)
         plt.tight_layout()
-        plt.savefig('graphs/zip_year_pct_heatmap.png')
+        savefig('graphs/zip_year_pct_heatmap.png')
         plt.close()
         
         print("ZIP code heat maps created successfully!")
@@ -316,23 +577,184 @@ def create_zip_heatmap(df):
         print("Please ensure required libraries are installed")
 
 
-def main():
+@chart_style
+def create_ev_share_heatmap(cube):
     """
-    Main function to run the data cleaning and analysis
+    Create a heatmap of EV share of registrations by ZIP code and year
+    
+    Fuel-type counts for every ZIP code and year come from one pass over the
+    cube; the derived table is also saved to data/ev_penetration_by_zip_year.csv.
+    
+    Parameters:
+    cube (CountCube): Registration counts built from the cleaned data
+    
+    Returns:
+    DataFrame: Per-fuel counts, EV share and EV growth per ZIP code and year
+    """
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    print("Creating EV share heatmap by ZIP code and year...")
+    
+    # Create output directories if they don't exist
+    os.makedirs("graphs", exist_ok=True)
+    os.makedirs("data", exist_ok=True)
+    
+    penetration = ev_penetration(cube)
+    penetration.to_csv('data/ev_penetration_by_zip_year.csv')
+    
+    # Top 20 ZIP codes by total EV registrations
+    top_zips = penetration.groupby(level='Zip')['ev'].sum().nlargest(20).index
+    share_data = penetration.loc[penetration.index.get_level_values('Zip').isin(top_zips), 'ev_share']
+    share_data = share_data.unstack('reg_year') * 100
+    
+    plt.figure(figsize=(14, 10))
+    sns.heatmap(share_data, cmap='YlGnBu', linewidths=0.5,
+                annot=True, fmt='.1f', cbar_kws={'label': 'EV Share of Registrations (%)'})
+    
+    plt.title('EV Share of Registrations by ZIP Code and Year (%)', fontsize=16)
+    plt.xlabel('Year', fontsize=14)
+    plt.ylabel('ZIP Code', fontsize=14)
+    plt.tight_layout()
+    savefig('graphs/ev_share_zip_year_heatmap.png')
+    plt.close()
+    
+    print("EV share heat map created successfully!")
+    return penetration
+
+
+def month_number(dates):
+    """
+    Months since year 0 for a datetime Series (January 2024 -> 2024 * 12)
     """
-    # Clean the data and get cleaned DataFrame
-    cleaned_df = clean_ev_data()
+    return (dates.dt.year * 12 + dates.dt.month - 1).to_numpy()
+
+
+def active_fleet_by_month(df, start=None, end=None):
+    """
+    Count vehicles with an active registration per ZIP code and month
     
-    # Run the basic analysis for ZIP code visualizations
-    analyze_ev_data_basic(cleaned_df)
+    Each registration is treated as the month interval [reg_date, exp_date).
+    It adds +1 in its start month and -1 in its expiry month; the deltas are
+    counted into a ZIP x month grid with one bincount and the running total
+    along months is the active stock. The cost is one pass over the rows plus
+    the size of the grid, regardless of how many months are reported.
+    
+    Parameters:
+    df (DataFrame): Cleaned registration data with datetime reg_date/exp_date
+    start (str or None): First month, e.g. '2010-01'; defaults to the earliest reg_date
+    end (str or None): Last month; defaults to the latest reg_date
     
-    # Create the registration type heatmap visualizations
-    create_heatmap(cleaned_df)
+    Returns:
+    DataFrame: Active registrations with Zip as rows and monthly periods as columns
+    """
+    valid = (df['Zip'].notna() & df['reg_date'].notna() & df['exp_date'].notna()).to_numpy()
+    reg_month = month_number(df['reg_date'])[valid].astype('int64')
+    exp_month = month_number(df['exp_date'])[valid].astype('int64')
+    zip_codes, zip_labels = pd.factorize(df['Zip'][valid], sort=True)
+    
+    first = reg_month.min() if start is None else pd.Period(start, freq='M').ordinal + 1970 * 12
+    last = reg_month.max() if end is None else pd.Period(end, freq='M').ordinal + 1970 * 12
+    n_months = int(last - first + 1)
+    
+    # Clip events to the reporting window; an interval entirely before it adds
+    # and removes in the same cell, so it cancels out
+    starts = np.clip(reg_month, first, last + 1) - first
+    ends = np.clip(np.maximum(exp_month, reg_month), first, last + 1) - first
+    
+    # One extra column catches events after the last month
+    width = n_months + 1
+    size = len(zip_labels) * width
+    deltas = (np.bincount(zip_codes * width + starts, minlength=size)
+              - np.bincount(zip_codes * width + ends, minlength=size))
+    stock = deltas.reshape(len(zip_labels), width)[:, :n_months].cumsum(axis=1)
+    
+    months = pd.period_range(pd.Period(ordinal=int(first) - 1970 * 12, freq='M'), periods=n_months, freq='M')
+    return pd.DataFrame(stock, index=pd.Index(zip_labels, name='Zip'), columns=months)
+
+
+@chart_style
+def plot_active_fleet(stock, top_n=5):
+    """
+    Plot the statewide active fleet and the top ZIP codes by current active count
+    
+    Parameters:
+    stock (DataFrame): Output of active_fleet_by_month()
+    top_n (int): Number of ZIP codes to draw individually
+    """
+    import matplotlib.pyplot as plt
+
+    print("Creating active fleet time series...")
     
-    # Create the ZIP by year heat map (renamed from create_county_map)
-    create_zip_heatmap(cleaned_df)
+    # Create output directory for graphs if it doesn't exist
+    if not os.path.exists("graphs"):
+        os.makedirs("graphs")
+    
+    months = stock.columns.to_timestamp()
+    top_zips = stock.iloc[:, -1].nlargest(top_n).index
+    
+    fig, (ax_total, ax_zip) = plt.subplots(2, 1, figsize=(14, 12), sharex=True)
+    
+    ax_total.plot(months, stock.sum(axis=0).values, linewidth=2)
+    ax_total.set_title('Active Registrations in New York by Month', fontsize=16)
+    ax_total.set_ylabel('Active Registrations', fontsize=14)
+    
+    for zip_code in top_zips:
+        ax_zip.plot(months, stock.loc[zip_code].values, linewidth=2, label=f'ZIP {zip_code}')
+    ax_zip.set_title(f'Active Registrations for Top {top_n} ZIP Codes', fontsize=16)
+    ax_zip.set_xlabel('Month', fontsize=14)
+    ax_zip.set_ylabel('Active Registrations', fontsize=14)
+    ax_zip.legend(title='ZIP Code', fontsize=12, title_fontsize=14)
+    
+    plt.tight_layout()
+    savefig('graphs/active_fleet_by_month.png')
+    plt.close()
+    
+    print("Active fleet time series created successfully!")
+
+
+def main(workers=FIGURE_WORKERS):
+    """
+    Main function to run the data cleaning and analysis
+    
+    Parameters:
+    workers (int): Processes rendering the charts in parallel; 1 renders them one after another
+    """
+    # Clean the data (or load it from the cache) and get cleaned DataFrame
+    cleaned_df = load_cleaned_ev_data()
+    
+    # Count all registrations into one cube in a single pass; charts slice it
+    print("Building registration count cube...")
+    with step('count_cube', rows_in=len(cleaned_df)):
+        cube = CountCube.from_frame(cleaned_df)
+    print(f"Count cube shape: {cube.counts.shape}")
+    
+    # Count active registrations per ZIP code and month from reg_date/exp_date intervals
+    with step('active_fleet', rows_in=len(cleaned_df)) as record:
+        stock = active_fleet_by_month(cleaned_df)
+        record['rows_out'] = len(stock)
+    
+    # Render the charts, in parallel when workers > 1; the cube and the active
+    # fleet are written once and memory-mapped by every job
+    shared_cube = share_input(cube, 'reg_cube')
+    run_figure_jobs([
+        # Basic analysis for ZIP code visualizations
+        figure_job('ZIP code charts', analyze_ev_data_basic, shared_cube),
+        # Registration type heatmap visualizations
+        figure_job('registration type heatmaps', create_heatmap, shared_cube),
+        # ZIP by year heat map (renamed from create_county_map)
+        figure_job('ZIP by year heatmaps', create_zip_heatmap, shared_cube),
+        # Segment by fuel type and plot EV share per ZIP code and year
+        figure_job('EV share heatmap', create_ev_share_heatmap, shared_cube),
+        figure_job('active fleet', plot_active_fleet, share_input(stock, 'active_fleet'))
+    ], workers=workers)
     
     print("Process completed successfully!")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Clean and analyze NY vehicle registrations")
+    parser.add_argument('--workers', type=int, default=FIGURE_WORKERS,
+                        help="Processes rendering charts in parallel (1 = serial)")
+    add_arguments(parser)
+    args = parser.parse_args()
+    run_instrumented(main, args, workers=args.workers)
\ No newline at end of file
@@ -0,0 +1,393 @@
+# Author: Jingni Zhang
+# Date Created: 05.27.2025
+
+import argparse
+import asyncio
+import functools
+import json
+import os
+import time
+from urllib.parse import parse_qsl, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from EV_aggregate import CountCube
+from EV_cache import CACHE_DIR
+from EV_charger import summary_statistics
+from EV_gap import CHARGER_PORT_COLUMNS, charger_zip_year_counts
+from EV_stations import STATION_DIR, STORE_FILE, load_stations
+
+# Registration cube written by the reg_cube stage of EV_pipeline.py
+# (cache/reg_cube.parquet from EV_incremental.py has the same layout)
+CUBE_FILE = os.path.join(CACHE_DIR, 'pipeline', 'reg_cube.parquet')
+
+HOST = '127.0.0.1'
+PORT = 8765
+
+# Responses kept in the LRU cache, and seconds between checks for refreshed aggregates
+RESPONSE_CACHE_SIZE = 4096
+RELOAD_INTERVAL = 5
+
+# Query parameter -> registration cube dimension
+REG_DIMENSIONS = {'zip': 'Zip', 'year': 'reg_year', 'reg_class': 'reg_class', 'fuel_type': 'fuel_type'}
+INTEGER_DIMENSIONS = ['Zip', 'reg_year']
+
+# Loaded tables, replaced as a whole on reload; 'version' is part of every cache key
+TABLES = {'version': 0, 'cube': None, 'chargers': None, 'mtimes': {}, 'loaded_at': None}
+
+
+def source_mtimes(cube_file=CUBE_FILE, station_dir=STATION_DIR):
+    """
+    Modification time of each aggregate file (None while it does not exist)
+    """
+    paths = {'cube': cube_file, 'chargers': os.path.join(station_dir, STORE_FILE)}
+    return {name: os.path.getmtime(path) if os.path.exists(path) else None for name, path in paths.items()}
+
+
+def load_charger_tables(station_dir=STATION_DIR):
+    """
+    Charger tables from the station store: ZIP x year counts, charger counts per ZIP and the summary
+
+    Stations with no Open Date stay in the ZIP x year table under a missing
+    year, so unfiltered and ZIP-only counts match the EV_charger.py summary
+    and ZIP chart; a year filter leaves them out.
+    """
+    elec_df = load_stations(['ZIP', 'Open Date', *CHARGER_PORT_COLUMNS], station_dir)
+    elec_df['Year'] = elec_df['Open Date'].dt.year
+    tables = {
+        'zip_year': charger_zip_year_counts(elec_df, keep_missing=True),
+        'zip_counts': elec_df['ZIP'].value_counts(),
+        'summary': summary_statistics(elec_df).iloc[0].to_dict()
+    }
+
+    total = tables['zip_year']['chargers'].sum()
+    if total != tables['summary']['Total Electric Chargers']:
+        raise ValueError(f"Charger table counts {total} chargers, the summary "
+                         f"{tables['summary']['Total Electric Chargers']}")
+    return tables
+
+
+def load_tables(cube_file=CUBE_FILE, station_dir=STATION_DIR):
+    """
+    Read every aggregate into memory; a table whose file is missing is None
+
+    Returns:
+    dict: New TABLES contents (without the version)
+    """
+    mtimes = source_mtimes(cube_file, station_dir)
+    cube = None
+    if mtimes['cube'] is not None:
+        cube = CountCube.from_frame(pd.read_parquet(cube_file), weights='count')
+    chargers = None if mtimes['chargers'] is None else load_charger_tables(station_dir)
+    return {'cube': cube, 'chargers': chargers, 'mtimes': mtimes, 'loaded_at': pd.Timestamp.now().isoformat()}
+
+
+def install_tables(tables):
+    """
+    Make freshly loaded tables current, dropping every cached response
+    """
+    TABLES.update(tables, version=TABLES['version'] + 1)
+    cached_response.cache_clear()
+    print(f"Loaded aggregates (version {TABLES['version']}): "
+          f"registrations {'ready' if tables['cube'] is not None else 'missing'}, "
+          f"chargers {'ready' if tables['chargers'] is not None else 'missing'}")
+
+
+class QueryError(Exception):
+    """
+    Bad request or missing table, answered with the given HTTP status
+    """
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def require(name):
+    if TABLES[name] is None:
+        raise QueryError(503, f"{name} aggregates are not available yet")
+    return TABLES[name]
+
+
+def parse_labels(dim, text):
+    """
+    Comma-separated query values as cube labels (integers for Zip and reg_year)
+    """
+    values = text.split(',')
+    if dim not in INTEGER_DIMENSIONS:
+        return values
+    try:
+        return [int(value) for value in values]
+    except ValueError:
+        raise QueryError(400, f"{dim} must be an integer: {text}")
+
+
+def registration_slice(params):
+    """
+    The registration cube restricted by the zip, year, reg_class and fuel_type parameters
+    """
+    cube = require('cube')
+    criteria = {REG_DIMENSIONS[name]: parse_labels(REG_DIMENSIONS[name], value)
+                for name, value in params.items() if name in REG_DIMENSIONS}
+    return cube.select(**criteria) if criteria else cube
+
+
+def top_n(params, default=20):
+    try:
+        return int(params.get('n', default))
+    except ValueError:
+        raise QueryError(400, f"n must be an integer: {params['n']}")
+
+
+def charger_rows(params):
+    """
+    ZIP x year charger counts restricted by the zip and year parameters
+    """
+    table = require('chargers')['zip_year']
+    if 'zip' in params:
+        table = table[table.index.get_level_values('Zip').isin(parse_labels('Zip', params['zip']))]
+    if 'year' in params:
+        table = table[table.index.get_level_values('year').isin(parse_labels('reg_year', params['year']))]
+    return table
+
+
+def registration_count(params):
+    return {'count': registration_slice(params).total()}
+
+
+def registration_top(params):
+    """
+    Largest labels of one dimension, e.g. the 20 ZIP codes create_zip_heatmap() draws
+    """
+    by = params.get('by', 'zip')
+    if by not in REG_DIMENSIONS:
+        raise QueryError(400, f"by must be one of {', '.join(REG_DIMENSIONS)}")
+    top = registration_slice(params).table(REG_DIMENSIONS[by]).nlargest(top_n(params))
+    return [{by: label, 'count': count} for label, count in top.items()]
+
+
+def registration_series(params):
+    """
+    Registrations per year of the selected slice (one row of the ZIP x year heatmap for a single ZIP)
+    """
+    series = registration_slice(params).table('reg_year')
+    return [{'year': year, 'count': count} for year, count in series.items()]
+
+
+def charger_count(params):
+    totals = charger_rows(params).sum()
+    return {column: totals.get(column, 0) for column in ['chargers', 'ports', *CHARGER_PORT_COLUMNS.values()]}
+
+
+def charger_top(params):
+    """
+    ZIP codes with the most chargers, as in the EV_charger.py ZIP bar chart
+    """
+    top = require('chargers')['zip_counts'].head(top_n(params))
+    return [{'zip': zip_code, 'chargers': count} for zip_code, count in top.items()]
+
+
+def charger_series(params):
+    """
+    Chargers and ports opened per year; stations with no Open Date are not in any year
+    """
+    yearly = charger_rows(params).groupby(level='year').sum()
+    return [{'year': year, **row} for year, row in yearly.to_dict('index').items()]
+
+
+def charger_summary(params):
+    """
+    The EV_charger.py summary statistics (data/summary_statistics.csv)
+    """
+    return require('chargers')['summary']
+
+
+def zip_profile(params):
+    """
+    Registrations, chargers opened and cumulative chargers per year for one ZIP code
+
+    The year parameter limits the rows to those years; chargers_total still
+    counts chargers opened in earlier years. reg_class and fuel_type narrow
+    the registrations only, as chargers have neither.
+    """
+    if 'zip' not in params:
+        raise QueryError(400, "zip is required")
+    registrations = registration_slice(params).table('reg_year')
+    chargers = charger_rows({'zip': params['zip']}).groupby(level='year')['chargers'].sum()
+
+    years = registrations.index.union(chargers.index)
+    if 'year' in params:
+        years = years.union(parse_labels('reg_year', params['year']))
+    chargers = chargers.reindex(years, fill_value=0)
+    cumulative = chargers.cumsum()
+    if 'year' in params:
+        years = years[years.isin(parse_labels('reg_year', params['year']))]
+    return [{'year': year, 'registrations': registrations.get(year, 0), 'chargers_opened': chargers[year],
+             'chargers_total': cumulative[year]} for year in years]
+
+
+def service_status(params):
+    info = cached_response.cache_info()
+    return {
+        'version': TABLES['version'],
+        'loaded_at': TABLES['loaded_at'],
+        'sources': TABLES['mtimes'],
+        'registrations': TABLES['cube'] is not None,
+        'chargers': TABLES['chargers'] is not None,
+        'cache': {'hits': info.hits, 'misses': info.misses, 'size': info.currsize, 'maxsize': info.maxsize}
+    }
+
+
+ROUTES = {
+    '/registrations/count': registration_count,
+    '/registrations/top': registration_top,
+    '/registrations/series': registration_series,
+    '/chargers/count': charger_count,
+    '/chargers/top': charger_top,
+    '/chargers/series': charger_series,
+    '/chargers/summary': charger_summary,
+    '/zip': zip_profile
+}
+
+
+def json_value(value):
+    """
+    JSON encoding for numpy and pandas scalars
+    """
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.floating):
+        return None if np.isnan(value) else float(value)
+    if isinstance(value, pd.Timestamp):
+        # Dates as in the CSV outputs, e.g. 2010-01-01
+        return value.date().isoformat() if value == value.normalize() else value.isoformat()
+    if value is pd.NA or value is pd.NaT:
+        return None
+    return str(value)
+
+
+@functools.lru_cache(maxsize=RESPONSE_CACHE_SIZE)
+def cached_response(version, path, query):
+    """
+    Status and JSON body for a query; the tables' version is part of the key,
+    and the cache is cleared on reload
+    """
+    if path not in ROUTES:
+        return 404, json.dumps({'error': f"unknown path {path}", 'paths': sorted(ROUTES) + ['/status']}).encode()
+    try:
+        result = ROUTES[path](dict(query))
+    except QueryError as e:
+        return e.status, json.dumps({'error': str(e)}).encode()
+    return 200, json.dumps(result, default=json_value).encode()
+
+
+def respond(method, target):
+    """
+    Answer one request line
+
+    Returns:
+    tuple: (HTTP status, JSON body)
+    """
+    if method != 'GET':
+        return 405, json.dumps({'error': "only GET is supported"}).encode()
+    url = urlsplit(target)
+    if url.path == '/status':
+        return 200, json.dumps(service_status({}), default=json_value).encode()
+    query = tuple(sorted(parse_qsl(url.query)))
+    return cached_response(TABLES['version'], url.path.rstrip('/') or '/', query)
+
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 503: 'Service Unavailable'}
+
+
+async def handle_connection(reader, writer):
+    """
+    Serve HTTP/1.1 requests on one connection until the client closes it
+    """
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            headers = {}
+            while (line := await reader.readline()) not in (b'\r\n', b'\n', b''):
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip().lower()
+
+            try:
+                method, target, protocol = request_line.decode('latin-1').split()
+            except ValueError:
+                break
+            start = time.perf_counter()
+            status, body = respond(method, target)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+
+            # Request bodies are not read, so only GET requests keep the connection open
+            keep_alive = method == 'GET' and protocol == 'HTTP/1.1' and headers.get('connection') != 'close'
+            writer.write(f"{protocol} {status} {REASONS[status]}\r\n"
+                         f"Content-Type: application/json\r\n"
+                         f"Content-Length: {len(body)}\r\n"
+                         f"X-Elapsed-Ms: {elapsed_ms:.3f}\r\n"
+                         f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + body)
+            await writer.drain()
+            if not keep_alive:
+                break
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def watch_sources(cube_file, station_dir, interval=RELOAD_INTERVAL):
+    """
+    Reload the tables whenever an aggregate file changes
+
+    Loading runs in a thread so queries keep being answered from the old
+    tables meanwhile. A file caught mid-write fails to load and is retried
+    on the next check.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        if source_mtimes(cube_file, station_dir) == TABLES['mtimes']:
+            continue
+        try:
+            tables = await asyncio.to_thread(load_tables, cube_file, station_dir)
+        except Exception as e:
+            print(f"Reload failed, still serving version {TABLES['version']}: {e}")
+            continue
+        install_tables(tables)
+
+
+async def serve(host=HOST, port=PORT, cube_file=CUBE_FILE, station_dir=STATION_DIR, interval=RELOAD_INTERVAL):
+    """
+    Load the aggregates once and answer queries until interrupted
+    """
+    install_tables(load_tables(cube_file, station_dir))
+    server = await asyncio.start_server(handle_connection, host, port)
+    print(f"Serving on http://{host}:{port} ({', '.join(sorted(ROUTES) + ['/status'])})")
+    async with server:
+        await asyncio.gather(server.serve_forever(), watch_sources(cube_file, station_dir, interval))
+
+
+def main():
+    """
+    Command-line entry point for the local query service
+    """
+    parser = argparse.ArgumentParser(description="Query registration and charger aggregates over HTTP")
+    parser.add_argument('--host', default=HOST, help="Address to listen on")
+    parser.add_argument('--port', type=int, default=PORT, help="Port to listen on")
+    parser.add_argument('--cube', default=CUBE_FILE, help="Registration cube (long-form Parquet with a count column)")
+    parser.add_argument('--station-dir', default=STATION_DIR, help="Station store written by EV_charger.py")
+    parser.add_argument('--reload-interval', type=float, default=RELOAD_INTERVAL,
+                        help="Seconds between checks for refreshed aggregates")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args.host, args.port, args.cube, args.station_dir, args.reload_interval))
+    except KeyboardInterrupt:
+        print("Stopped")
+
+
+if __name__ == "__main__":
+    main()
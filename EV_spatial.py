@@ -0,0 +1,261 @@
+# Author: Jingni Zhang
+# Date Created: 04.26.2025
+
+import os
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+from matplotlib import colormaps
+from matplotlib.cm import ScalarMappable
+from matplotlib.colors import LogNorm, Normalize, to_rgba
+from matplotlib.image import AxesImage
+from scipy.ndimage import maximum_filter1d
+
+from EV_boundaries import BOUNDARY_CRS, BOUNDARY_FILE, build_boundary_cache, load_boundaries
+from EV_cache import CACHE_DIR
+from EV_profile import step
+
+# Columns identifying a charger and its location in the AFDC data
+CHARGER_ID = 'ID'
+AREA_ID = 'GEOID'
+PORT_COLUMNS = {
+    'EV Level1 EVSE Num': 'level1_ports',
+    'EV Level2 EVSE Num': 'level2_ports',
+    'EV DC Fast Count': 'dc_fast_ports'
+}
+
+
+def chargers_to_points(df, crs=BOUNDARY_CRS):
+    """
+    Build a projected GeoDataFrame of chargers with the vectorized point constructor
+    """
+    with step('to_crs', rows_in=len(df)):
+        geometry = gpd.points_from_xy(df['Longitude'], df['Latitude'], crs="EPSG:4326")
+        return gpd.GeoDataFrame(df, geometry=geometry).to_crs(epsg=crs)
+
+
+def assign_to_areas(points, areas):
+    """
+    Bulk point-in-polygon assignment through the areas' STR-tree index
+
+    Parameters:
+    points (GeoDataFrame): Charger points, same CRS as areas
+    areas (GeoDataFrame): County subdivision polygons
+
+    Returns:
+    Series: AREA_ID for each point (missing if outside every polygon); a
+        point on a shared edge goes to the first polygon found
+    """
+    point_positions, area_positions = areas.sindex.query(points.geometry.values, predicate='intersects')
+    first_match = pd.Series(area_positions, index=point_positions).groupby(level=0).first()
+
+    assigned = pd.Series(pd.NA, index=points.index, dtype=object, name=AREA_ID)
+    assigned.iloc[first_match.index] = areas[AREA_ID].to_numpy()[first_match.to_numpy()]
+    return assigned
+
+
+def charger_areas(gdf_chargers, cache_dir=CACHE_DIR, boundary_file=BOUNDARY_FILE):
+    """
+    Area of every charger, reusing assignments cached by charger ID
+
+    Only chargers that are new or whose coordinates changed since the last
+    run are looked up in the spatial index. The cache is tied to the
+    boundary version, so new TIGER files start a fresh cache.
+
+    Parameters:
+    gdf_chargers (GeoDataFrame): Projected chargers with ID, Latitude and Longitude
+    cache_dir (str): Folder for the boundary and assignment caches
+    boundary_file (str): TIGER/Line county subdivision shapefile of the chargers' state
+
+    Returns:
+    Series: AREA_ID indexed like gdf_chargers
+    """
+    key = build_boundary_cache(boundary_file, cache_dir)['key']
+    cache_file = os.path.join(cache_dir, 'boundaries', f"charger_areas_{key}.parquet")
+
+    lookup = gdf_chargers[[CHARGER_ID, 'Latitude', 'Longitude']].copy()
+    if os.path.exists(cache_file):
+        cached = pd.read_parquet(cache_file)
+        lookup = lookup.merge(cached, on=[CHARGER_ID, 'Latitude', 'Longitude'], how='left')
+        lookup.index = gdf_chargers.index
+    else:
+        lookup[AREA_ID] = pd.Series(pd.NA, index=lookup.index, dtype=object)
+
+    missing = lookup[AREA_ID].isna().to_numpy()
+    if missing.any():
+        print(f"Assigning {int(missing.sum())} chargers to county subdivisions...")
+        areas = load_boundaries(tolerance=0, file_path=boundary_file, cache_dir=cache_dir)
+        lookup.loc[missing, AREA_ID] = assign_to_areas(gdf_chargers[missing], areas).to_numpy()
+        lookup[[CHARGER_ID, 'Latitude', 'Longitude', AREA_ID]].dropna(subset=[AREA_ID]).to_parquet(cache_file, index=False)
+
+    return lookup[AREA_ID]
+
+
+def area_summary(gdf_chargers, areas, area_ids):
+    """
+    Charger counts, densities and port totals per county subdivision
+
+    Parameters:
+    gdf_chargers (GeoDataFrame): Chargers with the AFDC port columns
+    areas (GeoDataFrame): County subdivision polygons with ALAND (m^2)
+    area_ids (Series): AREA_ID per charger from charger_areas()
+
+    Returns:
+    GeoDataFrame: areas with 'chargers', 'chargers_per_km2' and port totals
+    """
+    ports = gdf_chargers[list(PORT_COLUMNS)].fillna(0).rename(columns=PORT_COLUMNS)
+    ports['chargers'] = 1
+    totals = ports.groupby(area_ids.to_numpy()).sum()
+
+    summary = areas[[AREA_ID, 'NAME', 'ALAND', 'geometry']].merge(totals, left_on=AREA_ID, right_index=True, how='left')
+    count_columns = ['chargers'] + list(PORT_COLUMNS.values())
+    summary[count_columns] = summary[count_columns].fillna(0).astype('int64')
+
+    land_km2 = summary['ALAND'] / 1e6
+    summary['land_km2'] = land_km2
+    summary['chargers_per_km2'] = summary['chargers'] / land_km2.where(land_km2 > 0)
+    summary['ports_per_km2'] = (summary['level2_ports'] + summary['dc_fast_ports']) / land_km2.where(land_km2 > 0)
+    return summary
+
+
+def plot_choropleth(ax, summary, column='chargers_per_km2', label='Chargers per km²'):
+    """
+    Shade areas by a density column on a log scale; areas with none stay gray
+    """
+    summary.plot(ax=ax, color='lightgray', edgecolor='white', linewidth=0.5)
+    covered = summary[summary[column] > 0]
+    if len(covered) > 0:
+        covered.plot(
+            ax=ax,
+            column=column,
+            cmap='viridis',
+            norm=LogNorm(vmin=covered[column].min(), vmax=covered[column].max()),
+            edgecolor='white',
+            linewidth=0.5,
+            legend=True,
+            legend_kwds={'label': label, 'orientation': 'horizontal'}
+        )
+
+
+def dilate_disk(image, radius):
+    """
+    Maximum of an integer image over a disk of the given radius in pixels
+
+    Built from one 1-D running maximum per disk row, so the cost does not
+    grow with the disk area. Pixels outside the image count as -1.
+    """
+    rows = image.shape[0]
+    result = np.full_like(image, -1)
+    for dy in range(int(np.floor(radius)) + 1):
+        half = int(np.floor(np.sqrt(radius ** 2 - dy ** 2)))
+        row_max = maximum_filter1d(image, 2 * half + 1, axis=1, mode='constant', cval=-1)
+        np.maximum(result[:rows - dy], row_max[dy:], out=result[:rows - dy])
+        if dy > 0:
+            np.maximum(result[dy:], row_max[:rows - dy], out=result[dy:])
+    return result
+
+
+class PointRaster(AxesImage):
+    """
+    Image of points binned into the output pixels it covers, rebuilt each time it is drawn
+
+    The pixel grid is only known once the figure layout is final (after
+    tight_layout, colorbars and equal-aspect adjustment) and at the dpi the
+    figure is saved with, so the image is computed in draw().
+    """
+
+    def __init__(self, ax, x, y, values, norm, cmap, markersize, edgecolor, linewidth, alpha):
+        super().__init__(ax, interpolation='nearest', origin='lower', zorder=2)
+        self.points = (x, y, values)
+        self.style = (norm, cmap, markersize, edgecolor, linewidth, alpha)
+        self.set_data(np.zeros((1, 1, 4)))
+
+    def draw(self, renderer):
+        xmin, xmax, ymin, ymax = self.get_extent()
+        (left, bottom), (right, top) = self.axes.transData.transform([(xmin, ymin), (xmax, ymax)])
+        columns, rows = max(1, int(round(abs(right - left)))), max(1, int(round(abs(top - bottom))))
+        self.set_data(self.render(columns, rows, renderer.points_to_pixels(1)))
+        super().draw(renderer)
+
+    def render(self, columns, rows, pixels_per_point):
+        """
+        RGBA array of rows x columns pixels over the image extent
+        """
+        x, y, values = self.points
+        norm, cmap, markersize, edgecolor, linewidth, alpha = self.style
+        xmin, xmax, ymin, ymax = self.get_extent()
+        column_index = np.floor((x - xmin) / (xmax - xmin) * columns).astype(np.int64)
+        row_index = np.floor((y - ymin) / (ymax - ymin) * rows).astype(np.int64)
+        inside = (column_index >= 0) & (column_index < columns) & (row_index >= 0) & (row_index < rows)
+
+        # Index of the last point drawn in each pixel, -1 where empty
+        top = np.full(rows * columns, -1, dtype=np.int64)
+        np.maximum.at(top, row_index[inside] * columns + column_index[inside], np.flatnonzero(inside))
+        top = top.reshape(rows, columns)
+
+        # Marker radius in pixels from the marker area in points²
+        radius = np.sqrt(markersize) / 2 * pixels_per_point
+        fill = dilate_disk(top, radius)
+
+        colors = np.zeros((rows, columns, 4))
+        covered = fill >= 0
+        colors[covered] = colormaps[cmap](norm(values[fill[covered]]))
+
+        if edgecolor is not None and linewidth > 0:
+            outer = dilate_disk(top, radius + linewidth * pixels_per_point)
+            edge = (outer >= 0) & (outer != fill)
+            colors[edge] = to_rgba(edgecolor)
+
+        if alpha is not None:
+            colors[..., 3] *= alpha
+        return colors
+
+
+def plot_points_raster(ax, gdf, column='Year', cmap='viridis', markersize=30, edgecolor=None, linewidth=0,
+                       alpha=None, legend=False, legend_kwds=None):
+    """
+    Draw points as one image aggregated in screen space instead of one marker each
+
+    Points are binned into the output pixels the axes' current extent covers
+    when the figure is drawn or saved; each pixel keeps the last point drawn
+    there (as overlapping markers would), is widened to the marker size and,
+    with an edge color, gets a marker outline. The cost grows with the
+    number of pixels, not points, and the PNG does not grow with the point
+    count.
+
+    Parameters:
+    ax (Axes): Axes whose limits are already set (e.g. by the boundaries)
+    gdf (GeoDataFrame): Points in the axes' CRS
+    column (str): Numeric column mapped to colors
+    cmap (str): Colormap
+    markersize (float): Marker area in points² (as in GeoDataFrame.plot)
+    edgecolor (str or None): Marker outline color
+    linewidth (float): Marker outline width in points
+    alpha (float or None): Opacity
+    legend (bool): Add a colorbar like GeoDataFrame.plot(legend=True)
+    legend_kwds (dict or None): Colorbar keyword arguments
+    """
+    (xmin, xmax), (ymin, ymax) = ax.get_xlim(), ax.get_ylim()
+    values = gdf[column].to_numpy(dtype=float, na_value=np.nan)
+    norm = Normalize(vmin=np.nanmin(values), vmax=np.nanmax(values))
+
+    image = PointRaster(ax, gdf.geometry.x.to_numpy(), gdf.geometry.y.to_numpy(), values, norm, cmap,
+                        markersize, edgecolor, linewidth, alpha)
+    image.set_extent((xmin, xmax, ymin, ymax))
+    ax.add_image(image)
+    ax.set_xlim(xmin, xmax)
+    ax.set_ylim(ymin, ymax)
+
+    if legend:
+        ax.get_figure().colorbar(ScalarMappable(norm=norm, cmap=cmap), ax=ax, **(legend_kwds or {}))
+
+
+def plot_points(ax, gdf, style='points', **kwargs):
+    """
+    Draw points as individual markers ('points') or aggregated in screen space ('raster')
+    """
+    if style == 'raster':
+        plot_points_raster(ax, gdf, **kwargs)
+    else:
+        gdf.plot(ax=ax, **kwargs)
@@ -0,0 +1,452 @@
+# Author: Jingni Zhang
+# Date Created: 05.23.2025
+
+import argparse
+import multiprocessing
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from EV_cache import CACHE_DIR, file_fingerprint
+from EV_charger import nyc_bounds, summary_statistics
+from EV_gap import CHARGER_PORT_COLUMNS, charger_zip_year_counts
+from EV_parallel import START_METHOD
+from EV_profile import add_arguments, add_steps, configure, run_instrumented, settings, step, take_steps
+from EV_stations import load_meta, load_stations, refresh_station_store
+
+# USPS code -> (FIPS code, name) for the states and territories in the AFDC feed
+STATES = {
+    'AL': ('01', 'Alabama'), 'AK': ('02', 'Alaska'), 'AZ': ('04', 'Arizona'), 'AR': ('05', 'Arkansas'),
+    'CA': ('06', 'California'), 'CO': ('08', 'Colorado'), 'CT': ('09', 'Connecticut'),
+    'DE': ('10', 'Delaware'), 'DC': ('11', 'District of Columbia'), 'FL': ('12', 'Florida'),
+    'GA': ('13', 'Georgia'), 'HI': ('15', 'Hawaii'), 'ID': ('16', 'Idaho'), 'IL': ('17', 'Illinois'),
+    'IN': ('18', 'Indiana'), 'IA': ('19', 'Iowa'), 'KS': ('20', 'Kansas'), 'KY': ('21', 'Kentucky'),
+    'LA': ('22', 'Louisiana'), 'ME': ('23', 'Maine'), 'MD': ('24', 'Maryland'), 'MA': ('25', 'Massachusetts'),
+    'MI': ('26', 'Michigan'), 'MN': ('27', 'Minnesota'), 'MS': ('28', 'Mississippi'), 'MO': ('29', 'Missouri'),
+    'MT': ('30', 'Montana'), 'NE': ('31', 'Nebraska'), 'NV': ('32', 'Nevada'), 'NH': ('33', 'New Hampshire'),
+    'NJ': ('34', 'New Jersey'), 'NM': ('35', 'New Mexico'), 'NY': ('36', 'New York'),
+    'NC': ('37', 'North Carolina'), 'ND': ('38', 'North Dakota'), 'OH': ('39', 'Ohio'), 'OK': ('40', 'Oklahoma'),
+    'OR': ('41', 'Oregon'), 'PA': ('42', 'Pennsylvania'), 'RI': ('44', 'Rhode Island'),
+    'SC': ('45', 'South Carolina'), 'SD': ('46', 'South Dakota'), 'TN': ('47', 'Tennessee'), 'TX': ('48', 'Texas'),
+    'UT': ('49', 'Utah'), 'VT': ('50', 'Vermont'), 'VA': ('51', 'Virginia'), 'WA': ('53', 'Washington'),
+    'WV': ('54', 'West Virginia'), 'WI': ('55', 'Wisconsin'), 'WY': ('56', 'Wyoming'), 'PR': ('72', 'Puerto Rico')
+}
+
+# Folders searched for the per-state TIGER/Line files, tl_2024_<FIPS>_cousub.shp
+TIGER_DIRS = ['ny_tiger_shapfile', 'tiger_shapefiles']
+
+# Station store of the national AFDC feed, kept apart from the New York store
+# used by EV_charger.py so neither download marks the other's stations removed
+NATIONAL_STORE_DIR = os.path.join(CACHE_DIR, 'stations_national')
+
+# Per-state tables and figures go in one folder per state; the merged tables next to them
+STATE_DATA_DIR = os.path.join('data', 'states')
+STATE_GRAPH_DIR = os.path.join('graphs', 'states')
+NATIONAL_SUMMARY_FILE = 'data/national_summary_by_state.csv'
+NATIONAL_ZIP_YEAR_FILE = 'data/chargers_by_state_zip_year.csv'
+
+# Worker processes, one state at a time each
+STATE_WORKERS = os.cpu_count() or 1
+
+# Area shown by a state's close-up map (title, lon/lat box as in EV_charger.nyc_bounds);
+# states not listed get a box of the same size around their busiest ZIP code
+FOCUS_AREAS = {'NY': ('New York City Area', nyc_bounds)}
+FOCUS_HALF_WIDTH = (nyc_bounds['max_lon'] - nyc_bounds['min_lon']) / 2
+FOCUS_HALF_HEIGHT = (nyc_bounds['max_lat'] - nyc_bounds['min_lat']) / 2
+
+# Share of a map's extent added on each side when prefetching its basemap
+# tiles, on top of squaring it, since map axes pad the extent to fit the figure
+TILE_MARGIN = 0.25
+
+
+def boundary_file(state):
+    """
+    County subdivision shapefile of a state, or None if it has not been downloaded
+    """
+    name = f"tl_2024_{STATES[state][0]}_cousub.shp"
+    return next((os.path.join(folder, name) for folder in TIGER_DIRS
+                 if os.path.exists(os.path.join(folder, name))), None)
+
+
+def utm_crs(longitude):
+    """
+    EPSG code of the NAD83 UTM zone containing a longitude (zone 18N, 26918, for New York)
+    """
+    zone = min(max(int((longitude + 180) // 6) + 1, 1), 23)
+    return 26900 + zone
+
+
+def partition_stations(file_path, store_dir=NATIONAL_STORE_DIR):
+    """
+    Split the electric stations of a download into one Parquet file per state
+
+    The download is upserted into a station store first. Partitions are
+    written once per download (named after its content hash) and reused by
+    later runs.
+
+    Returns:
+    dict: {state: (partition file, stations)} for the states in STATES
+    """
+    refresh_station_store(file_path, store_dir)
+    folder = os.path.join(store_dir, 'states', load_meta(store_dir)['source'][:16])
+
+    if not os.path.isdir(folder):
+        # Partitions of earlier downloads are no longer needed
+        shutil.rmtree(os.path.dirname(folder), ignore_errors=True)
+        with step('partition_states') as record:
+            stations = load_stations(store_dir=store_dir)
+            os.makedirs(folder + '.part')
+            for state, part in stations.groupby('State', observed=True):
+                if state in STATES:
+                    part.to_parquet(os.path.join(folder + '.part', f"{state}.parquet"), index=False)
+            os.replace(folder + '.part', folder)
+            record['rows_in'] = len(stations)
+
+        skipped = sorted(set(stations['State'].dropna()) - set(STATES))
+        if skipped:
+            print(f"Skipping stations outside STATES: {', '.join(skipped)}")
+
+    partitions = {}
+    for name in sorted(os.listdir(folder)):
+        path = os.path.join(folder, name)
+        partitions[os.path.splitext(name)[0]] = (path, len(pd.read_parquet(path, columns=['ID'])))
+    return partitions
+
+
+def focus_area(state, elec_df):
+    """
+    Title and lon/lat box of a state's close-up map
+    """
+    if state in FOCUS_AREAS:
+        return FOCUS_AREAS[state]
+    zip_code = elec_df['ZIP'].value_counts().index[0]
+    busiest = elec_df[elec_df['ZIP'] == zip_code]
+    lon, lat = busiest['Longitude'].median(), busiest['Latitude'].median()
+    bounds = {'min_lon': lon - FOCUS_HALF_WIDTH, 'max_lon': lon + FOCUS_HALF_WIDTH,
+              'min_lat': lat - FOCUS_HALF_HEIGHT, 'max_lat': lat + FOCUS_HALF_HEIGHT}
+    return f"ZIP {zip_code} Area, {STATES[state][1]}", bounds
+
+
+def tile_box(west, south, east, north):
+    """
+    Lon/lat box covering an extent once map axes pad it to any figure shape
+
+    The extent is squared in Web Mercator and widened by TILE_MARGIN on each side.
+    """
+    import mercantile
+
+    left, bottom = mercantile.xy(west, south)
+    right, top = mercantile.xy(east, north)
+    half = (1 + 2 * TILE_MARGIN) * max(right - left, top - bottom) / 2
+    center_x, center_y = (left + right) / 2, (bottom + top) / 2
+    west, south = mercantile.lnglat(center_x - half, center_y - half)
+    east, north = mercantile.lnglat(center_x + half, center_y + half)
+    return west, max(south, -85.0), east, min(north, 85.0)
+
+
+def tile_regions(state, elec_df, shapefile):
+    """
+    Lon/lat boxes and zoom levels of a state's maps, as EV_tiles.PREFETCH_REGIONS entries
+
+    The statewide maps span the state's county subdivisions; the close-up map
+    spans every subdivision touching its focus box, which can reach well past it.
+    """
+    import geopandas as gpd
+    from EV_tiles import zoom_levels
+
+    state_extent = gpd.read_file(shapefile, columns=['GEOID']).to_crs(epsg=4326).total_bounds
+    area_name, bounds = focus_area(state, elec_df)
+    focus = (bounds['min_lon'], bounds['min_lat'], bounds['max_lon'], bounds['max_lat'])
+    west, south, east, north = gpd.read_file(shapefile, bbox=focus, columns=['GEOID']).to_crs(epsg=4326).total_bounds
+    focus_extent = (min(west, focus[0]), min(south, focus[1]), max(east, focus[2]), max(north, focus[3]))
+    return [(STATES[state][1], tile_box(*state_extent), zoom_levels(*state_extent)),
+            (area_name, tile_box(*focus_extent), zoom_levels(*focus_extent))]
+
+
+def prepare_state_maps(states, partitions):
+    """
+    Fill the shared caches the state workers read before they start
+
+    Basemap tiles for every mapped state are added to the tile store (when
+    one is in use), and each state's TIGER file is fingerprinted here so the
+    workers only read cache/manifest.json and never rewrite it concurrently.
+
+    Parameters:
+    states (list): USPS codes about to be processed
+    partitions (dict): {state: (partition file, stations)} from partition_stations()
+    """
+    from EV_tiles import TILE_STORE, prefetch_tiles
+
+    regions = []
+    for state in states:
+        shapefile = boundary_file(state)
+        if shapefile is None:
+            continue
+        file_fingerprint(shapefile)
+        elec_df = pd.read_parquet(partitions[state][0], columns=['ZIP', 'Latitude', 'Longitude'])
+        regions += tile_regions(state, elec_df, shapefile)
+
+    if regions and os.path.exists(TILE_STORE):
+        try:
+            prefetch_tiles(regions)
+        except OSError as e:
+            print(f"Could not prefetch basemap tiles ({e}); maps may have blank basemaps")
+
+
+def state_figures(state, elec_df, shapefile, data_folder, graph_folder):
+    """
+    Draw the EV_charger.py figures for one state, titled and bounded by that state
+
+    The year and ZIP charts need only the chargers; the maps also need the
+    state's TIGER file and the county subdivision summary in data_folder.
+
+    Returns:
+    list: Figure files written
+    """
+    from EV_charger import (map_frame, plot_animation, plot_chargers_by_zip, plot_cumulative_timeline,
+                            plot_density_map, plot_heatmap, plot_installations_by_year, plot_nyc_map,
+                            plot_period_panels)
+    from EV_spatial import chargers_to_points
+
+    os.makedirs(graph_folder, exist_ok=True)
+    figure = lambda name: os.path.join(graph_folder, name)
+    state_name = STATES[state][1]
+
+    yearly_counts = elec_df['Year'].value_counts().sort_index()
+    plot_cumulative_timeline(yearly_counts, output_file=figure('ev_chargers_timeline.png'))
+    plot_installations_by_year(yearly_counts, place=state_name, output_file=figure('ev_chargers_by_year.png'))
+    plot_chargers_by_zip(elec_df['ZIP'].value_counts().head(20), output_file=figure('ev_chargers_by_zip.png'))
+    written = ['ev_chargers_timeline.png', 'ev_chargers_by_year.png', 'ev_chargers_by_zip.png']
+
+    if shapefile is not None:
+        chargers = map_frame(chargers_to_points(elec_df.dropna(subset=['Latitude', 'Longitude'])))
+        area_table = pd.read_csv(os.path.join(data_folder, 'chargers_by_cousub.csv'), dtype={'GEOID': str})
+        area_name, bounds = focus_area(state, elec_df)
+        plot_density_map(chargers, area_table, place=state_name, boundary_file=shapefile,
+                         output_file=figure('ev_chargers_density.png'))
+        plot_heatmap(chargers, place=state_name, boundary_file=shapefile, output_file=figure('ev_chargers_heatmap.png'))
+        plot_nyc_map(chargers, area_table, bounds=bounds, area_name=area_name, boundary_file=shapefile,
+                     output_file=figure('ev_chargers_focus.png'))
+        plot_period_panels(chargers, boundary_file=shapefile, output_file=figure('ev_chargers_by_year_panels.png'))
+        plot_animation(chargers, boundary_file=shapefile, output_file=figure('ev_chargers_by_year.gif'))
+        written += ['ev_chargers_density.png', 'ev_chargers_heatmap.png', 'ev_chargers_focus.png',
+                    'ev_chargers_by_year_panels.png', 'ev_chargers_by_year.gif']
+    return [figure(name) for name in written]
+
+
+def process_state(state, partition_file, out_dir=STATE_DATA_DIR, graph_dir=STATE_GRAPH_DIR, figures=True):
+    """
+    Run the charger analysis for one state's partition
+
+    Always writes the ZIP x year counts; with the state's TIGER file present,
+    also the county subdivision summary and nearest-charger distances
+    (measured in the state's UTM zone). Boundary caches and charger-area
+    assignments are keyed by the TIGER file, so each state's are reused on
+    later runs. With figures, the EV_charger.py charts and maps are drawn
+    for the state as well (maps only with the TIGER file).
+
+    Parameters:
+    state (str): USPS code
+    partition_file (str): Parquet file from partition_stations()
+    out_dir (str): Parent of the per-state output folders
+    graph_dir (str): Parent of the per-state figure folders
+    figures (bool): Draw the state's figures
+
+    Returns:
+    tuple: (summary row dict, ZIP x year counts with a State column)
+    """
+    folder = os.path.join(out_dir, state)
+    os.makedirs(folder, exist_ok=True)
+
+    with step(f"state {state}") as record:
+        elec_df = pd.read_parquet(partition_file)
+        elec_df['Year'] = elec_df['Open Date'].dt.year
+        record['rows_in'] = len(elec_df)
+
+        zip_year = charger_zip_year_counts(elec_df)
+        zip_year.to_csv(os.path.join(folder, 'chargers_by_zip_year.csv'))
+        record['outputs'].append(os.path.join(folder, 'chargers_by_zip_year.csv'))
+
+        summary = summary_statistics(elec_df).iloc[0]
+        ports = elec_df[list(CHARGER_PORT_COLUMNS)].fillna(0).sum().rename(CHARGER_PORT_COLUMNS)
+        row = {
+            'State': state,
+            'Name': STATES[state][1],
+            'chargers': len(elec_df),
+            **ports.astype('int64').to_dict(),
+            'zip_codes': int(summary['Number of Unique ZIP Codes']),
+            'earliest_open': summary['Earliest Open Date'],
+            'latest_open': summary['Latest Open Date'],
+            'most_common_zip': summary['Most Common ZIP'],
+            'chargers_in_most_common_zip': int(summary['Chargers in Most Common ZIP'])
+        }
+
+        shapefile = boundary_file(state)
+        if shapefile is None:
+            print(f"{state}: no TIGER county subdivision file; writing counts only")
+        else:
+            row.update(area_tables(elec_df, shapefile, folder))
+            record['outputs'] += [os.path.join(folder, name) for name in
+                                  ['chargers_by_cousub.csv', 'charger_access_by_cousub_year.csv']]
+
+        if figures:
+            record['outputs'] += state_figures(state, elec_df, shapefile, folder, os.path.join(graph_dir, state))
+
+    zip_year = zip_year.reset_index()
+    zip_year.insert(0, 'State', state)
+    return row, zip_year
+
+
+def area_tables(elec_df, shapefile, folder):
+    """
+    County subdivision summary and accessibility of one state, written to its folder
+
+    Returns:
+    dict: Area columns of the state's summary row
+    """
+    from EV_access import charger_accessibility
+    from EV_boundaries import load_boundaries
+    from EV_spatial import area_summary, charger_areas, chargers_to_points
+
+    gdf_chargers = chargers_to_points(elec_df.dropna(subset=['Latitude', 'Longitude']))
+    areas = load_boundaries(tolerance=0, file_path=shapefile)
+    area_table = area_summary(gdf_chargers, areas, charger_areas(gdf_chargers, boundary_file=shapefile))
+    area_table = area_table.drop(columns='geometry')
+    area_table.to_csv(os.path.join(folder, 'chargers_by_cousub.csv'), index=False)
+
+    # Metric distances in the UTM zone of the state's centre; its lon/lat box selects its ZCTAs
+    west, south, east, north = areas.to_crs(epsg=4326).total_bounds
+    access = charger_accessibility(gdf_chargers, boundary_file=shapefile, crs=utm_crs((west + east) / 2),
+                                   bbox=(west, south, east, north))
+    access['cousub'].to_csv(os.path.join(folder, 'charger_access_by_cousub_year.csv'), index=False)
+    if access['zip'] is not None:
+        access['zip'].to_csv(os.path.join(folder, 'charger_access_by_zip_year.csv'), index=False)
+
+    latest = access['cousub'][(access['cousub']['level'] == 'any')
+                              & (access['cousub']['year'] == access['cousub']['year'].max())]
+    return {
+        'county_subdivisions': len(area_table),
+        'subdivisions_with_chargers': int((area_table['chargers'] > 0).sum()),
+        'land_km2': round(float(area_table['land_km2'].sum()), 1),
+        'median_nearest_km': round(float(latest['nearest_km'].median()), 2)
+    }
+
+
+def run_worker_state(state, partition_file, out_dir, graph_dir, figures, profile_settings):
+    """
+    process_state() in a worker process, returning the steps it recorded to the parent's report
+    """
+    configure(**profile_settings)
+    return process_state(state, partition_file, out_dir, graph_dir, figures) + (take_steps(),)
+
+
+def merge_states(rows, zip_years):
+    """
+    National summary: one row per state plus a US total row
+
+    Returns:
+    tuple: (summary DataFrame, ZIP x year counts of every state)
+    """
+    summary = pd.DataFrame(rows).sort_values('State').reset_index(drop=True)
+    totals = {'State': 'US', 'Name': 'United States',
+              'earliest_open': summary['earliest_open'].min(), 'latest_open': summary['latest_open'].max()}
+    for column in ['chargers', *CHARGER_PORT_COLUMNS.values(), 'zip_codes', 'county_subdivisions',
+                   'subdivisions_with_chargers', 'land_km2']:
+        if column in summary.columns:
+            totals[column] = summary[column].sum()
+    if 'land_km2' in summary.columns:
+        # Density over the states whose boundaries were available
+        mapped = summary['land_km2'].notna()
+        summary['chargers_per_100km2'] = (100 * summary['chargers'] / summary['land_km2']).round(3)
+        totals['chargers_per_100km2'] = round(100 * summary.loc[mapped, 'chargers'].sum()
+                                              / summary.loc[mapped, 'land_km2'].sum(), 3)
+    summary = pd.concat([summary, pd.DataFrame([totals])], ignore_index=True)
+    summary['ports'] = summary[list(CHARGER_PORT_COLUMNS.values())].sum(axis=1)
+
+    # Counts stay integers where states without boundaries leave gaps
+    counts = ['chargers', *CHARGER_PORT_COLUMNS.values(), 'ports', 'zip_codes', 'most_common_zip',
+              'chargers_in_most_common_zip', 'county_subdivisions', 'subdivisions_with_chargers']
+    summary = summary.astype({column: 'Int64' for column in counts if column in summary.columns})
+
+    zip_year = pd.concat(zip_years, ignore_index=True).sort_values(['State', 'Zip', 'year'])
+    return summary, zip_year
+
+
+def run_states(file_path='alt_fuel_stations.csv', states=None, workers=STATE_WORKERS, out_dir=STATE_DATA_DIR,
+               store_dir=NATIONAL_STORE_DIR, graph_dir=STATE_GRAPH_DIR, figures=True):
+    """
+    Run the charger analysis for every state in a national AFDC download
+
+    Each state's partition is processed in its own worker process; states
+    are submitted largest first so the biggest partitions do not finish
+    last on an otherwise idle pool. With figures, the tiles and boundary
+    fingerprints the workers share are prepared here first.
+
+    Parameters:
+    file_path (str): AFDC download covering one or more states
+    states (list or None): USPS codes to run; None runs every state in the download
+    workers (int): Worker processes; 1 runs the states one after another in this process
+    out_dir (str): Parent of the per-state output folders
+    store_dir (str): Station store for this download
+    graph_dir (str): Parent of the per-state figure folders
+    figures (bool): Draw each state's figures in its worker
+
+    Returns:
+    DataFrame: National summary by state
+    """
+    partitions = partition_stations(file_path, store_dir)
+    if states is not None:
+        missing = sorted(set(states) - set(partitions))
+        if missing:
+            print(f"No stations for {', '.join(missing)}")
+        partitions = {state: partitions[state] for state in states if state in partitions}
+    order = sorted(partitions, key=lambda state: partitions[state][1], reverse=True)
+
+    if figures:
+        prepare_state_maps(order, partitions)
+
+    start = time.perf_counter()
+    rows, zip_years = [], []
+    if workers <= 1 or len(order) <= 1:
+        for state in order:
+            row, zip_year = process_state(state, partitions[state][0], out_dir, graph_dir, figures)
+            rows.append(row)
+            zip_years.append(zip_year)
+    else:
+        context = multiprocessing.get_context(START_METHOD)
+        with ProcessPoolExecutor(max_workers=min(workers, len(order)), mp_context=context) as pool:
+            futures = [pool.submit(run_worker_state, state, partitions[state][0], out_dir, graph_dir, figures,
+                                   settings()) for state in order]
+            for future in as_completed(futures):
+                row, zip_year, steps = future.result()
+                add_steps(steps)
+                rows.append(row)
+                zip_years.append(zip_year)
+                print(f"Processed {row['State']} ({row['chargers']} chargers)")
+    seconds = time.perf_counter() - start
+
+    summary, zip_year = merge_states(rows, zip_years)
+    os.makedirs(os.path.dirname(NATIONAL_SUMMARY_FILE), exist_ok=True)
+    summary.to_csv(NATIONAL_SUMMARY_FILE, index=False)
+    zip_year.to_csv(NATIONAL_ZIP_YEAR_FILE, index=False)
+
+    stations = sum(partitions[state][1] for state in order)
+    print(f"{len(order)} states, {stations} chargers in {seconds:.1f} s "
+          f"({stations / max(seconds, 1e-9):.0f} chargers/s, {min(workers, len(order))} workers)")
+    print(f"National summary written to {NATIONAL_SUMMARY_FILE}")
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the charger analysis for each state of a national AFDC download")
+    parser.add_argument('--file', default='alt_fuel_stations.csv', help="AFDC station download")
+    parser.add_argument('--states', nargs='*', help="USPS codes to run (default: every state in the download)")
+    parser.add_argument('--workers', type=int, default=STATE_WORKERS, help="Worker processes (1 = serial)")
+    parser.add_argument('--no-figures', action='store_true', help="Write the tables only")
+    add_arguments(parser)
+    args = parser.parse_args()
+    run_instrumented(run_states, args, file_path=args.file, states=args.states, workers=args.workers,
+                     figures=not args.no_figures)
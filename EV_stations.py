@@ -0,0 +1,330 @@
+# Author: Jingni Zhang
+# Date Created: 05.20.2025
+
+import argparse
+import json
+import os
+
+import pandas as pd
+
+from EV_cache import CACHE_DIR, config_hash, file_fingerprint
+from EV_dates import parse_date_columns, parse_dates
+from EV_profile import step
+from EV_reg import concat_typed_chunks
+
+# AFDC column identifying a station across downloads, and the one that
+# changes whenever the station's record is edited
+STATION_ID = 'ID'
+UPDATED_AT = 'Updated At'
+STATUS = 'Status Code'
+
+# Stations kept in the store
+FUEL_TYPE = 'ELEC'
+
+# The only AFDC columns read (of about 75), with the dtype each is read as
+STATION_COLUMNS = {
+    'ID': 'int64',
+    'Fuel Type Code': str,
+    'Station Name': str,
+    'Street Address': str,
+    'City': str,
+    'State': str,
+    'ZIP': str,
+    'Status Code': str,
+    'Latitude': 'float64',
+    'Longitude': 'float64',
+    'EV Level1 EVSE Num': 'float32',
+    'EV Level2 EVSE Num': 'float32',
+    'EV DC Fast Count': 'float32',
+    'EV Network': str,
+    'EV Connector Types': str,
+    'Access Code': str,
+    'Facility Type': str,
+    'Open Date': str,
+    'Date Last Confirmed': str,
+    'Updated At': str
+}
+
+# Compact dtypes applied to stored stations; dates are parsed with EV_dates
+STATION_SCHEMA = {
+    'Fuel Type Code': 'category',
+    'City': 'category',
+    'State': 'category',
+    'Status Code': 'category',
+    'EV Network': 'category',
+    'Access Code': 'category',
+    'Facility Type': 'category',
+    'ZIP': 'Int32'
+}
+
+STATION_DIR = os.path.join(CACHE_DIR, 'stations')
+STORE_FILE = 'stations.parquet'
+CHANGES_FILE = 'station_changes.parquet'
+META_FILE = 'stations.json'
+
+
+def station_config():
+    """
+    Settings that change the stored rows; a change rebuilds the store
+    """
+    return {'columns': {column: str(dtype) for column, dtype in STATION_COLUMNS.items()},
+            'schema': STATION_SCHEMA, 'fuel_type': FUEL_TYPE}
+
+
+def read_station_feed(file_path):
+    """
+    Read the projected columns of an AFDC download and keep electric stations
+
+    Only 'Updated At' is parsed here; the other dates and the compact
+    dtypes are applied by apply_station_schema() to the rows being stored.
+    """
+    feed = pd.read_csv(file_path, usecols=list(STATION_COLUMNS), dtype=STATION_COLUMNS)
+    feed = feed[feed['Fuel Type Code'] == FUEL_TYPE].drop_duplicates(STATION_ID, keep='last')
+    feed = feed.reset_index(drop=True)
+    updated_at, _ = parse_dates(feed[UPDATED_AT], UPDATED_AT)
+    return feed.assign(**{UPDATED_AT: updated_at})
+
+
+def apply_station_schema(feed):
+    """
+    Convert feed rows to the dtypes in STATION_SCHEMA and parse their dates
+
+    ZIP codes that are not numeric (e.g. Canadian postal codes) become missing.
+    """
+    typed = {}
+    for column, dtype in STATION_SCHEMA.items():
+        if dtype == 'category':
+            typed[column] = feed[column].astype('category')
+        else:
+            typed[column] = pd.to_numeric(feed[column], errors='coerce').astype(dtype)
+    stations, _ = parse_date_columns(feed.assign(**typed), columns=['Open Date', 'Date Last Confirmed'])
+    return stations
+
+
+def restore_station_schema(stations):
+    """
+    Re-apply STATION_SCHEMA dtypes to stations read from Parquet
+
+    A column that is missing for every station (e.g. an export with no
+    'Facility Type') is read back as object rather than category.
+    """
+    typed = {column: stations[column].astype(dtype) for column, dtype in STATION_SCHEMA.items()
+             if column in stations and str(stations[column].dtype) != dtype}
+    return stations.assign(**typed)
+
+
+def load_store(store_dir=STATION_DIR):
+    """
+    Load every stored station, or None if the store is missing or was built with other settings
+    """
+    meta = load_meta(store_dir)
+    if meta is None:
+        return None
+    if meta['config'] != config_hash(station_config()):
+        print("Station columns or dtypes changed since the store was built")
+        return None
+    return restore_station_schema(pd.read_parquet(os.path.join(store_dir, STORE_FILE)))
+
+
+def load_meta(store_dir=STATION_DIR):
+    meta_path = os.path.join(store_dir, META_FILE)
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path) as f:
+        return json.load(f)
+
+
+def upsert_stations(stored, feed, refreshed_at):
+    """
+    Merge a download into the stored stations
+
+    A station is (re)written when it is new, its 'Updated At' is later than
+    the stored one, its status differs, or it had dropped out of an earlier
+    download. Stored stations missing from the download are kept with
+    in_feed False, since the AFDC feed leaves out closed stations. Rows come
+    back in download order, followed by the stations no longer in it.
+
+    Parameters:
+    stored (DataFrame or None): Current store
+    feed (DataFrame): Rows from read_station_feed()
+    refreshed_at (Timestamp): Time recorded for the changes
+
+    Returns:
+    tuple: (new store, DataFrame of changes with ID, change, status before
+        and after, Updated At and refreshed_at)
+    """
+    if stored is None:
+        stored = apply_station_schema(feed.iloc[:0]).assign(in_feed=pd.Series(dtype=bool))
+
+    previous = feed[[STATION_ID]].merge(stored[[STATION_ID, UPDATED_AT, STATUS, 'in_feed']],
+                                        on=STATION_ID, how='left', suffixes=('', '_stored'))
+    added = previous['in_feed'].isna().to_numpy()
+    status_before = previous[STATUS].astype(object)
+    status_after = feed[STATUS].astype(object)
+    status_changed = ~added & (status_before.fillna('') != status_after.fillna('')).to_numpy()
+    reopened = ~added & (previous['in_feed'] == False).to_numpy()
+    updated = ~added & (feed[UPDATED_AT] > previous[UPDATED_AT]).to_numpy()
+    upsert = added | status_changed | reopened | updated
+
+    # Unchanged stations keep their stored rows; only the rest is typed and parsed
+    unchanged = stored.set_index(STATION_ID).loc[feed.loc[~upsert, STATION_ID]].reset_index()
+    rewritten = apply_station_schema(feed[upsert]).assign(in_feed=True)
+    positions = pd.Series(range(len(feed)), index=feed[STATION_ID])
+    current = concat_typed_chunks([unchanged.assign(in_feed=True), rewritten[unchanged.columns]])
+    current = current.iloc[positions[current[STATION_ID]].to_numpy().argsort(kind='stable')]
+
+    gone = ~stored[STATION_ID].isin(feed[STATION_ID])
+    removed = gone & stored['in_feed'].astype(bool)
+    store = concat_typed_chunks([current, stored[gone].assign(in_feed=False)[current.columns]])
+
+    change = pd.Series('updated', index=feed.index)
+    change[status_changed] = 'status'
+    change[reopened] = 'reopened'
+    change[added] = 'added'
+    changes = pd.DataFrame({
+        STATION_ID: feed[STATION_ID],
+        'change': change,
+        'status_before': status_before,
+        'status_after': status_after,
+        UPDATED_AT: feed[UPDATED_AT]
+    })[upsert]
+    changes = pd.concat([changes, pd.DataFrame({
+        STATION_ID: stored.loc[removed, STATION_ID],
+        'change': 'removed',
+        'status_before': stored.loc[removed, STATUS].astype(object),
+        'status_after': None,
+        UPDATED_AT: stored.loc[removed, UPDATED_AT]
+    })], ignore_index=True)
+    changes['refreshed_at'] = refreshed_at
+    return store.reset_index(drop=True), changes
+
+
+def save_store(store, changes, fingerprint, store_dir=STATION_DIR):
+    """
+    Write the store, append the changes to the change log and record the source
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    store.to_parquet(os.path.join(store_dir, STORE_FILE), index=False)
+
+    changes_path = os.path.join(store_dir, CHANGES_FILE)
+    if os.path.exists(changes_path):
+        changes = pd.concat([pd.read_parquet(changes_path), changes], ignore_index=True)
+    changes.to_parquet(changes_path, index=False)
+
+    with open(os.path.join(store_dir, META_FILE), 'w') as f:
+        json.dump({
+            'source': fingerprint['sha256'],
+            'config': config_hash(station_config()),
+            'refreshed_at': pd.Timestamp.now().isoformat(),
+            'stations': int(store['in_feed'].sum()),
+            'removed': int((~store['in_feed']).sum())
+        }, f, indent=2)
+
+
+def refresh_station_store(file_path='alt_fuel_stations.csv', store_dir=STATION_DIR, full=False):
+    """
+    Upsert an AFDC download into the station store
+
+    Nothing is read when the download is the one last applied (same content
+    hash). Otherwise only the projected columns are read, and only new or
+    changed stations are typed and parsed.
+
+    Parameters:
+    file_path (str): AFDC alt_fuel_stations.csv download
+    store_dir (str): Folder holding the store, change log and metadata
+    full (bool): Ignore the stored stations and rebuild from this download
+
+    Returns:
+    DataFrame: Changes applied by this refresh (empty when up to date)
+    """
+    fingerprint = file_fingerprint(file_path)
+    meta = load_meta(store_dir)
+    if (not full and meta is not None and meta['source'] == fingerprint['sha256']
+            and meta['config'] == config_hash(station_config())):
+        print(f"Station store is up to date with {file_path}")
+        return pd.DataFrame(columns=[STATION_ID, 'change', 'status_before', 'status_after', UPDATED_AT,
+                                     'refreshed_at'])
+
+    stored = None if full else load_store(store_dir)
+    print(f"{'Building' if stored is None else 'Refreshing'} station store from {file_path}...")
+    with step('read_station_feed') as record:
+        feed = read_station_feed(file_path)
+        record['rows_out'] = len(feed)
+
+    with step('upsert_stations', rows_in=len(feed),
+              outputs=[os.path.join(store_dir, STORE_FILE), os.path.join(store_dir, CHANGES_FILE)]) as record:
+        store, changes = upsert_stations(stored, feed, pd.Timestamp.now().floor('s'))
+        save_store(store, changes, fingerprint, store_dir)
+        record['rows_out'] = len(changes)
+
+    counts = changes['change'].value_counts()
+    print(f"Station store: {int(store['in_feed'].sum())} stations in the feed, "
+          + ', '.join(f"{counts.get(change, 0)} {change}" for change in
+                      ['added', 'updated', 'status', 'reopened', 'removed']))
+    return changes
+
+
+def load_stations(columns=None, store_dir=STATION_DIR, include_removed=False):
+    """
+    Read stations from the store, only the requested columns
+
+    Parameters:
+    columns (list or None): Columns to read; None reads all
+    store_dir (str): Folder holding the store
+    include_removed (bool): Also return stations missing from the latest download
+
+    Returns:
+    DataFrame: Stations in download order
+    """
+    filters = None if include_removed else [('in_feed', '==', True)]
+    stations = restore_station_schema(pd.read_parquet(os.path.join(store_dir, STORE_FILE), columns=columns,
+                                                      filters=filters))
+    return stations.drop(columns='in_feed', errors='ignore') if not include_removed else stations
+
+
+def verify_against_download(file_path, store_dir=STATION_DIR):
+    """
+    Check the stations in the store against a rebuild from the download alone
+
+    Stations edited without a later 'Updated At' show up here.
+
+    Returns:
+    bool: True when every station in the feed matches
+    """
+    rebuilt, _ = upsert_stations(None, read_station_feed(file_path), pd.Timestamp.now())
+    rebuilt = rebuilt.drop(columns='in_feed')
+    stored = load_stations(store_dir=store_dir)[rebuilt.columns]
+
+    if not stored[STATION_ID].reset_index(drop=True).equals(rebuilt[STATION_ID]):
+        print(f"Verification FAILED: {len(stored)} stations in the store, {len(rebuilt)} in the download")
+        return False
+
+    # Compare as text so categories and missing-value markers do not matter
+    stored_text = stored.reset_index(drop=True).astype(str).fillna('')
+    differs = (stored_text != rebuilt.astype(str).fillna('')).any(axis=1)
+    if differs.any():
+        print(f"Verification FAILED: {int(differs.sum())} stations differ, e.g. IDs "
+              f"{rebuilt.loc[differs, STATION_ID].head(10).tolist()}; rebuild with --full")
+        return False
+    print("Verification passed: the store matches the download")
+    return True
+
+
+def main():
+    """
+    Command-line entry point for the weekly AFDC refresh
+    """
+    parser = argparse.ArgumentParser(description="Upsert an AFDC station download into the station store")
+    parser.add_argument('--file', default='alt_fuel_stations.csv', help="AFDC station download")
+    parser.add_argument('--store-dir', default=STATION_DIR, help="Folder holding the station store")
+    parser.add_argument('--full', action='store_true', help="Rebuild the store from this download")
+    parser.add_argument('--verify', action='store_true', help="Check the store against the download")
+    args = parser.parse_args()
+
+    refresh_station_store(args.file, args.store_dir, full=args.full)
+    if args.verify:
+        verify_against_download(args.file, args.store_dir)
+
+
+if __name__ == "__main__":
+    main()
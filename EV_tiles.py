@@ -0,0 +1,214 @@
+# Author: Jingni Zhang
+# Date Created: 04.22.2025
+
+import argparse
+import io
+import os
+import sqlite3
+import urllib.request
+from functools import lru_cache
+
+import numpy as np
+import contextily as ctx
+import mercantile
+from PIL import Image
+
+from EV_profile import step
+
+# Local MBTiles store read by add_basemap()
+TILE_STORE = 'tiles/cartodb_positron.mbtiles'
+TILE_PROVIDER = ctx.providers.CartoDB.Positron
+TILE_SIZE = 256
+
+# Regions and zoom levels used by EV_charger.py (lon/lat bounds: west, south, east, north).
+# The statewide maps resolve to zoom 7 and the NYC map to zoom 10-11 with the
+# same 'auto' rule contextily uses; one level either side is kept for margin.
+PREFETCH_REGIONS = [
+    ('New York State', (-80.0, 40.3, -71.5, 45.2), range(6, 9)),
+    ('New York City', (-74.6, 40.3, -73.3, 41.1), range(9, 13))
+]
+
+
+def open_tile_store(store_path=TILE_STORE):
+    """
+    Open (and create if needed) an MBTiles SQLite tile store
+    """
+    os.makedirs(os.path.dirname(store_path) or '.', exist_ok=True)
+    connection = sqlite3.connect(store_path)
+    connection.execute("CREATE TABLE IF NOT EXISTS metadata (name TEXT PRIMARY KEY, value TEXT)")
+    connection.execute("CREATE TABLE IF NOT EXISTS tiles (zoom_level INTEGER, tile_column INTEGER, "
+                       "tile_row INTEGER, tile_data BLOB, PRIMARY KEY (zoom_level, tile_column, tile_row))")
+    return connection
+
+
+def tms_row(z, y):
+    """
+    MBTiles stores rows bottom-up (TMS); XYZ tile rows count top-down
+    """
+    return (1 << z) - 1 - y
+
+
+def fetch_tile(z, x, y, provider=TILE_PROVIDER):
+    """
+    Download one tile's PNG bytes from the provider
+    """
+    request = urllib.request.Request(provider.build_url(x=x, y=y, z=z), headers={'User-Agent': 'ev-charging'})
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return response.read()
+
+
+def prefetch_tiles(regions=PREFETCH_REGIONS, store_path=TILE_STORE, provider=TILE_PROVIDER):
+    """
+    Download every tile covering the given regions into the store
+
+    Tiles already in the store are skipped, so the command can be rerun to
+    resume or extend a partial download.
+
+    Parameters:
+    regions (list): (name, (west, south, east, north), zoom levels) tuples
+    store_path (str): MBTiles file to fill
+    provider (TileProvider): Tile source
+
+    Returns:
+    int: Number of tiles downloaded
+    """
+    connection = open_tile_store(store_path)
+    connection.execute("INSERT OR REPLACE INTO metadata VALUES ('name', ?)", (provider.name,))
+    connection.execute("INSERT OR REPLACE INTO metadata VALUES ('attribution', ?)", (provider.get('attribution', ''),))
+    connection.execute("INSERT OR REPLACE INTO metadata VALUES ('format', 'png')")
+
+    downloaded = 0
+    for name, (west, south, east, north), zooms in regions:
+        for z in zooms:
+            tiles = list(mercantile.tiles(west, south, east, north, zooms=z))
+            print(f"Prefetching {len(tiles)} tiles for {name} at zoom {z}...")
+            for tile in tiles:
+                exists = connection.execute(
+                    "SELECT 1 FROM tiles WHERE zoom_level=? AND tile_column=? AND tile_row=?",
+                    (z, tile.x, tms_row(z, tile.y))).fetchone()
+                if exists:
+                    continue
+                connection.execute("INSERT INTO tiles VALUES (?, ?, ?, ?)",
+                                   (z, tile.x, tms_row(z, tile.y), fetch_tile(z, tile.x, tile.y, provider)))
+                downloaded += 1
+            connection.commit()
+
+    connection.close()
+    print(f"Downloaded {downloaded} new tiles into {store_path}")
+    return downloaded
+
+
+@lru_cache(maxsize=1024)
+def load_tile(store_path, z, x, y):
+    """
+    Read and decode one tile from the store, or None if it is missing
+
+    Decoded tiles are kept in an in-process LRU so figures that share an
+    extent (e.g. the four period panels) decode each tile only once.
+    """
+    connection = sqlite3.connect(f"file:{store_path}?mode=ro", uri=True)
+    try:
+        row = connection.execute(
+            "SELECT tile_data FROM tiles WHERE zoom_level=? AND tile_column=? AND tile_row=?",
+            (z, x, tms_row(z, y))).fetchone()
+    finally:
+        connection.close()
+    if row is None:
+        return None
+    tile = np.asarray(Image.open(io.BytesIO(row[0])).convert('RGBA'))
+    tile.setflags(write=False)
+    return tile
+
+
+def auto_zoom(west, south, east, north, max_zoom=TILE_PROVIDER.get('max_zoom', 20)):
+    """
+    Zoom level for a lon/lat extent, using the same rule as contextily's zoom='auto'
+    """
+    zoom_lon = np.ceil(np.log2(360 * 2.0 / (east - west)))
+    zoom_lat = np.ceil(np.log2(360 * 2.0 / (north - south)))
+    return int(min(zoom_lon, zoom_lat, max_zoom))
+
+
+def zoom_levels(west, south, east, north, margin=1):
+    """
+    Zoom levels add_basemap(zoom='auto') can pick for a lon/lat extent, with margin levels either side
+    """
+    zoom = auto_zoom(west, south, east, north)
+    return range(max(zoom - margin, 0), zoom + margin + 1)
+
+
+def basemap_image(xmin, xmax, ymin, ymax, zoom='auto', store_path=TILE_STORE):
+    """
+    Mosaic stored tiles covering a Web Mercator extent
+
+    Returns:
+    tuple: (RGBA image array, (left, right, bottom, top) extent in EPSG:3857)
+    """
+    west, south = mercantile.lnglat(xmin, ymin)
+    east, north = mercantile.lnglat(xmax, ymax)
+    if zoom == 'auto':
+        zoom = auto_zoom(west, south, east, north)
+
+    tiles = list(mercantile.tiles(west, south, east, north, zooms=zoom))
+    columns = sorted({tile.x for tile in tiles})
+    rows = sorted({tile.y for tile in tiles})
+
+    image = np.zeros((len(rows) * TILE_SIZE, len(columns) * TILE_SIZE, 4), dtype=np.uint8)
+    missing = 0
+    for tile in tiles:
+        data = load_tile(store_path, zoom, tile.x, tile.y)
+        if data is None:
+            missing += 1
+            continue
+        top = rows.index(tile.y) * TILE_SIZE
+        left = columns.index(tile.x) * TILE_SIZE
+        image[top:top + TILE_SIZE, left:left + TILE_SIZE] = data[:TILE_SIZE, :TILE_SIZE]
+    if missing:
+        print(f"Warning: {missing} of {len(tiles)} basemap tiles at zoom {zoom} are not in {store_path}; "
+              f"run 'python EV_tiles.py' to prefetch them")
+
+    upper_left = mercantile.xy_bounds(columns[0], rows[0], zoom)
+    lower_right = mercantile.xy_bounds(columns[-1], rows[-1], zoom)
+    return image, (upper_left.left, lower_right.right, lower_right.bottom, upper_left.top)
+
+
+def add_basemap(ax, alpha=None, zoom='auto', store_path=TILE_STORE, source=TILE_PROVIDER):
+    """
+    Draw a basemap behind Web Mercator data from the local tile store
+
+    Falls back to contextily's network download when no store exists yet.
+
+    Parameters:
+    ax (Axes): Axes with data in EPSG:3857
+    alpha (float or None): Basemap transparency
+    zoom (int or 'auto'): Tile zoom level
+    store_path (str): MBTiles file written by prefetch_tiles()
+    source (TileProvider): Provider used for attribution and the network fallback
+    """
+    with step('basemap') as record:
+        if not os.path.exists(store_path):
+            record['source'] = 'network'
+            ctx.add_basemap(ax, source=source, alpha=alpha, zoom=zoom)
+            return
+
+        record['source'] = store_path
+        xmin, xmax, ymin, ymax = ax.axis()
+        image, extent = basemap_image(xmin, xmax, ymin, ymax, zoom=zoom, store_path=store_path)
+        ax.imshow(image, extent=extent, interpolation='bilinear', aspect=ax.get_aspect(), alpha=alpha)
+        ax.axis((xmin, xmax, ymin, ymax))
+        ctx.add_attribution(ax, source.get('attribution'))
+
+
+def main():
+    """
+    Command-line entry point: prefetch the tiles EV_charger.py needs
+    """
+    parser = argparse.ArgumentParser(description="Prefetch basemap tiles into the local MBTiles store")
+    parser.add_argument('--store', default=TILE_STORE, help="MBTiles file to fill")
+    args = parser.parse_args()
+
+    prefetch_tiles(store_path=args.store)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+# Author: Jingni Zhang
+# Date Created: 04.18.2025
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# Allow running from the repository root or from benchmarks/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from EV_dates import parse_dates
+
+
+def synthetic_dates(n_rows, fmt, seed=0):
+    """
+    Random dates between 2000 and 2025 formatted as strings
+    """
+    rng = np.random.default_rng(seed)
+    days = rng.integers(0, 26 * 365, n_rows)
+    dates = pd.Timestamp('2000-01-01') + pd.to_timedelta(days, unit='D')
+    return pd.Series(dates.strftime(fmt), dtype=object)
+
+
+def time_call(label, func):
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<45} {elapsed:8.2f} s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark date parsing against the previous code")
+    parser.add_argument('--rows', type=int, default=10_000_000, help="Number of synthetic dates")
+    args = parser.parse_args()
+
+    print(f"Generating {args.rows} synthetic dates...")
+    reg_dates = synthetic_dates(args.rows, '%m/%d/%Y')
+    open_dates = synthetic_dates(args.rows, '%Y-%m-%d', seed=1)
+
+    print("reg_date (MM/DD/YYYY) -> year")
+    old_years = time_call("  previous: str.split('/').str[2].astype(int)",
+                          lambda: reg_dates.str.split('/').str[2].astype(int))
+    new_years = time_call("  parse_dates().dt.year",
+                          lambda: parse_dates(reg_dates, 'reg_date')[0].dt.year)
+    print(f"  years match: {bool((old_years.values == new_years.values).all())}")
+
+    print("Open Date (YYYY-MM-DD) -> datetime")
+    old_dates = time_call("  previous: to_datetime(format='mixed')",
+                          lambda: pd.to_datetime(open_dates, format='mixed', errors='coerce'))
+    new_dates = time_call("  parse_dates()",
+                          lambda: parse_dates(open_dates, 'Open Date')[0])
+    print(f"  dates match: {bool((old_dates.values == new_dates.values).all())}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# Author: Jingni Zhang
+# Date Created: 05.14.2025
+
+import argparse
+import os
+import subprocess
+import sys
+
+# Allow running from the repository root or from benchmarks/
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Startup budget for the non-spatial paths, in milliseconds of import time
+# (pandas alone is most of it)
+IMPORT_BUDGET_MS = 1000
+
+# Packages only the spatial and plotting functions may pull in
+HEAVY_MODULES = ['geopandas', 'shapely', 'pyproj', 'scipy', 'matplotlib', 'seaborn', 'contextily', 'mercantile',
+                 'PIL']
+
+# (label, code, held to the budget)
+SCENARIOS = [
+    ('import EV_api', 'import EV_api', True),
+    ('import EV_reg', 'import EV_reg', True),
+    ('import EV_charger', 'import EV_charger', True),
+    ('ingest, filter and aggregate functions',
+     'import EV_api as ev; ev.load_cleaned_ev_data, ev.load_charger_data, ev.filter_ev_records, '
+     'ev.CountCube, ev.ev_penetration, ev.summary_statistics, ev.gap_table', True),
+    ('spatial and plotting functions (reference)',
+     'import EV_api as ev; ev.charger_accessibility, ev.point_density, ev.plot_heatmap, ev.create_heatmap', False)
+]
+
+
+def import_profile(code):
+    """
+    Run code in a fresh interpreter under -X importtime
+
+    Returns:
+    tuple: (total import time in ms, set of top-level packages imported)
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=REPO_DIR,
+                            capture_output=True, text=True, check=True)
+    total_us = 0
+    packages = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        packages.add(name.strip().split('.')[0])
+        # Top-level imports have no indentation; their cumulative times add up to the total
+        if not name[1:].startswith(' '):
+            total_us += int(cumulative)
+    return total_us / 1000, packages
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import time of the analysis modules")
+    parser.add_argument('--budget-ms', type=float, default=IMPORT_BUDGET_MS,
+                        help="Import time allowed for the non-spatial paths")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per scenario; the fastest is reported")
+    args = parser.parse_args()
+
+    baseline, _ = min(import_profile('import pandas') for _ in range(args.repeat))
+    print(f"{'import pandas (floor)':<45} {baseline:8.0f} ms")
+
+    failed = False
+    for label, code, budgeted in SCENARIOS:
+        elapsed, packages = min(import_profile(code) for _ in range(args.repeat))
+        heavy = [module for module in HEAVY_MODULES if module in packages]
+        status = ''
+        if budgeted:
+            over = elapsed > args.budget_ms
+            failed |= over or bool(heavy)
+            status = 'OVER BUDGET' if over else 'ok'
+        print(f"{label:<45} {elapsed:8.0f} ms  {status:<11} heavy: {', '.join(heavy) or '-'}")
+
+    if failed:
+        print(f"A non-spatial path exceeded {args.budget_ms:.0f} ms or imported a spatial/plotting package")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
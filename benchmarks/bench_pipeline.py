@@ -0,0 +1,228 @@
+# Author: Jingni Zhang
+# Date Created: 05.16.2025
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+
+# Allow running from the repository root or from benchmarks/
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_DIR)
+
+from synthetic_data import REGISTRATION_SIZES, STATION_SIZES, SYNTHETIC_DIR, synthetic_inputs
+
+# Scratch folders the stages run in (one per dataset) and where results are written
+WORK_DIR = os.path.join(BENCH_DIR, 'work')
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+
+# Stored results that later runs are compared against, keyed by dataset
+BASELINE_FILE = os.path.join(BENCH_DIR, 'baseline.json')
+
+# A stage regresses when it is this much slower or larger than the baseline;
+# differences under the floors are treated as noise
+TOLERANCE = 0.25
+MIN_SECONDS = 0.5
+MIN_RSS_MB = 50
+
+# Repository files the stages read besides the synthetic inputs
+SHARED_INPUTS = ['filters.toml', 'ny_tiger_shapfile', 'tiles']
+
+# Runs one EV_pipeline stage in a fresh interpreter and prints its time and
+# EV_profile steps as the last line
+STAGE_RUNNER = """
+import json, sys, time
+sys.path.insert(0, sys.argv[2])
+import EV_pipeline, EV_profile
+stage_def = {stage_def['name']: stage_def for stage_def in EV_pipeline.pipeline_stages()}[sys.argv[1]]
+start = time.perf_counter()
+stage_def['function'](**stage_def['params'])
+print(json.dumps({'seconds': time.perf_counter() - start, 'steps': EV_profile.STEPS}, default=str))
+"""
+
+
+def prepare_workdir(registration_file, station_file, work_dir):
+    """
+    Fresh working folder with the synthetic inputs under their real names
+
+    Previous outputs and caches are removed so every stage runs cold; the
+    boundary cache is kept, as it depends on the shapefile only.
+    """
+    os.makedirs(work_dir, exist_ok=True)
+    for name in ['data', 'graphs', 'logs']:
+        shutil.rmtree(os.path.join(work_dir, name), ignore_errors=True)
+        os.makedirs(os.path.join(work_dir, name))
+    cache_dir = os.path.join(work_dir, 'cache')
+    if os.path.isdir(cache_dir):
+        for name in os.listdir(cache_dir):
+            if name != 'boundaries':
+                path = os.path.join(cache_dir, name)
+                shutil.rmtree(path) if os.path.isdir(path) else os.remove(path)
+    os.makedirs(os.path.join(cache_dir, 'pipeline'), exist_ok=True)
+
+    links = {'Vehicle_Registrations.csv': registration_file, 'alt_fuel_stations.csv': station_file}
+    links.update({name: os.path.join(REPO_DIR, name) for name in SHARED_INPUTS
+                  if os.path.exists(os.path.join(REPO_DIR, name))})
+    for name, target in links.items():
+        link = os.path.join(work_dir, name)
+        if os.path.lexists(link):
+            os.remove(link)
+        os.symlink(os.path.abspath(target), link)
+
+
+def run_stage(name, work_dir):
+    """
+    Run one stage in a child process, measuring its time and the child's peak RSS
+
+    Returns:
+    dict: seconds (stage function only, without interpreter start-up and
+        imports), peak_rss_mb, status ('ok' or 'failed') and the stage's
+        EV_profile steps
+    """
+    log_file = os.path.join(work_dir, 'logs', f"{name}.log")
+    with open(log_file, 'w') as log:
+        process = subprocess.Popen([sys.executable, '-c', STAGE_RUNNER, name, REPO_DIR], cwd=work_dir,
+                                   stdout=log, stderr=subprocess.STDOUT)
+        # wait4 returns the resource usage of this child alone
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+
+    result = {'peak_rss_mb': round(usage.ru_maxrss / 1024, 1), 'status': 'failed', 'seconds': None}
+    if process.returncode == 0:
+        with open(log_file) as log:
+            timings = json.loads(log.read().splitlines()[-1])
+        result.update(seconds=round(timings['seconds'], 3), status='ok', steps=timings['steps'])
+    return result
+
+
+def run_benchmark(registrations, stations, stages=None, seed=0, data_dir=SYNTHETIC_DIR, work_root=WORK_DIR):
+    """
+    Run the pipeline stages on a synthetic dataset, one child process per stage
+
+    Stages run in dependency order; a stage whose upstream stage failed is
+    skipped.
+
+    Parameters:
+    registrations (str): Key of REGISTRATION_SIZES
+    stations (str): Key of STATION_SIZES
+    stages (list or None): Stage names (with their upstream stages); None runs all
+    seed (int): Seed of the synthetic data
+    data_dir (str): Folder of the generated inputs
+    work_root (str): Parent of the per-dataset working folders
+
+    Returns:
+    dict: Run metadata and per-stage results
+    """
+    import EV_pipeline
+
+    registration_file, station_file = synthetic_inputs(registrations, stations, data_dir, seed)
+    dataset = f"{registrations}_{stations}"
+    work_dir = os.path.join(work_root, dataset)
+    prepare_workdir(registration_file, station_file, work_dir)
+
+    # Build the boundary cache outside the timed stages
+    warm_up = subprocess.run([sys.executable, '-c', f"import sys; sys.path.insert(0, {REPO_DIR!r}); "
+                              "import EV_boundaries; EV_boundaries.build_boundary_cache()"],
+                             cwd=work_dir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    if warm_up.returncode != 0:
+        print("Boundary shapefile could not be read; the spatial stages will fail")
+
+    results = {}
+    for stage_def in EV_pipeline.select_stages(EV_pipeline.pipeline_stages(), stages):
+        name = stage_def['name']
+        if any(results[dep]['status'] != 'ok' for dep in stage_def['deps']):
+            results[name] = {'seconds': None, 'peak_rss_mb': None, 'status': 'skipped'}
+        else:
+            results[name] = run_stage(name, work_dir)
+        result = results[name]
+        seconds = '-' if result['seconds'] is None else f"{result['seconds']:.2f} s"
+        rss = '-' if result['peak_rss_mb'] is None else f"{result['peak_rss_mb']:.0f} MB"
+        print(f"{name:<22} {seconds:>10} {rss:>10}  {result['status']}")
+
+    return {
+        'dataset': dataset,
+        'registrations': REGISTRATION_SIZES[registrations],
+        'stations': STATION_SIZES[stations],
+        'seed': seed,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'machine': {'python': platform.python_version(), 'platform': platform.platform(),
+                    'processor': platform.machine(), 'cpus': os.cpu_count()},
+        'stages': results
+    }
+
+
+def compare_to_baseline(run, baseline, tolerance=TOLERANCE):
+    """
+    Stages slower or larger than the baseline beyond the tolerance and noise floors
+
+    Returns:
+    list: (stage, metric, baseline value, current value) per regression
+    """
+    regressions = []
+    for name, current in run['stages'].items():
+        reference = baseline['stages'].get(name)
+        if reference is None or reference['status'] != 'ok':
+            continue
+        if current['status'] != 'ok':
+            regressions.append((name, 'status', reference['status'], current['status']))
+            continue
+        for metric, floor in [('seconds', MIN_SECONDS), ('peak_rss_mb', MIN_RSS_MB)]:
+            if (current[metric] > reference[metric] * (1 + tolerance)
+                    and current[metric] - reference[metric] > floor):
+                regressions.append((name, metric, reference[metric], current[metric]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline stages on synthetic data")
+    parser.add_argument('--registrations', choices=REGISTRATION_SIZES, default='1m', help="Registration rows")
+    parser.add_argument('--stations', choices=STATION_SIZES, default='5k', help="Station rows")
+    parser.add_argument('--stages', nargs='*', help="Stages to run (with their upstream stages); default all")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the synthetic data")
+    parser.add_argument('--baseline', default=BASELINE_FILE, help="Stored results to compare against")
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE, help="Allowed slowdown or growth (0.25 = 25%%)")
+    parser.add_argument('--save-baseline', action='store_true', help="Store this run as the dataset's baseline")
+    args = parser.parse_args()
+
+    run = run_benchmark(args.registrations, args.stations, args.stages, args.seed)
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    results_file = os.path.join(RESULTS_DIR, f"{run['dataset']}_{run['timestamp'].replace(':', '')}.json")
+    with open(results_file, 'w') as f:
+        json.dump(run, f, indent=2)
+    print(f"Results written to {results_file}")
+
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baselines = json.load(f)
+
+    if args.save_baseline:
+        baselines[run['dataset']] = run
+        with open(args.baseline, 'w') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+        print(f"Baseline for {run['dataset']} saved to {args.baseline}")
+        return
+
+    if run['dataset'] not in baselines:
+        print(f"No baseline for {run['dataset']}; store one with --save-baseline")
+        return
+
+    baseline = baselines[run['dataset']]
+    if baseline['machine'] != run['machine']:
+        print(f"Warning: baseline was recorded on {baseline['machine']}")
+    regressions = compare_to_baseline(run, baseline, args.tolerance)
+    for name, metric, before, after in regressions:
+        print(f"REGRESSION {name}: {metric} {before} -> {after}")
+    if regressions:
+        sys.exit(1)
+    print(f"No regressions against the {baseline['timestamp']} baseline")
+
+
+if __name__ == "__main__":
+    main()
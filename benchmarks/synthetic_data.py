@@ -0,0 +1,344 @@
+# Author: Jingni Zhang
+# Date Created: 05.16.2025
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+# Dataset sizes used by bench_pipeline.py
+REGISTRATION_SIZES = {'1m': 1_000_000, '10m': 10_000_000, '50m': 50_000_000}
+STATION_SIZES = {'5k': 5_000, '50k': 50_000, '500k': 500_000}
+
+# Generated files are kept here and reused by later runs
+SYNTHETIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+# Rows generated and written at a time, so 50M rows never sit in memory at once
+CHUNK_ROWS = 1_000_000
+
+# Columns of the DMV "Vehicle, Snowmobile, and Boat Registrations" export
+REGISTRATION_COLUMNS = [
+    'Record Type', 'VIN', 'Registration Class', 'City', 'State', 'Zip', 'County', 'Model Year', 'Make',
+    'Body Type', 'Fuel Type', 'Unladen Weight', 'Maximum Gross Weight', 'Passengers', 'Reg Valid Date',
+    'Reg Expiration Date', 'Color', 'Scofflaw Indicator', 'Suspension Indicator', 'Revocation Indicator'
+]
+
+# Columns of the AFDC station export (alt_fuel_stations.csv)
+STATION_COLUMNS = [
+    'Fuel Type Code', 'Station Name', 'Street Address', 'Intersection Directions', 'City', 'State', 'ZIP', 'Plus4',
+    'Station Phone', 'Status Code', 'Expected Date', 'Groups With Access Code', 'Access Days Time',
+    'Cards Accepted', 'BD Blends', 'NG Fill Type Code', 'NG PSI', 'EV Level1 EVSE Num', 'EV Level2 EVSE Num',
+    'EV DC Fast Count', 'EV Other Info', 'EV Network', 'EV Network Web', 'Geocode Status', 'Latitude',
+    'Longitude', 'Date Last Confirmed', 'ID', 'Updated At', 'Owner Type Code', 'Federal Agency ID',
+    'Federal Agency Name', 'Open Date', 'Hydrogen Status Link', 'NG Vehicle Class', 'LPG Primary',
+    'E85 Blender Pump', 'EV Connector Types', 'Country', 'Intersection Directions (French)',
+    'Access Days Time (French)', 'BD Blends (French)', 'Groups With Access Code (French)', 'Hydrogen Is Retail',
+    'Access Code', 'Access Detail Code', 'Federal Agency Code', 'Facility Type', 'CNG Dispenser Num',
+    'CNG On-Site Renewable Source', 'CNG Total Compression Capacity', 'CNG Storage Capacity',
+    'LNG On-Site Renewable Source', 'E85 Other Ethanol Blends', 'EV Pricing', 'EV Pricing (French)',
+    'LPG Nozzle Types', 'Hydrogen Pressures', 'Hydrogen Standards', 'CNG Fill Type Code', 'CNG PSI',
+    'CNG Vehicle Class', 'LNG Vehicle Class', 'EV On-Site Renewable Source', 'Restricted Access', 'RD Blends',
+    'RD Blends (French)', 'RD Blended with Biodiesel', 'RD Maximum Biodiesel Level', 'NPS Unit Name',
+    'CNG Station Sells Renewable Natural Gas', 'LNG Station Sells Renewable Natural Gas',
+    'Maximum Vehicle Class', 'EV Workplace Charging', 'Funding Sources'
+]
+
+# Population centres: (ZIP prefix, city, county, latitude, longitude, spread in degrees, share).
+# Registrations and stations are both drawn around them.
+REGIONS = [
+    ('100', 'NEW YORK', 'NEW YORK', 40.77, -73.97, 0.03, 0.10),
+    ('104', 'BRONX', 'BRONX', 40.85, -73.88, 0.03, 0.06),
+    ('112', 'BROOKLYN', 'KINGS', 40.65, -73.95, 0.04, 0.11),
+    ('113', 'FLUSHING', 'QUEENS', 40.72, -73.82, 0.05, 0.09),
+    ('103', 'STATEN ISLAND', 'RICHMOND', 40.58, -74.15, 0.04, 0.03),
+    ('115', 'GARDEN CITY', 'NASSAU', 40.73, -73.60, 0.07, 0.08),
+    ('117', 'HAUPPAUGE', 'SUFFOLK', 40.82, -73.10, 0.20, 0.09),
+    ('105', 'WHITE PLAINS', 'WESTCHESTER', 41.03, -73.76, 0.08, 0.06),
+    ('125', 'POUGHKEEPSIE', 'DUTCHESS', 41.70, -73.92, 0.15, 0.04),
+    ('122', 'ALBANY', 'ALBANY', 42.68, -73.80, 0.10, 0.05),
+    ('132', 'SYRACUSE', 'ONONDAGA', 43.05, -76.15, 0.10, 0.05),
+    ('146', 'ROCHESTER', 'MONROE', 43.15, -77.60, 0.10, 0.06),
+    ('142', 'BUFFALO', 'ERIE', 42.90, -78.80, 0.12, 0.07),
+    ('148', 'ELMIRA', 'CHEMUNG', 42.10, -76.80, 0.25, 0.03),
+    ('128', 'GLENS FALLS', 'WARREN', 43.40, -73.70, 0.30, 0.03),
+    ('136', 'WATERTOWN', 'JEFFERSON', 44.00, -75.90, 0.30, 0.05)
+]
+
+# (min_lon, min_lat, max_lon, max_lat) of New York State
+NY_BBOX = (-79.8, 40.5, -71.8, 45.0)
+
+# Record types with the classes, body types and fuels they take; (value, weight) pairs
+RECORD_TYPES = [('VEH', 0.86), ('TRL', 0.08), ('BOAT', 0.04), ('SNOW', 0.02)]
+RECORD_VALUES = {
+    'VEH': {
+        'Registration Class': [('PAS', 0.74), ('COM', 0.07), ('OMT', 0.03), ('SRF', 0.02), ('MOT', 0.04),
+                               ('SPO', 0.02), ('HIS', 0.02), ('MED', 0.01), ('ORG', 0.01), ('APP', 0.01),
+                               ('TRC', 0.01), ('OMR', 0.01), ('ORM', 0.005), ('ATV', 0.005)],
+        'Body Type': [('SUBN', 0.47), ('4DSD', 0.26), ('PICK', 0.08), ('2DSD', 0.04), ('VAN', 0.04),
+                      ('UTIL', 0.02), ('MCY', 0.04), ('TRAC', 0.01), ('DELV', 0.01), ('CONV', 0.01),
+                      ('N/A', 0.01), ('MOBL', 0.005), ('FIRE', 0.005)]
+    },
+    'TRL': {'Registration Class': [('TRL', 0.92), ('SEM', 0.08)],
+            'Body Type': [('TRLR', 0.80), ('UTIL', 0.12), ('TRAV', 0.08)]},
+    'BOAT': {'Registration Class': [('BOT', 1.0)], 'Body Type': [('BOAT', 1.0)]},
+    'SNOW': {'Registration Class': [('SNO', 1.0)], 'Body Type': [('SNOW', 1.0)]}
+}
+
+# Fuel types of vehicles besides ELECTRIC, whose share grows by registration year
+FUEL_TYPES = [('GAS', 0.90), ('DIESEL', 0.06), ('FLEX', 0.035), ('PROPANE', 0.002),
+              ('COMPRESSED N', 0.002), ('HYDROGEN', 0.001)]
+MAKES = [('TOYOT', 0.13), ('HONDA', 0.11), ('FORD', 0.10), ('CHEVR', 0.09), ('NISSA', 0.07), ('JEEP', 0.06),
+         ('SUBAR', 0.06), ('HYUND', 0.05), ('BMW', 0.04), ('ME/BE', 0.04), ('KIA', 0.04), ('DODGE', 0.03),
+         ('LEXUS', 0.03), ('TESLA', 0.02), ('GMC', 0.03), ('VOLKS', 0.03), ('AUDI', 0.02), ('RAM', 0.03),
+         ('MAZDA', 0.02)]
+COLORS = [('BK', 0.22), ('WH', 0.19), ('GY', 0.17), ('SL', 0.13), ('BL', 0.11), ('RD', 0.09), ('GR', 0.03),
+          ('BR', 0.02), ('TN', 0.02), ('YW', 0.01), ('OR', 0.01)]
+
+# AFDC value frequencies from the 2025 NY extract
+STATION_FUELS = [('ELEC', 0.975), ('E85', 0.015), ('CNG', 0.005), ('LPG', 0.004), ('BD', 0.001)]
+EV_NETWORKS = [('ChargePoint Network', 0.47), ('VIALYNK', 0.10), ('Tesla Destination', 0.10),
+               ('Non-Networked', 0.06), ('EV Connect', 0.05), ('CHARGESMART_EV', 0.04), ('EVOKE', 0.04),
+               ('Blink Network', 0.04), ('Tesla', 0.04), ('Electrify America', 0.02), ('SHELL_RECHARGE', 0.02),
+               ('EVGATEWAY', 0.02)]
+LEVEL2_PORTS = [(2, 0.50), (None, 0.12), (4, 0.11), (1, 0.10), (3, 0.06), (6, 0.04), (10, 0.035),
+                (8, 0.025), (12, 0.01)]
+DC_FAST_PORTS = [(None, 0.89), (1, 0.04), (4, 0.023), (2, 0.015), (8, 0.011), (12, 0.008), (6, 0.006),
+                 (3, 0.002), (16, 0.005)]
+CONNECTOR_TYPES = [('J1772', 0.77), ('J1772 TESLA', 0.06), ('TESLA', 0.055), ('CHADEMO J1772COMBO', 0.035),
+                   ('J1772COMBO', 0.03), (None, 0.025), ('J1772 J1772COMBO', 0.012), ('J1772COMBO TESLA', 0.013)]
+FACILITY_TYPES = [(None, 0.77), ('PAY_GARAGE', 0.05), ('HOTEL', 0.025), ('CAR_DEALER', 0.023),
+                  ('MULTI_UNIT_DWELLING', 0.023), ('PARKING_LOT', 0.017), ('CONVENIENCE_STORE', 0.01),
+                  ('MUNI_GOV', 0.008), ('OFFICE_BLDG', 0.04), ('SHOPPING_CENTER', 0.034)]
+OWNER_TYPES = [(None, 0.74), ('P', 0.25), ('LG', 0.005), ('T', 0.002), ('SG', 0.002), ('J', 0.001)]
+ACCESS_GROUPS = [('Public', 0.951), ('Public - Credit card at all times', 0.035), ('Public - Call ahead', 0.012),
+                 ('Public - Credit card after hours', 0.001), ('Public - Card key at all times', 0.001)]
+
+
+def choose(rng, pairs, n):
+    """
+    Draw n values from (value, weight) pairs; None becomes a missing value
+    """
+    values = np.array([value for value, _ in pairs], dtype=object)
+    weights = np.array([weight for _, weight in pairs], dtype=float)
+    return values[rng.choice(len(values), n, p=weights / weights.sum())]
+
+
+def date_labels(start, end, fmt):
+    """
+    Every day from start to end formatted once, so dates are written by indexing
+    """
+    days = pd.date_range(start, end, freq='D')
+    return days, np.array(days.strftime(fmt), dtype=object)
+
+
+def year_start(days, years):
+    """
+    Index in days of 1 January of each year
+    """
+    return np.searchsorted(days.year, years)
+
+
+def region_zips(rng, region_index, n):
+    """
+    ZIP codes within each region's 3-digit prefix, skewed towards low suffixes like real ZIP densities
+    """
+    prefixes = np.array([int(region[0]) for region in REGIONS])
+    suffix = np.minimum(rng.zipf(1.3, n) - 1, 99)
+    return prefixes[region_index] * 100 + suffix
+
+
+def registration_chunk(rng, start_row, n):
+    """
+    n synthetic registration rows with VINs numbered from start_row
+    """
+    record_type = choose(rng, RECORD_TYPES, n)
+    chunk = {'Record Type': record_type, 'VIN': [f"5YJ{row:014d}" for row in range(start_row, start_row + n)]}
+
+    for column in ['Registration Class', 'Body Type']:
+        values = np.empty(n, dtype=object)
+        for record, options in RECORD_VALUES.items():
+            rows = record_type == record
+            values[rows] = choose(rng, options[column], int(rows.sum()))
+        chunk[column] = values
+
+    shares = np.array([region[6] for region in REGIONS])
+    region_index = rng.choice(len(REGIONS), n, p=shares / shares.sum())
+    chunk['City'] = np.array([region[1] for region in REGIONS], dtype=object)[region_index]
+    chunk['State'] = np.where(rng.random(n) < 0.995, 'NY', choose(rng, [('NJ', 1), ('CT', 1), ('PA', 1)], n))
+    chunk['Zip'] = region_zips(rng, region_index, n)
+    chunk['County'] = np.array([region[2] for region in REGIONS], dtype=object)[region_index]
+
+    # Registration dates lean towards recent years; a few predate 2000 or are in the future
+    days, labels = date_labels('1995-01-01', '2029-12-31', '%m/%d/%Y')
+    valid_years = 2025 - np.minimum(rng.geometric(0.22, n) - 1, 30)
+    valid = np.clip(year_start(days, valid_years) + rng.integers(0, 365, n), 0, len(days) - 1)
+    expiry = np.clip(valid + np.where(record_type == 'VEH', 730, 365 * rng.integers(1, 4, n)), 0, len(days) - 1)
+    chunk['Model Year'] = valid_years - np.minimum(rng.geometric(0.15, n) - 1, 25) + 1
+    chunk['Make'] = choose(rng, MAKES, n)
+
+    # EV share of new vehicle registrations rises from near zero in 2011 to about 5% in 2025
+    ev_share = 0.05 / (1 + np.exp(-(valid_years - 2021) / 1.8))
+    fuel = choose(rng, FUEL_TYPES, n)
+    fuel[(record_type == 'VEH') & (rng.random(n) < ev_share)] = 'ELECTRIC'
+    fuel[np.isin(record_type, ['TRL'])] = None
+    chunk['Fuel Type'] = fuel
+
+    weight = np.round(rng.normal(3600, 900, n)).clip(200, 12000)
+    chunk['Unladen Weight'] = np.where(record_type == 'BOAT', np.nan, weight)
+    chunk['Maximum Gross Weight'] = np.where(chunk['Registration Class'] == 'COM',
+                                             np.round(rng.normal(10000, 2500, n)).clip(6000, 80000), np.nan)
+    chunk['Passengers'] = np.where(chunk['Registration Class'] == 'OMR', rng.integers(8, 50, n), np.nan)
+    chunk['Reg Valid Date'] = labels[valid]
+    chunk['Reg Expiration Date'] = labels[expiry]
+    chunk['Color'] = choose(rng, COLORS, n)
+    for column, rate in [('Scofflaw Indicator', 0.004), ('Suspension Indicator', 0.01),
+                         ('Revocation Indicator', 0.002)]:
+        chunk[column] = np.where(rng.random(n) < rate, 'Y', 'N')
+
+    frame = pd.DataFrame(chunk, columns=REGISTRATION_COLUMNS)
+    for column in ['Unladen Weight', 'Maximum Gross Weight', 'Passengers']:
+        frame[column] = frame[column].astype('Int64')
+    return frame
+
+
+def write_registrations(path, n_rows, seed=0, chunk_rows=CHUNK_ROWS):
+    """
+    Write a seeded synthetic Vehicle_Registrations.csv in chunks
+
+    Each chunk has its own generator derived from the seed, so a file's
+    first rows are the same whatever its total size.
+
+    Parameters:
+    path (str): Output CSV
+    n_rows (int): Number of registrations
+    seed (int): Random seed
+    chunk_rows (int): Rows generated and written at a time
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    for index, start in enumerate(range(0, n_rows, chunk_rows)):
+        rng = np.random.default_rng([seed, index])
+        chunk = registration_chunk(rng, start, min(chunk_rows, n_rows - start))
+        chunk.to_csv(path, mode='w' if start == 0 else 'a', header=start == 0, index=False)
+        print(f"Wrote {start + len(chunk)} of {n_rows} registrations to {path}")
+
+
+def station_points(rng, n):
+    """
+    Station coordinates clustered around the regions, plus scattered rural stations
+
+    Returns:
+    tuple: (latitude, longitude, region index per station)
+    """
+    shares = np.array([region[6] for region in REGIONS])
+    region_index = rng.choice(len(REGIONS), n, p=shares / shares.sum())
+    latitude = np.array([region[3] for region in REGIONS])[region_index]
+    longitude = np.array([region[4] for region in REGIONS])[region_index]
+    spread = np.array([region[5] for region in REGIONS])[region_index]
+    latitude = latitude + rng.normal(0, 1, n) * spread
+    longitude = longitude + rng.normal(0, 1, n) * spread * 1.3
+
+    # One station in ten is placed anywhere in the state's bounding box
+    rural = rng.random(n) < 0.1
+    longitude[rural] = rng.uniform(NY_BBOX[0], NY_BBOX[2], rural.sum())
+    latitude[rural] = rng.uniform(NY_BBOX[1], NY_BBOX[3], rural.sum())
+    return latitude.round(6), longitude.round(6), region_index
+
+
+def write_stations(path, n_rows, seed=0):
+    """
+    Write a seeded synthetic alt_fuel_stations.csv with the AFDC columns
+
+    Columns read by EV_charger.py follow the value frequencies of the real
+    NY extract; the others are left empty as they mostly are in the export.
+
+    Parameters:
+    path (str): Output CSV
+    n_rows (int): Number of stations
+    seed (int): Random seed
+    """
+    rng = np.random.default_rng(seed)
+    n = n_rows
+    latitude, longitude, region_index = station_points(rng, n)
+    fuel = choose(rng, STATION_FUELS, n)
+    elec = fuel == 'ELEC'
+
+    # Openings grow about 35% a year up to 2024, with a handful of stations from the 1990s
+    open_days, open_labels = date_labels('1995-01-01', '2025-12-31', '%Y-%m-%d')
+    open_years = 2025 - np.minimum(rng.geometric(0.26, n) - 1, 30)
+    opened = np.clip(year_start(open_days, open_years) + rng.integers(0, 365, n), 0, len(open_days) - 1)
+    confirm_days, confirm_labels = date_labels('2024-06-01', '2025-02-10', '%Y-%m-%d')
+
+    stations = {}
+    stations['Fuel Type Code'] = fuel
+    stations['Station Name'] = [f"Station {i}" for i in range(n)]
+    stations['Street Address'] = [f"{number} Main St" for number in rng.integers(1, 9999, n)]
+    stations['City'] = np.array([region[1] for region in REGIONS], dtype=object)[region_index]
+    stations['State'] = np.full(n, 'NY', dtype=object)
+    stations['ZIP'] = region_zips(rng, region_index, n)
+    stations['Status Code'] = 'E'
+    stations['Groups With Access Code'] = choose(rng, ACCESS_GROUPS, n)
+    stations['Access Days Time'] = '24 hours daily'
+    stations['EV Level1 EVSE Num'] = np.where(elec & (rng.random(n) < 0.001), 1, None)
+    stations['EV Level2 EVSE Num'] = np.where(elec, choose(rng, LEVEL2_PORTS, n), None)
+    stations['EV DC Fast Count'] = np.where(elec, choose(rng, DC_FAST_PORTS, n), None)
+    stations['EV Network'] = np.where(elec, choose(rng, EV_NETWORKS, n), None)
+    stations['Geocode Status'] = 'GPS'
+    stations['Latitude'] = latitude
+    stations['Longitude'] = longitude
+    stations['Date Last Confirmed'] = confirm_labels[rng.integers(0, len(confirm_days), n)]
+    stations['ID'] = np.arange(n) + 1000
+    stations['Updated At'] = '2025-02-12 00:16:32 UTC'
+    stations['Owner Type Code'] = choose(rng, OWNER_TYPES, n)
+    stations['Open Date'] = open_labels[opened]
+    stations['EV Connector Types'] = np.where(elec, choose(rng, CONNECTOR_TYPES, n), None)
+    stations['Country'] = 'US'
+    stations['Groups With Access Code (French)'] = 'Public'
+    stations['Access Code'] = 'public'
+    stations['Facility Type'] = choose(rng, FACILITY_TYPES, n)
+    stations['Restricted Access'] = False
+    stations['EV Workplace Charging'] = False
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    pd.DataFrame(stations).reindex(columns=STATION_COLUMNS).to_csv(path, index=False)
+    print(f"Wrote {n} stations to {path}")
+
+
+def synthetic_inputs(registrations, stations, data_dir=SYNTHETIC_DIR, seed=0):
+    """
+    Paths of the synthetic input files for the given sizes, generated on first use
+
+    Parameters:
+    registrations (str): Key of REGISTRATION_SIZES, e.g. '1m'
+    stations (str): Key of STATION_SIZES, e.g. '5k'
+    data_dir (str): Folder for the generated files
+    seed (int): Random seed
+
+    Returns:
+    tuple: (registration CSV path, station CSV path)
+    """
+    registration_file = os.path.join(data_dir, f"registrations_{registrations}_seed{seed}.csv")
+    station_file = os.path.join(data_dir, f"stations_{stations}_seed{seed}.csv")
+    if not os.path.exists(registration_file):
+        write_registrations(registration_file + '.part', REGISTRATION_SIZES[registrations], seed)
+        os.replace(registration_file + '.part', registration_file)
+    if not os.path.exists(station_file):
+        write_stations(station_file + '.part', STATION_SIZES[stations], seed)
+        os.replace(station_file + '.part', station_file)
+    return registration_file, station_file
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate seeded synthetic registration and station files")
+    parser.add_argument('--registrations', choices=REGISTRATION_SIZES, default='1m', help="Registration rows")
+    parser.add_argument('--stations', choices=STATION_SIZES, default='5k', help="Station rows")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed")
+    parser.add_argument('--output', default=SYNTHETIC_DIR, help="Folder for the generated files")
+    args = parser.parse_args()
+
+    for path in synthetic_inputs(args.registrations, args.stations, args.output, args.seed):
+        print(path)
+
+
+if __name__ == "__main__":
+    main()